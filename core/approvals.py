@@ -0,0 +1,289 @@
+# core/approvals.py
+"""
+Shared FixHR approval pipeline.
+
+Every approval is two upstream calls: ``approval_check`` (discover the current
+approval step for the request) followed by ``approval_handler`` (submit the
+approve/reject decision for that step). Module specific parameters live in the
+``spec`` dicts built in ``views.py``; this module only runs the pipeline, one
+item at a time or many items concurrently.
+
+The step returned by ``approval_check`` (sequence, last-approval flag, status)
+differs from request to request and is consumed by the handler call. When a
+pending list is shown, ``prefetch_approval_steps`` checks the listed requests
+in the background and caches each step per approver and request; the
+approve / reject button then takes that step (once — it is removed from the
+cache on use) and needs only the handler call. A handler that refuses a
+cached step gets one fresh check and retry.
+"""
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from core import fixhr_http, metrics
+
+logger = logging.getLogger(__name__)
+
+BULK_APPROVAL_MAX_ITEMS = 200
+BULK_APPROVAL_PER_USER_CONCURRENCY = 4
+APPROVAL_ACTIONS = ("approve", "reject")
+
+# {user_key: BoundedSemaphore} — caps in-flight approvals per approver across requests
+_USER_SLOTS = {}
+_USER_SLOTS_LOCK = threading.Lock()
+
+
+def _user_slots(user_key):
+    with _USER_SLOTS_LOCK:
+        slots = _USER_SLOTS.get(user_key)
+        if slots is None:
+            slots = threading.BoundedSemaphore(BULK_APPROVAL_PER_USER_CONCURRENCY)
+            _USER_SLOTS[user_key] = slots
+        return slots
+
+
+# ---------------- Approval step cache ----------------
+APPROVAL_STEP_CACHE_TTL = getattr(settings, "APPROVAL_STEP_CACHE_TTL", 120)  # seconds
+APPROVAL_STEP_CACHE_MAX = 5000
+APPROVAL_STEP_PREFETCH_MAX = getattr(settings, "APPROVAL_STEP_PREFETCH_MAX", 25)  # listed requests checked ahead
+
+# (approver, module_id, master_module_id, request_id) → (expires_at, step)
+_STEP_CACHE = {}
+# same key → monotonic time the step was last taken; a prefetch started before that is discarded
+_STEP_TAKEN = {}
+_STEP_LOCK = threading.Lock()
+_STEP_STATS = {"hits": 0, "misses": 0, "invalidations": 0, "prefetched": 0}
+_PREFETCH_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="approval-step-prefetch")
+
+
+def approver_key(token):
+    return hashlib.md5(str(token or "").encode()).hexdigest()
+
+
+def _step_key(token, item):
+    return (approver_key(token), str(item.get("module_id")), str(item.get("master_module_id")), str(item.get("id")))
+
+
+def take_approval_step(token, item):
+    """Remove and return the cached step for this approver and request, or None on miss/expiry."""
+    key = _step_key(token, item)
+    now = time.monotonic()
+    with _STEP_LOCK:
+        entry = _STEP_CACHE.pop(key, None)
+        _STEP_TAKEN[key] = now
+        if entry and entry[0] > now:
+            _STEP_STATS["hits"] += 1
+            return entry[1]
+        _STEP_STATS["misses"] += 1
+        return None
+
+
+def store_approval_step(token, item, step, fetched_at):
+    """Cache a step checked at ``fetched_at`` unless the request was acted on since."""
+    key = _step_key(token, item)
+    now = time.monotonic()
+    with _STEP_LOCK:
+        if _STEP_TAKEN.get(key, float("-inf")) >= fetched_at:
+            return
+        if len(_STEP_CACHE) >= APPROVAL_STEP_CACHE_MAX:
+            for k in [k for k, (exp, _) in _STEP_CACHE.items() if exp <= now]:
+                _STEP_CACHE.pop(k, None)
+            for k in [k for k, taken in _STEP_TAKEN.items() if taken <= now - APPROVAL_STEP_CACHE_TTL]:
+                _STEP_TAKEN.pop(k, None)
+            if len(_STEP_CACHE) >= APPROVAL_STEP_CACHE_MAX:
+                _STEP_CACHE.clear()
+        _STEP_CACHE[key] = (now + APPROVAL_STEP_CACHE_TTL, step)
+        _STEP_STATS["prefetched"] += 1
+
+
+def invalidate_approval_step(token, item):
+    """Drop any cached step for this approver and request — called when a handler call fails."""
+    key = _step_key(token, item)
+    with _STEP_LOCK:
+        _STEP_TAKEN[key] = time.monotonic()
+        if _STEP_CACHE.pop(key, None) is not None:
+            _STEP_STATS["invalidations"] += 1
+
+
+def approval_step_cache_stats():
+    with _STEP_LOCK:
+        return dict(_STEP_STATS, size=len(_STEP_CACHE))
+
+
+metrics.register_gauge("approvals.step_cache", approval_step_cache_stats)
+
+
+# ---------------- Single item ----------------
+def fetch_approval_step(check_url, item, headers):
+    """POST approval_check and return the current step dict (or None if no approver)."""
+    check_params = {
+        "approval_status": 140,
+        "trp_id": item["id"],
+        "module_id": item["module_id"],
+        "master_module_id": item["master_module_id"],
+    }
+    r1 = fixhr_http.post(check_url, headers=headers, params=check_params, timeout=15)
+    logger.info("📡 approval check %s → %s", item["id"], r1.status_code)
+
+    check_data = r1.json()
+    if not check_data.get("status") or not check_data.get("result"):
+        return None
+    return check_data["result"][0]
+
+
+def get_approval_step(check_url, item, headers, token):
+    """
+    The prefetched step of this request (taken out of the cache), else a fresh
+    ``fetch_approval_step``. Returns ``(step, from_cache)``.
+    """
+    step = take_approval_step(token, item)
+    if step is not None:
+        return step, True
+    return fetch_approval_step(check_url, item, headers), False
+
+
+def _prefetch_step(check_url, item, headers, token):
+    fetched_at = time.monotonic()
+    try:
+        step = fetch_approval_step(check_url, item, headers)
+    except Exception:
+        logger.warning("approval step prefetch failed for %s", item.get("id"), exc_info=True)
+        return
+    if step:
+        store_approval_step(token, item, step, fetched_at)
+
+
+def prefetch_approval_steps(spec, items, token):
+    """
+    Check the approval step of up to ``APPROVAL_STEP_PREFETCH_MAX`` listed requests in the
+    background (items need ``id``, ``module_id`` and ``master_module_id``), so their
+    approve / reject buttons skip ``approval_check``.
+    """
+    headers = {"Accept": "application/json", "authorization": f"Bearer {token}"}
+    now = time.monotonic()
+    with _STEP_LOCK:
+        todo = [item for item in items if item.get("id")
+                and _STEP_CACHE.get(_step_key(token, item), (0,))[0] <= now][:APPROVAL_STEP_PREFETCH_MAX]
+    for item in todo:
+        _PREFETCH_POOL.submit(_prefetch_step, spec["check_url"], item, headers, token)
+
+
+def submit_approval(spec, item, step, approve, note, headers):
+    """POST approval_handler for an already-checked step. Returns the parsed body."""
+    handler_params = spec["build_params"](item, step, approve, note)
+    send_as = spec.get("send_as", "data")
+    kwargs = {send_as: handler_params}
+    r2 = fixhr_http.post(spec["handler_url"], headers=headers, timeout=15, **kwargs)
+    logger.info("📡 %s approval handler %s → %s", spec["label"], item["id"], r2.status_code)
+    return r2.json()
+
+
+def run_approval(spec, item, approve, note, token):
+    """
+    Run check + handler for one item.
+    Returns a result row: {module, id, action, ok, status, message}, where ``status``
+    is "ok", "no_step" (no approver), "failed" (handler refused) or "error" (exception).
+    """
+    action = "approved" if approve else "rejected"
+    row = {"module": spec["name"], "id": item.get("id"), "action": "approve" if approve else "reject"}
+    headers = {"Accept": "application/json", "authorization": f"Bearer {token}"}
+
+    try:
+        step, from_cache = get_approval_step(spec["check_url"], item, headers, token)
+        if not step:
+            row.update(ok=False, status="no_step", message=spec.get("no_step_message", "No approver found."))
+            return row
+
+        handler_data = submit_approval(spec, item, step, approve, note, headers)
+        if not handler_data.get("status"):
+            invalidate_approval_step(token, item)
+            if from_cache:
+                # the cached step may be stale — re-check once and retry
+                step, _ = get_approval_step(spec["check_url"], item, headers, token)
+                if step:
+                    handler_data = submit_approval(spec, item, step, approve, note, headers)
+
+        if handler_data.get("status"):
+            row.update(ok=True, status="ok", message=f"{spec['label']} {item['id']} {action} successfully!")
+        else:
+            invalidate_approval_step(token, item)
+            row.update(ok=False, status="failed", message=handler_data.get("message") or "Unknown error")
+    except Exception as e:
+        invalidate_approval_step(token, item)
+        logger.exception("%s approval failed for %s", spec["label"], item.get("id"))
+        row.update(ok=False, status="error", message=str(e))
+    return row
+
+
+# ---------------- Bulk ----------------
+def run_bulk_approvals(specs, items, token, user_key, default_action="approve", note=""):
+    """
+    Approve/reject many items (any mix of modules) concurrently.
+
+    Each worker runs the check → handler pair for one item; at most
+    ``BULK_APPROVAL_PER_USER_CONCURRENCY`` pairs are in flight per approver,
+    even if the same user fires several bulk requests at once.
+    Results are returned in the same order as ``items``.
+    """
+    slots = _user_slots(user_key)
+
+    def _failed(module, item_id, action, message):
+        return {"module": module, "id": item_id, "action": action, "ok": False, "status": "error", "message": message}
+
+    def _work(item):
+        module = str(item.get("module") or "").strip().lower()
+        action = item.get("action") or default_action
+        action = action.strip().lower() if isinstance(action, str) else action
+        if action not in APPROVAL_ACTIONS:
+            # never guess: anything but an exact approve/reject could turn into an irreversible reject
+            return _failed(module, item.get("id"), action, f"Unknown action {action!r} (use approve or reject)")
+        spec = specs.get(module)
+        if not spec:
+            return _failed(module, item.get("id"), action, f"Unknown module '{module}'")
+        if not item.get("id"):
+            return _failed(module, None, action, "Request ID missing")
+
+        with slots:
+            return run_approval(spec, item, action == "approve", item.get("note") or note, token)
+
+    if not items:
+        return []
+
+    workers = min(BULK_APPROVAL_PER_USER_CONCURRENCY, len(items))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [fixhr_http.submit(pool, _work, item) for item in items]
+        return [f.result() for f in futures]
+
+
+def parse_bulk_command(msg):
+    """
+    Parse the chat form of a bulk approval:
+
+        bulk approve|leave:ID:EMP_D_ID:MODULE_ID:MASTER_MODULE_ID;gatepass:...|note
+
+    Returns ``(action, items, note)``; ``items`` is empty when nothing parses.
+    """
+    parts = msg.split("|")
+    head = parts[0].strip().lower()
+    action = "reject" if "reject" in head else "approve"
+    body = parts[1] if len(parts) > 1 else ""
+    note = parts[2].strip() if len(parts) > 2 else ""
+
+    items = []
+    for chunk in body.split(";"):
+        fields = [f.strip() for f in chunk.split(":")]
+        if len(fields) < 5 or not fields[0]:
+            continue
+        module, req_id, emp_d_id, module_id, master_module_id = fields[:5]
+        items.append({
+            "module": module.lower(),
+            "id": req_id,
+            "emp_d_id": emp_d_id,
+            "module_id": module_id,
+            "master_module_id": master_module_id,
+        })
+    return action, items, note
@@ -0,0 +1,228 @@
+# core/attendance_engine.py
+"""
+Columnar attendance report engine.
+
+The FixHR attendance payload (employees → per-day entries) is flattened once
+into a pandas DataFrame; filtering, period clipping, the register matrix,
+per-employee details and the status summary are then computed with column
+operations instead of per-row Python loops, so org-wide monthly reports are
+built in full (no row limit).
+"""
+import functools
+
+import numpy as np
+import pandas as pd
+
+from core.attendance_query import frame_mask
+from core.date_grammar import parse_datetime
+
+DAY_COLUMNS = (
+    "date", "attendance_date", "status", "in_time", "out_time", "work_hrs", "work_hours",
+    "is_late", "late", "overtime_hours", "ot", "remark", "remarks",
+)
+
+
+# ---------------- Column helpers ----------------
+def _present(series):
+    """Mask of values that are truthy in the ``value or default`` sense."""
+    return series.notna() & series.astype(bool)
+
+
+def _first_of(frame, columns, default="-"):
+    """Vectorized ``row.get(a) or row.get(b) or default``."""
+    out = pd.Series(default, index=frame.index, dtype=object)
+    for col in reversed(columns):
+        if col in frame:
+            col_values = frame[col]
+            out = col_values.where(_present(col_values), out)
+    return out
+
+
+@functools.lru_cache(maxsize=1024)
+def _fallback_date(value):
+    parsed = parse_datetime(value)
+    return pd.Timestamp(parsed.date()) if parsed else pd.NaT
+
+
+def parse_dates(raw):
+    """ISO prefix parse for the whole column; the date grammar only for the (unique) leftovers."""
+    text = raw.where(_present(raw), "").astype(str).str.strip()
+    parsed = pd.to_datetime(text.str[:10], format="%Y-%m-%d", errors="coerce")
+    leftover = parsed.isna() & (text != "")
+    if leftover.any():
+        fixed = {v: _fallback_date(v) for v in text[leftover].unique()}
+        parsed = parsed.where(~leftover, text[leftover].map(fixed))
+    return pd.to_datetime(parsed)
+
+
+def clock_minutes(raw):
+    """
+    Minutes after midnight for clock strings like ``09:45``, ``9:45:10`` or ``06:05 PM``
+    (NaN when there is no time). Parsed as one column with a regex, not per row.
+    """
+    text = raw.where(_present(raw), "").astype(str).str.strip().str.lower()
+    parts = text.str.extract(r"(\d{1,2}):(\d{2})(?::\d{2})?\s*([ap])?\.?m?\.?")
+    hours = pd.to_numeric(parts[0], errors="coerce")
+    minutes = pd.to_numeric(parts[1], errors="coerce")
+    hours = hours.where(~((parts[2] == "p") & (hours < 12)), hours + 12)
+    hours = hours.where(~((parts[2] == "a") & (hours == 12)), 0)
+    return hours * 60 + minutes
+
+
+# ---------------- Frames ----------------
+FRAME_COLUMNS = (
+    "emp_pos", "day_pos", "emp_name", "employee_id", "date", "status", "in_time", "out_time",
+    "work_hrs", "is_late", "overtime_hours", "remark", "in_minutes", "out_minutes",
+)
+DETAIL_COLUMNS = ("date", "status", "in_time", "out_time", "work_hrs", "is_late", "overtime_hours", "remark")
+
+
+def employee_frame(employees):
+    """One row per employee: position in the payload, raw name and id."""
+    names = [(emp.get("emp_name") or emp.get("name") or "").strip() for emp in employees]
+    ids = [emp.get("emp_id") or emp.get("employee_id") or "" for emp in employees]
+    return pd.DataFrame({"emp_pos": np.arange(len(employees)), "emp_name": names, "employee_id": ids})
+
+
+def filter_scope(frame, filter_info):
+    """
+    Vectorized version of the self / emp_id / ids / name / all scope checks.
+    Works on any frame with ``emp_name`` and ``employee_id`` columns (employee or day rows).
+    """
+    f_type = filter_info["type"]
+    if f_type == "all" or frame.empty:
+        return frame
+    names = frame["emp_name"].str.lower()
+    ids = frame["employee_id"].astype(str)
+    if f_type == "self":
+        mask = pd.Series(False, index=frame.index)
+        if filter_info.get("emp_id"):
+            mask |= ids == str(filter_info["emp_id"])
+        name_value = (filter_info.get("name_value") or "").lower()
+        if name_value:
+            mask |= (frame["emp_name"] != "") & names.str.contains(name_value, regex=False)
+        return frame[mask]
+    if f_type == "emp_id":
+        return frame[ids == str(filter_info.get("value"))]
+    if f_type == "ids":
+        return frame[ids.isin([str(i) for i in filter_info.get("ids") or ()])]
+    if f_type == "name":
+        return frame[names.str.contains(filter_info.get("value") or "", regex=False)]
+    return frame
+
+
+def day_frame(employees, emps=None):
+    """
+    Flatten employees' day entries into typed ``FRAME_COLUMNS`` (rows with no parseable date are dropped).
+    ``emps`` restricts the flattening to a (filtered) ``employee_frame``.
+    Rows keep payload order (employee, then day), which the register and details rely on.
+    """
+    if emps is None:
+        emps = employee_frame(employees)
+    positions, day_positions, entries = [], [], []
+    for pos in emps["emp_pos"].to_numpy():
+        days = [d for d in (employees[pos].get("days") or employees[pos].get("attendance") or []) if isinstance(d, dict)]
+        positions.extend([pos] * len(days))
+        day_positions.extend(range(len(days)))
+        entries.extend(days)
+
+    if not entries:
+        return pd.DataFrame(columns=list(FRAME_COLUMNS))
+
+    raw = pd.DataFrame.from_records(entries, columns=list(DAY_COLUMNS))
+    emp_rows = emps.set_index("emp_pos").loc[positions]
+    late_text = raw["late"].where(_present(raw["late"]), "").astype(str).str.lower()
+    in_time, out_time = _first_of(raw, ("in_time",)), _first_of(raw, ("out_time",))
+    frame = pd.DataFrame({
+        "emp_pos": np.asarray(positions),
+        "day_pos": np.asarray(day_positions),
+        "emp_name": emp_rows["emp_name"].to_numpy(dtype=object),
+        "employee_id": emp_rows["employee_id"].to_numpy(dtype=object),
+        "date": parse_dates(_first_of(raw, ("date", "attendance_date"), default=None)).to_numpy(),
+        "status": _first_of(raw, ("status",)).astype(str).str.upper().to_numpy(),
+        "in_time": in_time.to_numpy(),
+        "out_time": out_time.to_numpy(),
+        "work_hrs": _first_of(raw, ("work_hrs", "work_hours")).to_numpy(),
+        "is_late": (_present(raw["is_late"]) | (late_text == "yes")).to_numpy(),
+        "overtime_hours": _first_of(raw, ("overtime_hours", "ot")).to_numpy(),
+        "remark": _first_of(raw, ("remark", "remarks")).to_numpy(),
+        "in_minutes": clock_minutes(in_time).to_numpy(),
+        "out_minutes": clock_minutes(out_time).to_numpy(),
+    })
+    return frame[frame["date"].notna()].reset_index(drop=True)
+
+
+def clip_period(frame, period_start, period_end):
+    """Rows dated within ``[period_start, period_end]``, with ``date`` as ISO strings."""
+    dates = pd.to_datetime(frame["date"])
+    frame = frame[dates.between(pd.Timestamp(period_start), pd.Timestamp(period_end))].copy()
+    frame["date"] = pd.to_datetime(frame["date"]).dt.strftime("%Y-%m-%d")
+    return frame.reset_index(drop=True)
+
+
+def _with_display_names(frame):
+    names = frame["emp_name"].to_numpy(dtype=object).copy()
+    unnamed = names == ""
+    if unnamed.any():
+        names[unnamed] = ["Emp #%s" % i for i in frame["employee_id"].to_numpy(dtype=object)[unnamed]]
+    frame = frame.drop(columns=["emp_pos", "day_pos", "emp_name"])
+    frame.insert(0, "employee_name", names)
+    return frame
+
+
+# ---------------- Report pieces ----------------
+def register_matrix(frame):
+    """Employee × date status grid (``"-"`` where there is no entry; the last entry for a date wins)."""
+    dates = sorted(frame["date"].unique().tolist())
+    emp_order = pd.unique(frame["employee_name"])
+    grid = (
+        frame.drop_duplicates(["employee_name", "date"], keep="last")
+        .pivot(index="employee_name", columns="date", values="status")
+        .reindex(index=emp_order, columns=dates)
+        .fillna("-")
+    )
+    rows = [{"name": name, "values": values} for name, values in zip(grid.index.tolist(), grid.to_numpy().tolist())]
+    return {"headers": ["Employee"] + dates, "rows": rows}
+
+
+def employee_details(frame):
+    """Per-employee day rows, employees in first-seen order."""
+    codes, names = pd.factorize(frame["employee_name"])
+    order = np.argsort(codes, kind="stable")
+    keys = list(DETAIL_COLUMNS)
+    columns = [frame[k].to_numpy()[order].tolist() for k in keys]   # tolist → plain Python scalars
+    records = [dict(zip(keys, values)) for values in zip(*columns)]
+    bounds = np.cumsum(np.bincount(codes, minlength=len(names)))
+    details, start = [], 0
+    for name, end in zip(names.tolist(), bounds.tolist()):
+        details.append({"emp_name": name, "rows": records[start:end]})
+        start = end
+    return details
+
+
+def status_summary(frame):
+    """Day count per status, in first-seen order."""
+    counts = frame.groupby("status", sort=False).size()
+    return [{"status": status, "days": int(days)} for status, days in counts.items()]
+
+
+def report_from_frame(frame, filter_info, period_start, period_end, predicates=()):
+    """
+    Returns ``(register, details, summary, row_count)`` for the rows of a ``day_frame``
+    matching ``filter_info`` between ``period_start`` and ``period_end`` (dates, inclusive),
+    and ``predicates`` (see ``attendance_query``) when given.
+    """
+    frame = clip_period(filter_scope(frame, filter_info), period_start, period_end)
+    if predicates and not frame.empty:
+        frame = frame[frame_mask(frame, predicates)]
+    if frame.empty:
+        return None, [], [], 0
+    frame = _with_display_names(frame)
+    return register_matrix(frame), employee_details(frame), status_summary(frame), len(frame)
+
+
+def build_report(employees, filter_info, period_start, period_end, predicates=()):
+    """``report_from_frame`` straight from a FixHR attendance payload (employee list)."""
+    employees = [emp for emp in employees if isinstance(emp, dict)]
+    emps = filter_scope(employee_frame(employees), filter_info)
+    return report_from_frame(day_frame(employees, emps), {"type": "all"}, period_start, period_end, predicates)
@@ -0,0 +1,109 @@
+# core/attendance_export.py
+"""
+Streaming attendance register export (CSV, or XLSX when ``openpyxl`` is installed).
+
+Rows come straight from the local attendance store with a server-side
+iterator, one register line per employee, so memory stays flat however many
+employees the viewer can see. The header is the full calendar of the period,
+known before the first row is read. Employees are ordered by employee id.
+"""
+import csv
+import tempfile
+from datetime import timedelta
+
+import pandas as pd
+
+from core.attendance_engine import filter_scope
+from core.attendance_query import queryset_filter
+from core.models import AttendanceRecord
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # optional dependency
+    Workbook = None
+
+ITERATOR_CHUNK_SIZE = 2000
+SPOOL_MAX_BYTES = 4 * 1024 * 1024   # XLSX stays in memory up to this size, then spills to disk
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the line back, for ``csv.writer`` streaming."""
+
+    def write(self, value):
+        return value
+
+
+def period_dates(start, end):
+    days = (end - start).days + 1
+    return [(start + timedelta(days=i)).isoformat() for i in range(days)]
+
+
+def _period_rows(viewer, start, end, predicates):
+    rows = AttendanceRecord.objects.filter(viewer=viewer, date__range=(start, end))
+    return rows.filter(queryset_filter(predicates)) if predicates else rows
+
+
+def allowed_employees(viewer, start, end, filter_info, predicates=()):
+    """(emp_name, employee_id) pairs in the period that match ``filter_info`` (one small distinct query)."""
+    pairs = (
+        _period_rows(viewer, start, end, predicates)
+        .values_list("emp_name", "employee_id")
+        .distinct()
+    )
+    employees = pd.DataFrame.from_records(list(pairs), columns=["emp_name", "employee_id"])
+    return set(filter_scope(employees, filter_info).itertuples(index=False, name=None))
+
+
+def register_rows(viewer, start, end, filter_info, predicates=()):
+    """
+    Yield the register header, then one ``[employee, status per date...]`` row per employee.
+    Only the current employee's statuses are held in memory. ``predicates`` are applied in SQL.
+    """
+    dates = period_dates(start, end)
+    column = {d: i for i, d in enumerate(dates)}
+    allowed = None if filter_info["type"] == "all" else allowed_employees(viewer, start, end, filter_info, predicates)
+    yield ["Employee", "Employee ID"] + dates
+
+    rows = (
+        _period_rows(viewer, start, end, predicates)
+        .order_by("employee_id", "emp_name", "date", "day_pos")   # walks the (viewer, employee_id, date) index
+        .values_list("emp_name", "employee_id", "date", "status")
+        .iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    )
+    current, statuses = None, None
+    for emp_name, employee_id, day, status in rows:
+        if allowed is not None and (emp_name, employee_id) not in allowed:
+            continue
+        if (emp_name, employee_id) != current:
+            if current is not None:
+                yield [current[0] or f"Emp #{current[1]}", current[1]] + statuses
+            current, statuses = (emp_name, employee_id), ["-"] * len(dates)
+        statuses[column[day.isoformat()]] = status
+    if current is not None:
+        yield [current[0] or f"Emp #{current[1]}", current[1]] + statuses
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield "﻿"   # BOM so Excel opens UTF-8 names correctly
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_xlsx(rows, title="Attendance"):
+    """
+    Build the workbook in openpyxl's write-only mode (rows are not kept in memory)
+    and yield the finished file in chunks.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    for row in rows:
+        sheet.append(row)
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as fh:
+        workbook.save(fh)
+        fh.seek(0)
+        while True:
+            chunk = fh.read(64 * 1024)
+            if not chunk:
+                break
+            yield chunk
@@ -0,0 +1,83 @@
+# core/attendance_pages.py
+"""
+Short-lived, per-viewer cache of built attendance reports for cursor paging.
+
+``handle_attendance_report`` sends the first page of register rows (and their
+details) and keeps the full result here; the chat UI then pulls the remaining
+pages with the returned cursor from ``/api/attendance/register/``.
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+PAGE_SIZE = getattr(settings, "ATTENDANCE_PAGE_SIZE", 50)              # employees per page
+MAX_PAGE_SIZE = 500
+RESULT_TTL = getattr(settings, "ATTENDANCE_RESULT_TTL", 10 * 60)       # seconds
+RESULT_CACHE_MAX = 64
+
+_RESULTS = OrderedDict()   # result_id → (stored_at, viewer, register_rows, details_by_name)
+_RESULTS_LOCK = threading.Lock()
+
+
+def make_cursor(result_id, offset):
+    return f"{result_id}.{offset}"
+
+
+def parse_cursor(cursor):
+    """``(result_id, offset)`` or None for a malformed cursor."""
+    result_id, _, offset = (cursor or "").rpartition(".")
+    if not result_id or not offset.isdigit():
+        return None
+    return result_id, int(offset)
+
+
+def store_result(viewer, register_rows, details_by_name):
+    """Keep a full report for paging; returns its result id."""
+    result_id = secrets.token_urlsafe(12)
+    with _RESULTS_LOCK:
+        _RESULTS[result_id] = (time.monotonic(), viewer, register_rows, details_by_name)
+        while len(_RESULTS) > RESULT_CACHE_MAX:
+            _RESULTS.popitem(last=False)
+    return result_id
+
+
+def _page(result_id, offset, limit, register_rows, details_by_name):
+    rows = register_rows[offset:offset + limit]
+    end = offset + len(rows)
+    return {
+        "rows": rows,
+        "details": [details_by_name[r["name"]] for r in rows if r["name"] in details_by_name],
+        "next_cursor": make_cursor(result_id, end) if end < len(register_rows) else None,
+        "total": len(register_rows),
+    }
+
+
+def first_page(viewer, register, details, limit=PAGE_SIZE):
+    """
+    Page one of a report. Small reports are returned whole (no cursor, nothing cached);
+    larger ones are cached and come back with ``next_cursor``.
+    """
+    register_rows = register["rows"]
+    if len(register_rows) <= limit:
+        return {"rows": register_rows, "details": details, "next_cursor": None, "total": len(register_rows)}
+    details_by_name = {d["emp_name"]: d for d in details}
+    result_id = store_result(viewer, register_rows, details_by_name)
+    return _page(result_id, 0, limit, register_rows, details_by_name)
+
+
+def next_page(viewer, cursor, limit=PAGE_SIZE):
+    """The page at ``cursor``, or None when the cursor is invalid, expired or not this viewer's."""
+    parsed = parse_cursor(cursor)
+    if not parsed:
+        return None
+    result_id, offset = parsed
+    with _RESULTS_LOCK:
+        entry = _RESULTS.get(result_id)
+    if not entry or time.monotonic() - entry[0] > RESULT_TTL or entry[1] != viewer:
+        return None
+    _, _, register_rows, details_by_name = entry
+    limit = min(max(int(limit), 1), MAX_PAGE_SIZE)
+    return _page(result_id, offset, limit, register_rows, details_by_name)
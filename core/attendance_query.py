@@ -0,0 +1,150 @@
+# core/attendance_query.py
+"""
+Attendance filter phrases → predicates.
+
+``compile_attendance_query("late after 10 baje this week")`` returns
+``[("in_minutes", "gt", 600)]`` plus a label for the reply. Predicates are
+``(column, op, value)`` tuples over the attendance frame / ``AttendanceRecord``
+columns and are evaluated where it is cheapest:
+
+* the date range is already pushed upstream — the FixHR attendance endpoint
+  only takes ``month``/``year``/``start_date``/``end_date``, so that is the
+  only predicate it can apply;
+* everything else is pushed into the SQLite query on the local store
+  (``queryset_filter``), next to the indexed viewer/date range;
+* ``frame_mask`` evaluates the same predicates column-wise on a DataFrame
+  when a report is built straight from an upstream payload.
+
+A bare number after after / before / by is a clock hour ("before 6"), but
+not when it is part of a date or a year ("after 15 january", "by 5 march",
+"after 2025"). ``python -m core.attendance_query`` checks ``EXAMPLES``.
+"""
+import re
+from functools import reduce
+
+from django.db.models import Q
+
+from core.date_grammar import MONTHS
+
+STATUS_WORDS = (
+    # (phrases, status codes as stored — upper-cased)
+    (("absent", "gair hazir", "gairhazir", "nahi aaye", "nahi aya"), ("A", "AB", "ABSENT")),
+    (("half day", "half-day", "halfday"), ("HD", "HF", "HALF DAY", "HALF-DAY")),
+    (("on leave", "chutti"), ("L", "LEAVE", "CL", "SL", "PL", "EL")),
+    (("week off", "weekoff", "week-off"), ("WO", "W/O", "WEEK OFF")),
+    (("present", "hazir"), ("P", "PRESENT")),
+)
+OUT_WORDS = ("left", "leave early", "out ", "out time", "nikle", "gaye", "checkout", "check out", "check-out", "early")
+
+_MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+# not a clock hour: more digits ("2025"), an ordinal / month after it ("15th", "5 march"), or "15/01"
+_NOT_DATE = rf"(?!\d|\s*(?:st|nd|rd|th)\b|\s*(?:st|nd|rd|th)?\s*(?:of\s+)?(?:{_MONTH})\b|[/-]\d)"
+_TIME = rf"(\d{{1,2}}){_NOT_DATE}(?:[:.](\d{{2}}))?\s*(am|pm|a\.m\.|p\.m\.)?"
+_BEFORE_AFTER_RE = re.compile(rf"\b(after|before|by)\s+{_TIME}(?:\s*baje)?")
+_HINGLISH_RE = re.compile(rf"\b{_TIME}\s*baje\s*(?:ke\s+)?(baad|bad|pehle|se\s+pehle)\b")
+
+_OPS = {
+    "eq": lambda field, value: Q(**{field: value}),
+    "in": lambda field, value: Q(**{f"{field}__in": list(value)}),
+    "gt": lambda field, value: Q(**{f"{field}__gt": value}),
+    "lt": lambda field, value: Q(**{f"{field}__lt": value}),
+}
+
+
+def _clock(hour, minute, half):
+    """24h minutes; bare 1–7 o'clock is read as PM (office hours: "before 6" → 18:00)."""
+    hour, minute = int(hour), int(minute or 0)
+    half = (half or "").replace(".", "")
+    if half == "pm" and hour < 12:
+        hour += 12
+    elif half == "am" and hour == 12:
+        hour = 0
+    elif not half and 1 <= hour <= 7:
+        hour += 12
+    if hour > 23 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+def _time_predicate(t):
+    match = _BEFORE_AFTER_RE.search(t)
+    if match:
+        word, hour, minute, half = match.groups()
+        op = "gt" if word == "after" else "lt"
+    else:
+        match = _HINGLISH_RE.search(t)
+        if not match:
+            return None
+        hour, minute, half, word = match.groups()
+        op = "gt" if word in ("baad", "bad") else "lt"
+    minutes = _clock(hour, minute, half)
+    if minutes is None:
+        return None
+    column = "out_minutes" if any(w in t for w in OUT_WORDS) else "in_minutes"
+    return column, op, minutes
+
+
+def compile_attendance_query(text):
+    """``(predicates, label)`` for the filter phrases in ``text``; ``([], "")`` when there are none."""
+    t = f" {(text or '').lower()} "
+    predicates, labels = [], []
+
+    for phrases, codes in STATUS_WORDS:
+        if any(p in t for p in phrases):
+            predicates.append(("status", "in", codes))
+            labels.append(phrases[0])
+            break
+
+    time_predicate = _time_predicate(t)
+    if time_predicate:
+        column, op, minutes = time_predicate
+        predicates.append(time_predicate)
+        labels.append(
+            f"{'out' if column == 'out_minutes' else 'in'} {'after' if op == 'gt' else 'before'} "
+            f"{minutes // 60:02d}:{minutes % 60:02d}"
+        )
+    elif re.search(r"\blate\b|\bder se\b", t):
+        predicates.append(("is_late", "eq", True))
+        labels.append("late")
+
+    return predicates, ", ".join(labels)
+
+
+def queryset_filter(predicates):
+    """Predicates as one ``Q`` for ``AttendanceRecord`` querysets."""
+    return reduce(lambda q, p: q & _OPS[p[1]](p[0], p[2]), predicates, Q())
+
+
+def frame_mask(frame, predicates):
+    """Predicates evaluated column-wise on an attendance frame (NaN times never match)."""
+    mask = None
+    for column, op, value in predicates:
+        col = frame[column]
+        if op == "eq":
+            part = col == value
+        elif op == "in":
+            part = col.isin(value)
+        elif op == "gt":
+            part = col > value
+        else:
+            part = col < value
+        mask = part if mask is None else mask & part
+    return mask
+
+
+# (phrase, predicates) — the dates and years must not turn into time filters
+EXAMPLES = (
+    ("late after 10 baje", [("in_minutes", "gt", 600)]),
+    ("left before 6", [("out_minutes", "lt", 1080)]),
+    ("in after 9:30 am", [("in_minutes", "gt", 570)]),
+    ("10 baje ke baad", [("in_minutes", "gt", 600)]),
+    ("attendance after 15 january", []),
+    ("attendance after 2025", []),
+    ("attendance by 5 march", []),
+    ("absent after 15th", [("status", "in", ("A", "AB", "ABSENT"))]),
+)
+
+if __name__ == "__main__":
+    for phrase, expected in EXAMPLES:
+        got, label = compile_attendance_query(phrase)
+        print(f"{'ok ' if got == expected else 'BAD'} {phrase!r:34} → {label or '-'}")
@@ -0,0 +1,200 @@
+# core/attendance_store.py
+"""
+Local attendance warehouse.
+
+Attendance days fetched from FixHR are kept in SQLite (``AttendanceRecord``,
+indexed on viewer/employee/date) and partitioned by the viewer whose token
+fetched them, since what FixHR returns depends on that user's role.
+
+* Closed months (ended more than ``ATTENDANCE_CLOSE_GRACE_DAYS`` ago) are
+  fetched once and then always served locally.
+* The open month is re-synced at most every ``ATTENDANCE_OPEN_MONTH_TTL``
+  seconds, and only the days since the last sync (minus a small overlap for
+  late corrections) are fetched again.
+* Multi-month periods fetch their stale months concurrently, one upstream
+  request per month.
+
+Reports read the period back with one indexed range query and hand the rows to
+``attendance_engine.report_from_frame``.
+"""
+import calendar
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core import fixhr_http
+from core.attendance_engine import FRAME_COLUMNS, day_frame
+from core.attendance_query import queryset_filter
+from core.employee_directory import invalidate_directory
+from core.models import AttendanceRecord, AttendanceSync
+
+logger = logging.getLogger(__name__)
+
+OPEN_MONTH_TTL = getattr(settings, "ATTENDANCE_OPEN_MONTH_TTL", 300)           # seconds
+CLOSE_GRACE_DAYS = getattr(settings, "ATTENDANCE_CLOSE_GRACE_DAYS", 3)         # corrections window after month end
+DELTA_OVERLAP_DAYS = getattr(settings, "ATTENDANCE_DELTA_OVERLAP_DAYS", 2)     # re-fetch days before last sync
+FETCH_WORKERS = getattr(settings, "ATTENDANCE_FETCH_WORKERS", 4)               # concurrent month fetches
+BULK_BATCH_SIZE = 1000
+
+_TEXT_FIELDS = ("status", "in_time", "out_time", "work_hrs", "overtime_hours", "remark")
+
+
+def viewer_key(request, token):
+    """Partition key: the logged-in employee, or a hash of the token when the session has none."""
+    emp_id = request.session.get("employee_id") if request is not None else None
+    if emp_id:
+        return f"emp:{emp_id}"
+    return "tok:" + hashlib.md5((token or "").encode()).hexdigest()
+
+
+def month_bounds(year, month):
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def months_between(start, end):
+    """(year, month) pairs covering ``start``..``end``."""
+    months, (year, month) = [], (start.year, start.month)
+    while (year, month) <= (end.year, end.month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+# ---------------- Sync ----------------
+def _minutes(value):
+    return None if value is None or value != value else int(value)   # NaN → NULL
+
+
+def _store_window(viewer, frame, window_start, window_end):
+    """Replace the viewer's rows in ``[window_start, window_end]`` with ``frame``."""
+    frame = frame[pd.to_datetime(frame["date"]).between(pd.Timestamp(window_start), pd.Timestamp(window_end))]
+    columns = {name: frame[name].to_numpy(dtype=object).tolist() for name in FRAME_COLUMNS}
+    records = [
+        AttendanceRecord(
+            viewer=viewer,
+            emp_pos=int(columns["emp_pos"][i]),
+            day_pos=int(columns["day_pos"][i]),
+            emp_name=columns["emp_name"][i],
+            employee_id=str(columns["employee_id"][i]),
+            date=pd.Timestamp(columns["date"][i]).date(),
+            is_late=bool(columns["is_late"][i]),
+            in_minutes=_minutes(columns["in_minutes"][i]),
+            out_minutes=_minutes(columns["out_minutes"][i]),
+            **{name: str(columns[name][i]) for name in _TEXT_FIELDS},
+        )
+        for i in range(len(frame))
+    ]
+    with transaction.atomic():
+        AttendanceRecord.objects.filter(viewer=viewer, date__range=(window_start, window_end)).delete()
+        AttendanceRecord.objects.bulk_create(records, batch_size=BULK_BATCH_SIZE)
+    return len(records)
+
+
+def _sync_window(viewer, year, month, today):
+    """``(window_start, window_end)`` still to fetch for this month, or None when the store is current."""
+    first, last = month_bounds(year, month)
+    if first > today:
+        return None
+    state = AttendanceSync.objects.filter(viewer=viewer, year=year, month=month).first()
+    if state and state.is_closed:
+        return None
+    if state and (timezone.now() - state.synced_at).total_seconds() < OPEN_MONTH_TTL:
+        return None
+    window_start = first
+    if state:
+        window_start = max(first, timezone.localdate(state.synced_at) - timedelta(days=DELTA_OVERLAP_DAYS))
+    return window_start, last
+
+
+def _commit_month(viewer, year, month, employees, window_start, window_end, today):
+    stored = _store_window(viewer, day_frame(employees), window_start, window_end)
+    is_closed = today > window_end + timedelta(days=CLOSE_GRACE_DAYS)
+    AttendanceSync.objects.update_or_create(
+        viewer=viewer, year=year, month=month,
+        defaults={"synced_at": timezone.now(), "is_closed": is_closed},
+    )
+    invalidate_directory(viewer)
+    logger.info(
+        "🗄️ Attendance sync %s %s-%02d: %s rows (%s → %s)%s",
+        viewer, year, month, stored, window_start, window_end, " [closed]" if is_closed else "",
+    )
+
+
+def sync_month(viewer, year, month, fetch, today=None):
+    """
+    Bring one month of the viewer's partition up to date.
+    ``fetch(start, end)`` returns the FixHR employee list for that date range.
+    """
+    today = today or timezone.localdate()
+    pending = _sync_window(viewer, year, month, today)
+    if pending:
+        window_start, window_end = pending
+        _commit_month(viewer, year, month, fetch(window_start, window_end), window_start, window_end, today)
+
+
+def sync_months(viewer, months, fetch, today=None):
+    """
+    Sync several months: stale ones are fetched from FixHR concurrently (one request per
+    month, sharing the caller's deadline), then written to SQLite one after another.
+    Returns ``{(year, month): exception}`` for months whose fetch failed.
+    """
+    today = today or timezone.localdate()
+    pending = {}
+    for year, month in months:
+        window = _sync_window(viewer, year, month, today)
+        if window:
+            pending[(year, month)] = window
+    if not pending:
+        return {}
+
+    failures = {}
+    workers = min(FETCH_WORKERS, len(pending))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="attendance-sync") as pool:
+        futures = {
+            key: fixhr_http.submit(pool, fetch, window_start, window_end)
+            for key, (window_start, window_end) in pending.items()
+        }
+        for (year, month), future in futures.items():
+            window_start, window_end = pending[(year, month)]
+            try:
+                employees = future.result()
+            except Exception as e:
+                failures[(year, month)] = e
+                continue
+            _commit_month(viewer, year, month, employees, window_start, window_end, today)
+    return failures
+
+
+# ---------------- Read ----------------
+def load_frame(viewer, start, end, employee_ids=None, predicates=()):
+    """
+    The viewer's stored rows for ``start``..``end`` as a ``day_frame``-shaped DataFrame,
+    with ``predicates`` (see ``attendance_query``) applied in SQL.
+    """
+    rows = AttendanceRecord.objects.filter(viewer=viewer, date__range=(start, end))
+    if predicates:
+        rows = rows.filter(queryset_filter(predicates))
+    if employee_ids:
+        rows = rows.filter(employee_id__in=[str(e) for e in employee_ids])
+    rows = rows.order_by("emp_pos", "date", "day_pos").values_list(*FRAME_COLUMNS)
+    return pd.DataFrame.from_records(list(rows), columns=list(FRAME_COLUMNS))
+
+
+def ensure_synced(viewer, start, end, fetch):
+    """
+    Sync every month touching ``start``..``end`` (closed ones only the first time).
+    If FixHR is down, months synced before are served from what is stored;
+    a month never synced re-raises the fetch error.
+    """
+    failures = sync_months(viewer, months_between(start, end), fetch)
+    for (year, month), e in failures.items():
+        if not AttendanceSync.objects.filter(viewer=viewer, year=year, month=month).exists():
+            raise e
+        logger.warning("⚠️ Attendance sync failed for %s-%02d, serving local rows: %s", year, month, e)
+
@@ -1,39 +1,35 @@
-from collections import deque
+from core.state_store import state
 
 # ================= FIXGPT CHAT MEMORY =================
-CHAT_HISTORY = {}   # {user_id: deque}
+# kept in the shared, bounded state store (core.state_store) under "chat" / "intent"
 
 MAX_TURNS = 6       # last 6 user+assistant messages
 
 
 def get_chat_history(user_id: str):
-    if user_id not in CHAT_HISTORY:
-        CHAT_HISTORY[user_id] = deque(maxlen=MAX_TURNS * 2)
-    return CHAT_HISTORY[user_id]
+    return state.get("chat", user_id, [])
 
 
 def add_chat(user_id: str, role: str, content: str):
-    get_chat_history(user_id).append({
+    state.append("chat", user_id, {
         "role": role,
         "content": content
-    })
+    }, max_items=MAX_TURNS * 2)
 
 
 def clear_chat_history(user_id: str):
-    CHAT_HISTORY.pop(user_id, None)
+    state.delete("chat", user_id)
 
 
 # ================= INTENT CONTEXT MEMORY =================
-INTENT_CONTEXT = {}   # {user_id: dict}
-
 
 def get_intent_context(user_id: str):
-    return INTENT_CONTEXT.get(user_id, {})
+    return state.get("intent", user_id, {})
 
 
 def set_intent_context(user_id: str, data: dict):
-    INTENT_CONTEXT[user_id] = data
+    state.set("intent", user_id, data)
 
 
 def clear_intent_context(user_id: str):
-    INTENT_CONTEXT.pop(user_id, None)
+    state.delete("intent", user_id)
@@ -0,0 +1,101 @@
+# core/chat_pipeline.py
+"""
+Overlapped stages of one classified chat request.
+
+``chat_api`` used to run its stages back to back: the classifier cascade
+(general/task → category → action, each a model call), then date extraction,
+then the handler's upstream GETs. None of the later stages depends on the
+whole cascade:
+
+* date extraction needs only the message, so it starts in a worker as soon
+  as classification does, and the ``datetime_info`` input waits for it;
+* once the cascade's category stage answers ("leave", "miss_punch" …), the
+  read-only handlers of that category are known, so their first upstream
+  GETs (``prefetch`` on ``chat_intents.register``) start while the action
+  stage is still running. The handler's own ``fixhr_http.get`` picks the
+  response up; GETs of the intents that were not chosen are cancelled (or
+  discarded, if already in flight) when the request ends.
+
+``chat.pipeline.saved_ms`` in ``/api/metrics/`` is the time per request the
+overlap took off the critical path; ``fixhr.prefetch.*`` counts started,
+used, cancelled and wasted GETs. ``CHAT_PIPELINE = False`` turns it off.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from core import fixhr_http, metrics
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_ENABLED = getattr(settings, "CHAT_PIPELINE", True)
+PIPELINE_WORKERS = getattr(settings, "CHAT_PIPELINE_WORKERS", 8)
+PREFETCH_TIMEOUT = 15   # what the list / balance handlers pass themselves
+
+EXECUTOR = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="chat-pipeline")
+
+
+class ChatPipeline:
+    """
+    Context manager around classification and dispatch of one ``ChatCall``;
+    sets ``call.pipeline`` so the ``datetime_info`` input can wait on the
+    background extraction.
+    """
+
+    def __init__(self, call, registry):
+        self.call = call
+        self.registry = registry
+        self.saved_ms = 0.0
+        self._dates = None
+        self._dates_started = None
+        self._speculation = fixhr_http.Speculation()
+
+    def __enter__(self):
+        self.call.pipeline = self
+        self._speculation.__enter__()
+        if PIPELINE_ENABLED:
+            self._dates_started = time.monotonic()
+            self._dates = fixhr_http.submit(EXECUTOR, self._extract_dates)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.call.pipeline = None
+        self._speculation.__exit__(*exc_info)
+        if self._dates is not None:
+            self._dates.cancel()
+        saved = self.saved_ms + self._speculation.saved_ms
+        metrics.observe("chat.pipeline.saved_ms", saved)
+        logger.info("chat pipeline: %.1f ms overlapped, prefetch %d used / %d unused",
+                    saved, self._speculation.hits, self._speculation.wasted)
+        return False
+
+    def _extract_dates(self):
+        info = self.call.ctx.datetime_info
+        return info, time.monotonic()
+
+    def datetime_info(self):
+        """The message's dates, from the background extraction when it has started."""
+        if self._dates is None or self._dates.cancel():
+            return self.call.ctx.datetime_info
+        asked = time.monotonic()
+        info, finished = self._dates.result()
+        self.saved_ms += (min(asked, finished) - self._dates_started) * 1000
+        return info
+
+    def on_category(self, category):
+        """Classifier hook: start the upstream GETs of ``category``'s read-only intents."""
+        if not PIPELINE_ENABLED or not self.call.token:
+            return
+        try:
+            headers = {"Accept": "application/json", "authorization": f"Bearer {self.call.token}"}
+            for intent in self.registry.prefetchable(category):
+                if not intent.likely(self.call.ctx):
+                    continue
+                for url, params, kwargs in intent.prefetch(self.call):
+                    fixhr_http.prefetch(EXECUTOR, url, params=params, headers=headers,
+                                        **{"timeout": PREFETCH_TIMEOUT, **kwargs})
+        except Exception:
+            # Speculation only: the handlers make the same calls themselves.
+            logger.exception("prefetch for category %r failed", category)
@@ -0,0 +1,136 @@
+# core/conversation_archive.py
+"""
+Cold storage for old conversations.
+
+Conversations nobody has touched for ``CONVERSATION_ARCHIVE_DAYS`` are moved
+out of the hot ``ChatMessage`` table into one compressed blob each
+(``ChatArchive``: the messages as JSON, zstd when ``zstandard`` is installed,
+zlib otherwise; the codec is stored per row so both can always be read).
+The conversation row itself stays, so the sidebar listing is unchanged. Its
+message rows are dropped from the FTS5 search index too (only the title row
+stays, so archived chats are still found by title); restoring re-indexes
+the messages.
+
+Opening an archived conversation, or saving into it (a full save or an
+append), restores its messages to ``ChatMessage`` transparently. ``manage.py archive_conversations`` does
+the archiving in batches.
+"""
+import json
+import logging
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.conversation_search import index_conversation
+from core.models import ChatArchive, ChatConversation, ChatMessage
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = getattr(settings, "CONVERSATION_ARCHIVE_DAYS", 90)
+ARCHIVE_BATCH_SIZE = 200
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 9
+
+
+def compress(raw):
+    """``(codec, data)`` for ``raw`` bytes."""
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decompress(codec, data):
+    data = bytes(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("conversation archived with zstd; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"unknown archive codec {codec!r}")
+
+
+def archive_conversation(conv_pk):
+    """
+    Move one conversation's messages into a compressed ``ChatArchive`` row.
+    Returns ``(raw_size, compressed_size)``, or None when there was nothing to archive.
+    """
+    with transaction.atomic():
+        conv = ChatConversation.objects.select_for_update().filter(pk=conv_pk, is_archived=False).first()
+        if conv is None:
+            return None
+        rows = list(conv.entries.order_by("seq").values_list("seq", "role", "text", "meta"))
+        raw = json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        codec, data = compress(raw)
+        ChatArchive.objects.create(
+            conversation=conv, codec=codec, data=data, message_count=len(rows), raw_size=len(raw),
+        )
+        conv.entries.all().delete()
+        conv.is_archived = True
+        conv.save(update_fields=["is_archived"])   # keeps timestamp: archiving is not activity
+    index_conversation(conv)   # no ChatMessage rows left: only the title stays searchable
+    return len(raw), len(data)
+
+
+def stale_conversations(days=ARCHIVE_AFTER_DAYS):
+    cutoff = timezone.now() - timedelta(days=days)
+    return ChatConversation.objects.filter(is_archived=False, timestamp__lt=cutoff)
+
+
+def archive_stale(days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE, limit=None):
+    """
+    Archive every conversation untouched for ``days``, one short transaction per conversation,
+    ``batch_size`` ids read at a time. Yields ``(archived, raw_bytes, stored_bytes)`` after each batch.
+    """
+    archived = raw_total = stored_total = 0
+    last_pk = 0
+    while limit is None or archived < limit:
+        ids = list(
+            stale_conversations(days).filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        for pk in ids:
+            if limit is not None and archived >= limit:
+                break
+            sizes = archive_conversation(pk)
+            if sizes:
+                archived += 1
+                raw_total += sizes[0]
+                stored_total += sizes[1]
+        last_pk = ids[-1]
+        yield archived, raw_total, stored_total
+
+
+def restore_conversation(conv, reindex=True):
+    """
+    Bring an archived conversation's messages back into ``ChatMessage`` (no-op when it is hot)
+    and, with ``reindex``, point its search rows at the new message ids. Returns True when
+    rows were restored.
+    """
+    if not conv.is_archived:
+        return False
+    with transaction.atomic():
+        archive = ChatArchive.objects.select_for_update().filter(conversation_id=conv.pk).first()
+        if archive is not None:
+            rows = json.loads(decompress(archive.codec, archive.data))
+            ChatMessage.objects.bulk_create(
+                [ChatMessage(conversation_id=conv.pk, seq=seq, role=role, text=text, meta=meta)
+                 for seq, role, text, meta in rows],
+                batch_size=500,
+            )
+            archive.delete()
+        ChatConversation.objects.filter(pk=conv.pk).update(is_archived=False)
+        conv.is_archived = False
+    logger.info("restored archived conversation %s", conv.conv_id)
+    if archive is not None and reindex:
+        index_conversation(conv)
+    return archive is not None
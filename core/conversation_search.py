@@ -0,0 +1,207 @@
+# core/conversation_search.py
+"""
+Conversation history search.
+
+The default backend is an SQLite FTS5 index (``core_conversation_fts``) with
+one row per stored message (rowid = ``ChatMessage.id``) plus one title row
+per conversation (rowid = ``-ChatConversation.id``), kept up to date by the
+conversation save / append / delete endpoints. An append only inserts the
+new messages' rows, so indexing cost does not grow with the conversation.
+Results are ranked by bm25 with title hits weighted higher (best row per
+conversation), every query word is a prefix match ("lea bal" finds "leave
+balance"), and the matched message comes back as a snippet.
+
+Databases without FTS5 fall back to ``ScanSearch``, a substring match over the
+stored message rows. ``CONVERSATION_SEARCH_BACKEND`` (a dotted path to a class
+with ``index`` / ``append`` / ``remove`` / ``search``) plugs in anything else.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils.module_loading import import_string
+
+from core.models import ChatConversation, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "core_conversation_fts"
+SEARCH_LIMIT = getattr(settings, "CONVERSATION_SEARCH_LIMIT", 20)
+SNIPPET_TOKENS = 16
+OVERFETCH = 5   # message rows read per wanted conversation before de-duplicating
+TITLE_WEIGHT, BODY_WEIGHT = 5.0, 1.0
+
+
+def _phrase(value):
+    return '"' + str(value).replace('"', " ") + '"'
+
+
+def match_expression(employee_id, query):
+    """
+    FTS5 query for ``query`` inside one employee's conversations: every word is a
+    quoted prefix term (so operators and punctuation typed by the user stay literal).
+    """
+    words = query.replace('"', " ").split()
+    if not words:
+        return None
+    terms = " ".join(f"{_phrase(w)}*" for w in words)
+    return f"employee_id : {_phrase(employee_id)} AND {{title body}} : ({terms})"
+
+
+def _result(conv_id, title, matched_text, timestamp):
+    return {
+        "conversation_id": conv_id,
+        "title": title,
+        "matched_text": matched_text,
+        "timestamp": timestamp.isoformat(),
+    }
+
+
+class ScanSearch:
+    """Substring match over the stored message rows; no index to maintain."""
+
+    def index(self, conv):
+        pass
+
+    def append(self, conv, rows):
+        pass
+
+    def remove(self, employee_id, conv_ids):
+        pass
+
+    def search(self, employee_id, query, limit=SEARCH_LIMIT):
+        results, seen = [], set()
+        rows = (
+            ChatMessage.objects.filter(conversation__employee_id=employee_id, text__icontains=query)
+            .order_by("-conversation__timestamp", "conversation_id", "seq")
+            .values_list("conversation_id", "conversation__conv_id", "conversation__title", "text",
+                         "conversation__timestamp")
+            .iterator(chunk_size=100)
+        )
+        for pk, conv_id, title, text, timestamp in rows:
+            if pk in seen:
+                continue  # only one match per conversation
+            seen.add(pk)
+            results.append(_result(conv_id, title, text[:150], timestamp))
+            if len(results) >= limit:
+                break
+        return results
+
+
+class Fts5Search:
+    """SQLite FTS5 index over conversation titles and message text."""
+
+    @staticmethod
+    def available():
+        if connection.vendor != "sqlite":
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            return cursor.fetchone() is not None
+
+    @staticmethod
+    def _delete_conversations(cursor, conv_ids):
+        for conv_id in conv_ids:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN "
+                f"(SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND conv_id = %s)",
+                [f"conv_id : {_phrase(conv_id)}", conv_id],
+            )
+
+    @staticmethod
+    def _insert(cursor, conv, rows):
+        """Title row for ``conv`` (replaced) plus one row per ``(message_id, text)``."""
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [-conv.pk])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, conv_id, employee_id, title, body) VALUES (%s, %s, %s, %s, %s)",
+            [(-conv.pk, conv.conv_id, conv.employee_id, conv.title, "")]
+            + [(pk, conv.conv_id, conv.employee_id, "", text) for pk, text in rows],
+        )
+
+    def index(self, conv):
+        rows = conv.entries.order_by("seq").values_list("pk", "text")
+        with connection.cursor() as cursor:
+            self._delete_conversations(cursor, [conv.conv_id])
+            self._insert(cursor, conv, list(rows))
+
+    def append(self, conv, rows):
+        """Index newly stored ``ChatMessage`` rows (and the possibly new title)."""
+        with connection.cursor() as cursor:
+            self._insert(cursor, conv, [(row.pk, row.text) for row in rows])
+
+    def remove(self, employee_id, conv_ids):
+        with connection.cursor() as cursor:
+            self._delete_conversations(cursor, list(conv_ids))
+
+    def search(self, employee_id, query, limit=SEARCH_LIMIT):
+        expression = match_expression(employee_id, query)
+        if not expression:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT conv_id, snippet({FTS_TABLE}, 3, '', '', '…', {SNIPPET_TOKENS}) "
+                f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY bm25({FTS_TABLE}, 0, 0, {TITLE_WEIGHT}, {BODY_WEIGHT}) LIMIT %s",
+                [expression, limit * OVERFETCH],
+            )
+            hits = {}
+            for conv_id, snippet in cursor.fetchall():
+                hits.setdefault(conv_id, snippet)   # rows come best-first: keep each conversation's best
+        if not hits:
+            return []
+        meta = {
+            row["conv_id"]: row
+            for row in ChatConversation.objects.filter(
+                employee_id=employee_id, conv_id__in=list(hits)
+            ).values("conv_id", "title", "timestamp")
+        }
+        return [
+            _result(conv_id, meta[conv_id]["title"], snippet or meta[conv_id]["title"], meta[conv_id]["timestamp"])
+            for conv_id, snippet in hits.items()
+            if conv_id in meta
+        ][:limit]
+
+
+_BACKEND = None
+_BACKEND_LOCK = threading.Lock()
+
+
+def search_backend():
+    """The configured backend, else FTS5 when its table exists, else the scan fallback."""
+    global _BACKEND
+    with _BACKEND_LOCK:
+        if _BACKEND is None:
+            path = getattr(settings, "CONVERSATION_SEARCH_BACKEND", None)
+            if path:
+                _BACKEND = import_string(path)()
+            else:
+                _BACKEND = Fts5Search() if Fts5Search.available() else ScanSearch()
+        return _BACKEND
+
+
+def index_conversation(conv):
+    """Refresh ``conv`` in the search index; a failure is logged, never raised into the save."""
+    try:
+        search_backend().index(conv)
+    except DatabaseError:
+        logger.warning("search index update failed for %s", conv.conv_id, exc_info=True)
+
+
+def index_appended(conv, rows):
+    try:
+        search_backend().append(conv, rows)
+    except DatabaseError:
+        logger.warning("search index append failed for %s", conv.conv_id, exc_info=True)
+
+
+def unindex_conversations(employee_id, conv_ids):
+    try:
+        search_backend().remove(employee_id, conv_ids)
+    except DatabaseError:
+        logger.warning("search index delete failed for %s", list(conv_ids), exc_info=True)
+
+
+def search_conversations(employee_id, query, limit=SEARCH_LIMIT):
+    """Ranked ``[{conversation_id, title, matched_text, timestamp}]`` for ``query``."""
+    return search_backend().search(employee_id, query, limit)
@@ -0,0 +1,303 @@
+# core/conversation_writer.py
+"""
+Write-behind queue for conversation saves.
+
+The save / append endpoints validate the request, queue it here and answer
+at once; a background thread writes the queue to the database. Every save to
+the same conversation that arrives within ``CONVERSATION_FLUSH_INTERVAL`` is
+coalesced into one pending write (appends are concatenated, a full-array
+save replaces whatever was pending), and each flush writes up to
+``CONVERSATION_FLUSH_BATCH`` conversations in one transaction. With SQLite
+that turns many small competing write transactions into a few larger ones
+from one thread.
+
+* Reads of an employee's conversations call ``flush(employee_id=...)``
+  first, so a client always reads its own writes.
+* The sequence check of an append (``base``) runs against the count the
+  conversation will have once its pending writes land.
+* A batch that fails on a locked database is put back in the queue and
+  retried on the next tick; anything still pending is written at interpreter
+  exit (``atexit``).
+* ``conversations.write_behind`` in ``/api/metrics/`` reports queue depth and
+  the age of the oldest pending save.
+
+The queue is per process; set ``CONVERSATION_WRITE_BEHIND = False`` to write
+synchronously on the request thread instead.
+"""
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, OperationalError, close_old_connections, transaction
+
+from core import metrics
+from core.conversation_search import index_appended, index_conversation
+from core.conversations import SequenceConflict, append_messages, replace_messages, stored_message_count
+from core.models import ChatConversation
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND = getattr(settings, "CONVERSATION_WRITE_BEHIND", True)
+FLUSH_INTERVAL = getattr(settings, "CONVERSATION_FLUSH_INTERVAL", 0.5)   # seconds saves may coalesce
+FLUSH_BATCH = getattr(settings, "CONVERSATION_FLUSH_BATCH", 200)         # conversations per transaction
+SHUTDOWN_TIMEOUT = 10
+
+
+class PendingSave:
+    """Everything still to be written for one conversation."""
+
+    __slots__ = ("employee_id", "conv_id", "kind", "messages", "count", "create", "queued_at")
+
+    def __init__(self, employee_id, conv_id, kind, messages, count, create):
+        self.employee_id = str(employee_id)
+        self.conv_id = conv_id
+        self.kind = kind              # "append" (messages after the stored ones) or "replace" (all of them)
+        self.messages = messages
+        self.count = count            # message_count once this is written
+        self.create = create          # conversation row does not exist yet
+        self.queued_at = time.monotonic()
+
+    def merge(self, newer):
+        """Fold a later save of the same conversation into this one."""
+        if newer.kind == "replace":
+            self.kind, self.messages = "replace", newer.messages
+        else:
+            self.messages = self.messages + newer.messages
+        self.count = newer.count
+
+
+class WriteBehindQueue:
+    def __init__(self, interval=FLUSH_INTERVAL, batch_size=FLUSH_BATCH):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._pending = OrderedDict()      # conv_id → PendingSave, oldest first
+        self._inflight = {}                # conv_id → PendingSave being written right now
+        self._lock = threading.Lock()      # guards _pending / _inflight / _flushes
+        self._flushes = 0                  # batches finished (written or put back)
+        self._write_lock = threading.Lock()  # one writer at a time (worker or a read-your-writes flush)
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    # ---------------- enqueue ----------------
+
+    @contextmanager
+    def _current_count(self, employee_id, conv_id):
+        """
+        Hold ``_lock`` with the message count the conversation will have once queued writes land.
+        The stored count is read from the database without the lock, so other enqueues never
+        wait on it; if a batch finished meanwhile, the count is read again.
+        """
+        stored = None
+        while True:
+            with self._lock:
+                entry = self._pending.get(conv_id) or self._inflight.get(conv_id)
+                if entry is not None:
+                    if entry.employee_id != str(employee_id):
+                        raise ChatConversation.DoesNotExist(conv_id)
+                    yield entry.count
+                    return
+                if stored is not None and stored[0] == self._flushes:
+                    yield stored[1]
+                    return
+                generation = self._flushes
+            stored = (generation, stored_message_count(employee_id, conv_id))
+
+    def _queue(self, save):
+        entry = self._pending.get(save.conv_id)
+        if entry is None:
+            self._pending[save.conv_id] = save
+        else:
+            entry.merge(save)
+            metrics.incr("conversations.write_behind.coalesced")
+        metrics.incr("conversations.write_behind.enqueued")
+
+    def append(self, employee_id, conv_id, messages, base=None):
+        """
+        Queue an append; returns ``(conv_id, message_count)`` as they will be once written.
+        Raises ``SequenceConflict`` / ``ChatConversation.DoesNotExist`` like ``append_messages``.
+        """
+        messages = [m for m in messages if isinstance(m, dict)]
+        if not WRITE_BEHIND:
+            conv, rows = append_messages(employee_id, conv_id, messages, base)
+            index_appended(conv, rows)
+            return conv.conv_id, conv.message_count
+        if not conv_id:
+            conv_id, count = str(uuid.uuid4()), len(messages)
+            if base is not None and int(base) != 0:
+                raise SequenceConflict(0)
+            with self._lock:
+                self._queue(PendingSave(employee_id, conv_id, "append", messages, count, True))
+        else:
+            with self._current_count(employee_id, conv_id) as current:
+                if base is not None and int(base) != current:
+                    raise SequenceConflict(current)
+                count = current + len(messages)
+                self._queue(PendingSave(employee_id, conv_id, "append", messages, count, False))
+        self._start()
+        return conv_id, count
+
+    def replace(self, employee_id, conv_id, messages):
+        """Queue a full-array save; returns ``(conv_id, message_count)``."""
+        messages = [m for m in messages if isinstance(m, dict)]
+        if not WRITE_BEHIND:
+            conv = replace_messages(employee_id, conv_id, messages)
+            index_conversation(conv)
+            return conv.conv_id, conv.message_count
+        if not conv_id:
+            conv_id = str(uuid.uuid4())
+            with self._lock:
+                self._queue(PendingSave(employee_id, conv_id, "replace", messages, len(messages), True))
+        else:
+            with self._current_count(employee_id, conv_id):   # ownership / existence check
+                self._queue(PendingSave(employee_id, conv_id, "replace", messages, len(messages), False))
+        self._start()
+        return conv_id, len(messages)
+
+    # ---------------- flushing ----------------
+
+    def _take(self, match, limit=None):
+        """Move matching pending saves to in-flight, oldest first (caller holds ``_write_lock``)."""
+        with self._lock:
+            keys = [k for k, e in self._pending.items() if match(e)][:limit]
+            batch = [self._pending.pop(k) for k in keys]
+            self._inflight.update((e.conv_id, e) for e in batch)
+        return batch
+
+    def _write(self, batch):
+        """Write one batch in a single transaction; a locked database puts the batch back."""
+        started = time.perf_counter()
+        written, failed = [], []
+        try:
+            with transaction.atomic():
+                for save in batch:
+                    try:
+                        with transaction.atomic():
+                            if save.kind == "append":
+                                written.append((save, *append_messages(
+                                    save.employee_id, save.conv_id, save.messages, create=save.create)))
+                            else:
+                                written.append((save, replace_messages(
+                                    save.employee_id, save.conv_id, save.messages, create=save.create), None))
+                    except OperationalError:
+                        raise
+                    except (ChatConversation.DoesNotExist, DatabaseError):
+                        # conversation deleted meanwhile, or a bad row; nothing to retry
+                        logger.warning("dropping queued save for %s", save.conv_id, exc_info=True)
+                        failed.append(save)
+        except OperationalError:
+            logger.warning("conversation flush of %d saves failed, retrying", len(batch), exc_info=True)
+            metrics.incr("conversations.write_behind.retried")
+            self._requeue(batch)
+            return False
+        finally:
+            with self._lock:
+                for save in batch:
+                    self._inflight.pop(save.conv_id, None)
+                self._flushes += 1
+
+        for save, conv, rows in written:
+            if save.kind == "append":
+                index_appended(conv, rows)
+            else:
+                index_conversation(conv)
+        metrics.incr("conversations.write_behind.flushed", len(written))
+        if failed:
+            metrics.incr("conversations.write_behind.dropped", len(failed))
+        metrics.observe("conversations.write_behind.flush_ms", (time.perf_counter() - started) * 1000)
+        return True
+
+    def _requeue(self, batch):
+        """Put a failed batch back ahead of anything queued for the same conversations since."""
+        with self._lock:
+            for save in batch:
+                newer = self._pending.pop(save.conv_id, None)
+                if newer is not None:
+                    save.merge(newer)
+                self._pending[save.conv_id] = save
+                self._pending.move_to_end(save.conv_id, last=False)
+
+    def flush(self, employee_id=None, conv_ids=None):
+        """
+        Write pending saves now (all, one employee's, or the given conversations) and wait for
+        any in-flight write of them. Returns False if a batch had to be put back.
+        """
+        conv_ids = set(conv_ids) if conv_ids is not None else None
+
+        def match(save):
+            return ((employee_id is None or save.employee_id == str(employee_id))
+                    and (conv_ids is None or save.conv_id in conv_ids))
+
+        with self._lock:
+            if not any(match(e) for e in self._pending.values()) \
+                    and not any(match(e) for e in self._inflight.values()):
+                return True
+        with self._write_lock:
+            while True:
+                batch = self._take(match, self.batch_size)
+                if not batch:
+                    return True
+                if not self._write(batch):
+                    return False
+
+    # ---------------- worker ----------------
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None and not self._stopping:
+                    self._thread = threading.Thread(target=self._run, name="conversation-writer", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.shutdown)
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            if not self._stopping:
+                time.sleep(self.interval)   # let saves to the same conversation coalesce
+            self._wake.clear()
+            try:
+                with self._write_lock:
+                    while True:
+                        batch = self._take(lambda save: True, self.batch_size)
+                        if not batch:
+                            break
+                        if not self._write(batch):
+                            self._wake.set()   # retry on the next tick
+                            break
+            except Exception:
+                logger.exception("conversation writer failed")
+            finally:
+                close_old_connections()
+            if self._stopping:
+                return
+
+    def shutdown(self):
+        """Stop the worker and write everything still queued (registered with ``atexit``)."""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(SHUTDOWN_TIMEOUT)
+        for _ in range(3):
+            if self.flush():
+                break
+
+    def stats(self):
+        with self._lock:
+            oldest = next(iter(self._pending.values()), None)
+            return {
+                "pending": len(self._pending),
+                "inflight": len(self._inflight),
+                "oldest_age_s": round(time.monotonic() - oldest.queued_at, 3) if oldest else 0.0,
+            }
+
+
+writer = WriteBehindQueue()
+
+metrics.register_gauge("conversations.write_behind", writer.stats)
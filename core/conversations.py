@@ -0,0 +1,198 @@
+# core/conversations.py
+"""
+Chat conversation storage helpers.
+
+Messages are stored one row each in ``ChatMessage`` (``seq`` 0, 1, 2, ...)
+and ``ChatConversation.message_count`` is the next sequence number. The chat
+UI sends only the messages added since its last save (``append_messages``),
+so a save costs the size of the new messages rather than the whole history;
+``replace_messages`` keeps the older full-array save working and rewrites
+only the rows after the first message that differs. Opening a conversation
+reads only its newest messages (``message_page``) through the
+``(conversation, seq)`` unique index; older pages follow with the returned
+cursor.
+
+The sidebar listing reads only ``conv_id`` / ``title`` / ``timestamp`` (the
+``messages`` JSON is never fetched) and walks the ``(employee_id, -timestamp, -id)``
+index with a keyset cursor, so one page costs the same however long the
+employee's history is.
+"""
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from core.conversation_archive import restore_conversation
+from core.models import ChatConversation, ChatMessage
+
+LIST_PAGE_SIZE = getattr(settings, "CONVERSATION_PAGE_SIZE", 30)
+MAX_LIST_PAGE_SIZE = 200
+MESSAGE_PAGE_SIZE = getattr(settings, "CONVERSATION_MESSAGE_PAGE_SIZE", 50)
+MAX_MESSAGE_PAGE_SIZE = 500
+
+
+def make_list_cursor(timestamp, pk):
+    """Keyset cursor for the row after (timestamp, pk) in newest-first order."""
+    return f"{int(timestamp.timestamp() * 1_000_000)}.{pk}"
+
+
+def parse_list_cursor(cursor):
+    """``(timestamp, pk)`` or None for a malformed cursor."""
+    micros, _, pk = (cursor or "").partition(".")
+    if not micros.isdigit() or not pk.isdigit():
+        return None
+    timestamp = datetime.fromtimestamp(int(micros) / 1_000_000, tz=dt_timezone.utc)
+    return timestamp, int(pk)
+
+
+def list_conversations(employee_id, limit=LIST_PAGE_SIZE, cursor=None):
+    """
+    ``{"conversations": [...], "next_cursor": ..., "total": n}`` newest first.
+    Raises ValueError for a malformed cursor.
+    """
+    limit = min(max(int(limit), 1), MAX_LIST_PAGE_SIZE)
+    owned = ChatConversation.objects.filter(employee_id=employee_id)
+    rows = owned
+    if cursor:
+        after = parse_list_cursor(cursor)
+        if after is None:
+            raise ValueError("invalid cursor")
+        timestamp, pk = after
+        rows = rows.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, pk__lt=pk))
+    page = list(
+        rows.order_by("-timestamp", "-pk").values("pk", "conv_id", "title", "timestamp")[:limit + 1]
+    )
+    more = len(page) > limit
+    page = page[:limit]
+    return {
+        "conversations": [
+            {"id": row["conv_id"], "title": row["title"], "timestamp": row["timestamp"].isoformat()}
+            for row in page
+        ],
+        "next_cursor": make_list_cursor(page[-1]["timestamp"], page[-1]["pk"]) if more else None,
+        "total": owned.count(),
+    }
+
+
+NEW_CHAT_TITLE = "New Chat"
+
+
+class SequenceConflict(Exception):
+    """The client's count of stored messages is not the server's (another tab saved in between)."""
+
+    def __init__(self, message_count):
+        super().__init__(f"conversation has {message_count} messages")
+        self.message_count = message_count
+
+
+def split_message(message):
+    """``(role, text, meta)`` for a UI message dict; every key besides role/text goes to ``meta``."""
+    return (
+        str(message.get("role") or ""),
+        str(message.get("text") or ""),
+        {k: v for k, v in message.items() if k not in ("role", "text")},
+    )
+
+
+def conversation_title(messages):
+    first_user_msg = next((m.get("text") or "" for m in messages if m.get("role") == "user"), "")
+    if not first_user_msg:
+        return NEW_CHAT_TITLE
+    return first_user_msg[:50] + ("..." if len(first_user_msg) > 50 else "")
+
+
+def message_page(conv, before=None, limit=MESSAGE_PAGE_SIZE):
+    """
+    The newest ``limit`` messages with ``seq < before`` (all of the conversation when ``before``
+    is None), oldest first, with ``older_cursor`` for the page before them (None at the start).
+    """
+    limit = min(max(int(limit), 1), MAX_MESSAGE_PAGE_SIZE)
+    rows = conv.entries.all()
+    if before is not None:
+        rows = rows.filter(seq__lt=int(before))
+    page = list(rows.order_by("-seq").values_list("seq", "role", "text", "meta")[:limit])
+    page.reverse()
+    first_seq = page[0][0] if page else (int(before) if before is not None else conv.message_count)
+    return {
+        "messages": [{"role": role, "text": text, **meta} for _, role, text, meta in page],
+        "first_seq": first_seq,
+        "older_cursor": str(first_seq) if first_seq > 0 else None,
+    }
+
+
+def _rows(conv, first_seq, messages):
+    rows = []
+    for seq, message in enumerate(messages, first_seq):
+        role, text, meta = split_message(message)
+        rows.append(ChatMessage(conversation=conv, seq=seq, role=role, text=text, meta=meta))
+    return rows
+
+
+def _conversation(employee_id, conv_id, create=False):
+    """
+    The employee's conversation (locked for the transaction). A new one is created when
+    ``conv_id`` is empty, or under that id when ``create`` is set and it does not exist yet.
+    """
+    if not conv_id:
+        conv_id, create = str(uuid.uuid4()), True
+    if not create:
+        return ChatConversation.objects.select_for_update().get(conv_id=conv_id, employee_id=employee_id)
+    conv, _ = ChatConversation.objects.get_or_create(
+        conv_id=conv_id, defaults={"employee_id": employee_id, "title": NEW_CHAT_TITLE, "messages": []},
+    )
+    if str(conv.employee_id) != str(employee_id):
+        raise ChatConversation.DoesNotExist(conv_id)
+    return conv
+
+
+def stored_message_count(employee_id, conv_id):
+    """``message_count`` of the employee's conversation; raises ``ChatConversation.DoesNotExist``."""
+    return ChatConversation.objects.values_list("message_count", flat=True).get(
+        conv_id=conv_id, employee_id=employee_id,
+    )
+
+
+def append_messages(employee_id, conv_id, messages, base=None, create=False):
+    """
+    Append ``messages`` to the conversation (created when ``conv_id`` is empty, see
+    ``_conversation`` for ``create``); returns
+    ``(conv, new ChatMessage rows)``. ``base`` is how many messages the client believes are
+    stored; a mismatch raises ``SequenceConflict`` and nothing is written.
+    Raises ``ChatConversation.DoesNotExist``.
+    """
+    messages = [m for m in messages if isinstance(m, dict)]
+    with transaction.atomic():
+        conv = _conversation(employee_id, conv_id, create)
+        if base is not None and int(base) != conv.message_count:
+            raise SequenceConflict(conv.message_count)
+        restore_conversation(conv)   # archived: the older messages come back (and into the index) first
+        rows = ChatMessage.objects.bulk_create(_rows(conv, conv.message_count, messages))
+        conv.message_count += len(messages)
+        if conv.title == NEW_CHAT_TITLE:
+            conv.title = conversation_title(messages)
+        conv.save(update_fields=["message_count", "title", "timestamp"])
+    return conv, rows
+
+
+def replace_messages(employee_id, conv_id, messages, create=False):
+    """
+    Full-array save: store exactly ``messages``, keeping the rows of the unchanged prefix
+    and rewriting only from the first message that differs. Raises ``ChatConversation.DoesNotExist``.
+    """
+    messages = [m for m in messages if isinstance(m, dict)]
+    wanted = [split_message(m) for m in messages]
+    with transaction.atomic():
+        conv = _conversation(employee_id, conv_id, create)
+        restore_conversation(conv, reindex=False)   # the caller re-indexes after a full save
+        stored = list(conv.entries.order_by("seq").values_list("role", "text", "meta"))
+        keep = 0
+        while keep < min(len(stored), len(wanted)) and tuple(stored[keep]) == wanted[keep]:
+            keep += 1
+        conv.entries.filter(seq__gte=keep).delete()
+        ChatMessage.objects.bulk_create(_rows(conv, keep, messages[keep:]))
+        conv.message_count = len(messages)
+        conv.title = conversation_title(messages)
+        conv.save(update_fields=["message_count", "title", "timestamp"])
+    return conv
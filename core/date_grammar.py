@@ -0,0 +1,271 @@
+# core/date_grammar.py
+"""
+Compiled grammar for the date and time phrases the chat actually receives.
+
+``dateparser`` takes milliseconds per call and most of a second to import,
+but nearly every message uses a handful of forms. Those are matched here by
+regexes compiled once at import:
+
+* dates — "10 jan", "10th january 2026", "jan 10", "10/12/2025" (day first),
+  "10-12-25", "10.12.2025" (dotted only with a year), "2025-12-10", "today" / "aaj", "tomorrow" / "kal", "parso",
+  "yesterday", "next friday", "this fri", "last monday";
+* weeks — "last week", "this week", "next week" (Monday to Sunday);
+* times — "9 am", "9:45 am", "9.45pm", "17:30";
+* ranges — "<date> to / till / until / se <date> [tak]", and the week phrases.
+
+With ``prefer_future=True`` (``extract_datetime_info``: leave requests are
+about the future) year-less dates more than a month in the past roll over to
+next year; by default they stay in the reference year, like a plain
+``dateparser.parse``. ``dateparser`` is imported and called
+only when the grammar finds nothing and the text still looks like it could
+hold a date (``dates.dateparser_fallback`` in ``/api/metrics/`` counts those
+calls). ``python -m core.date_grammar`` runs the benchmark corpus.
+"""
+import re
+from datetime import datetime, time, timedelta
+
+from core import metrics
+
+MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3,
+    "apr": 4, "april": 4, "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7,
+    "aug": 8, "august": 8, "sep": 9, "sept": 9, "september": 9, "oct": 10, "october": 10,
+    "nov": 11, "november": 11, "dec": 12, "december": 12,
+}
+WEEKDAYS = {
+    "mon": 0, "monday": 0, "tue": 1, "tues": 1, "tuesday": 1, "wed": 2, "wednesday": 2,
+    "thu": 3, "thur": 3, "thurs": 3, "thursday": 3, "fri": 4, "friday": 4,
+    "sat": 5, "saturday": 5, "sun": 6, "sunday": 6,
+}
+RELATIVE_DAYS = {
+    "day before yesterday": -2, "day after tomorrow": 2,
+    "today": 0, "aaj": 0, "tomorrow": 1, "tommorow": 1, "tomorow": 1, "tmrw": 1, "kal": 1,
+    "parso": 2, "yesterday": -1,
+}
+NEXT_WORDS = {"next": "next", "coming": "next", "agle": "next", "this": "this", "last": "last", "pichle": "last"}
+
+FALLBACK_SETTINGS = {"DATE_ORDER": "DMY"}
+ROLLOVER_DAYS = 30   # prefer_future: a year-less date further back than this means next year
+
+
+def _alternation(words):
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+_MONTH = _alternation(MONTHS)
+_WEEKDAY = _alternation(WEEKDAYS)
+_ORDINAL = r"(?:st|nd|rd|th)?"
+# "2-3 days", "1-2 hrs": a count range, not a day-month date
+_NOT_DURATION = r"(?!\s*(?:days?|din|hrs?|hours?|ghante|ghanta|weeks?|months?)\b)"
+# A full date right after a weekday ("Wed, 15 Oct 2025"): the date wins, the weekday is skipped
+_DATE_AHEAD = rf"""(?=\.?,?\s+(?:
+    \d{{1,2}}{_ORDINAL}\s*(?:of\s+)?(?:{_MONTH})\b | (?:{_MONTH})\.?\s+\d | \d{{1,2}}[/.-]\d{{1,2}} | \d{{4}}-\d
+))"""
+
+# One pass over the text; alternatives are tried in order at each position, the leftmost match wins.
+# Dotted dates need a year: "9.5" or "9.12" in chat are hours or amounts far more often than dates.
+DATE_RE = re.compile(rf"""
+    \b(?:
+        (?P<iso>(?P<iso_y>\d{{4}})-(?P<iso_m>\d{{1,2}})-(?P<iso_d>\d{{1,2}}))
+      | (?P<dot>(?P<dot_d>\d{{1,2}})\.(?P<dot_m>\d{{1,2}})\.(?P<dot_y>\d{{4}}|\d{{2}}))
+      | (?P<num>(?P<num_d>\d{{1,2}})[/-](?P<num_m>\d{{1,2}})(?:[/-](?P<num_y>\d{{4}}|\d{{2}}))?{_NOT_DURATION})
+      | (?P<dm>(?P<dm_d>\d{{1,2}}){_ORDINAL}\s*(?:of\s+)?(?P<dm_m>{_MONTH})\.?(?:,?\s+(?P<dm_y>\d{{4}}))?)
+      | (?P<md>(?P<md_m>{_MONTH})\.?\s+(?P<md_d>\d{{1,2}}){_ORDINAL}(?:,?\s+(?P<md_y>\d{{4}}))?)
+      | (?P<rel>{_alternation(RELATIVE_DAYS)})
+      | (?P<wk>(?P<wk_q>last|this|next|pichle|agle)\s+(?:week|hafte|hafta))
+      | (?P<wd>(?:(?P<wd_q>{_alternation(NEXT_WORDS)})\s+)?(?P<wd_n>{_WEEKDAY})\b(?!{_DATE_AHEAD}))
+    )\b
+""", re.X)
+
+CLOCK_RE = re.compile(r"""
+    \b(?P<h>\d{1,2})(?:[:.](?P<m>\d{2}))?\s*(?P<ap>[ap])\.?m\b\.?
+  | \b(?P<h24>\d{1,2}):(?P<m24>\d{2})(?::\d{2})?\b
+""", re.X)
+
+RANGE_SEP_RE = re.compile(r"\s+(?:to|till|until|upto|up\s+to|se|-|–)\s+")
+TAK_RE = re.compile(r"\s+tak\b")
+# Left over after a grammar miss: only worth asking dateparser when there is a number or a period word.
+FALLBACK_HINT_RE = re.compile(r"\d|\b(?:ago|days?|weeks?|months?|years?|fortnight)\b")
+
+
+def _reference(ref):
+    return ref or datetime.now()
+
+
+def _calendar_date(year, month, day, explicit_year, ref, context_year=None, prefer_future=False):
+    if not explicit_year:
+        year = context_year or ref.year
+    elif year < 100:
+        year += 2000
+    try:
+        value = datetime(year, month, day).date()
+        if prefer_future and not explicit_year and (ref.date() - value).days > ROLLOVER_DAYS:
+            value = value.replace(year=year + 1)
+    except ValueError:
+        return None
+    return value
+
+
+def _weekday(ref, target, qualifier):
+    today = ref.weekday()
+    if qualifier == "last":
+        delta = -((today - target) % 7 or 7)
+    else:
+        delta = (target - today) % 7
+        if delta == 0 and qualifier != "this":
+            delta = 7
+    return ref.date() + timedelta(days=delta)
+
+
+def _week(ref, qualifier):
+    monday = ref.date() - timedelta(days=ref.weekday())
+    monday += timedelta(weeks={"last": -1, "pichle": -1, "next": 1, "agle": 1}.get(qualifier, 0))
+    return monday, monday + timedelta(days=6)
+
+
+def _match_date(m, ref, context_year=None, prefer_future=False):
+    """``(date, explicit_year)`` for one ``DATE_RE`` match."""
+    if m.group("iso"):
+        return _calendar_date(int(m.group("iso_y")), int(m.group("iso_m")), int(m.group("iso_d")), True, ref), True
+    if m.group("dot"):
+        return _calendar_date(int(m.group("dot_y")), int(m.group("dot_m")), int(m.group("dot_d")), True, ref), True
+    if m.group("num"):
+        year = m.group("num_y")
+        return _calendar_date(int(year or 0), int(m.group("num_m")), int(m.group("num_d")), bool(year), ref,
+                              context_year, prefer_future), bool(year)
+    if m.group("dm") or m.group("md"):
+        p = "dm" if m.group("dm") else "md"
+        year = m.group(f"{p}_y")
+        return _calendar_date(int(year or 0), MONTHS[m.group(f"{p}_m")], int(m.group(f"{p}_d")), bool(year), ref,
+                              context_year, prefer_future), bool(year)
+    if m.group("rel"):
+        return ref.date() + timedelta(days=RELATIVE_DAYS[m.group("rel")]), True
+    if m.group("wk"):
+        return _week(ref, m.group("wk_q"))[0], True
+    return _weekday(ref, WEEKDAYS[m.group("wd_n")], NEXT_WORDS.get(m.group("wd_q"))), True
+
+
+def parse_date(text, ref=None, context_year=None, prefer_future=False):
+    """First date in ``text`` (lower-cased), or None. Never calls dateparser."""
+    m = DATE_RE.search(text.lower())
+    return _match_date(m, _reference(ref), context_year, prefer_future)[0] if m else None
+
+
+def parse_range(text, ref=None, prefer_future=False):
+    """
+    ``(start, end)`` for "<date> to <date>" (to / till / until / upto / se … tak / " - ")
+    and for "last / this / next week"; None when ``text`` is not a range.
+    """
+    ref = _reference(ref)
+    s = TAK_RE.sub("", text.lower())
+    parts = RANGE_SEP_RE.split(s, maxsplit=1)
+    if len(parts) == 2:
+        first = DATE_RE.search(parts[0])
+        second = DATE_RE.search(parts[1])
+        if first and second:
+            start, _ = _match_date(first, ref, prefer_future=prefer_future)
+            end, explicit = _match_date(second, ref, start.year if start else None, prefer_future)
+            if start and end:
+                if end < start and not explicit:
+                    end = end.replace(year=end.year + 1)   # "20 dec to 5 jan"
+                return start, end
+    m = DATE_RE.search(s)
+    if m and m.group("wk"):
+        return _week(ref, m.group("wk_q"))
+    return None
+
+
+def _clock(hour, minute, meridiem=None):
+    hour, minute = int(hour), int(minute or 0)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "p" else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return time(hour, minute)
+
+
+def _match_clock(m):
+    if m.group("h") is not None:
+        return _clock(m.group("h"), m.group("m"), m.group("ap"))
+    return _clock(m.group("h24"), m.group("m24"))
+
+
+def parse_time(text):
+    """``"HH:MM"`` for a time like "9 am", "9:45pm" or "17:30", else None."""
+    m = CLOCK_RE.fullmatch(text.strip().lower())
+    value = _match_clock(m) if m else None
+    return value.strftime("%H:%M") if value else None
+
+
+def dateparser_parse(text, ref=None, prefer_future=False):
+    """The last resort: ``dateparser.parse`` day first (future dates preferred with ``prefer_future``)."""
+    import dateparser   # slow to import; only loaded once a phrase falls through the grammar
+
+    metrics.incr("dates.dateparser_fallback")
+    settings = {**FALLBACK_SETTINGS, "RELATIVE_BASE": _reference(ref)}
+    if prefer_future:
+        settings["PREFER_DATES_FROM"] = "future"
+    return dateparser.parse(text, settings=settings)
+
+
+def parse_datetime(text, ref=None, prefer_future=False):
+    """
+    Drop-in for ``dateparser.parse(text)``: a date (and an optional clock time after
+    it) from the grammar, a bare time on the reference day, else dateparser when the
+    text has digits or period words. Returns a naive ``datetime`` or None.
+    """
+    ref = _reference(ref)
+    s = str(text).strip().lower()
+    clock = CLOCK_RE.fullmatch(s)
+    if clock and _match_clock(clock):
+        return datetime.combine(ref.date(), _match_clock(clock))
+    m = DATE_RE.search(s)
+    if m:
+        day, _ = _match_date(m, ref, prefer_future=prefer_future)
+        if day is not None:
+            clock = CLOCK_RE.search(s, m.end())
+            at = _match_clock(clock) if clock else None
+            return datetime.combine(day, at or time())
+    if not s or not FALLBACK_HINT_RE.search(s):
+        return None
+    return dateparser_parse(s, ref, prefer_future)
+
+
+# =========================================================
+# BENCHMARK — python -m core.date_grammar
+# =========================================================
+BENCHMARK_CORPUS = [
+    "10 jan", "10th january 2026", "jan 10", "15 Oct", "20 december 2026", "10/12/2025", "10-12-25",
+    "2025-12-10", "2025-12-10 9:45 am", "today", "aaj", "kal", "parso", "tomorrow", "yesterday",
+    "day after tomorrow", "next friday", "this fri", "last monday", "monday", "last week", "next week",
+    "9 am", "9:45 am", "6.30pm", "17:30", "leave from 10 jan to 15 jan", "kal se parso tak",
+    "10/12/2025 till 15/12/2025", "10.12.2025", "3 days ago",
+    "Wed, 15 Oct 2025",   # the full date, not next Wednesday
+    "work 9.5 hours", "9.12", "apply leave for 2-3 days",   # negatives: counts and decimals, not dates
+]
+
+if __name__ == "__main__":
+    import statistics
+    import timeit
+
+    rounds = 200
+    grammar_us, parser_us = [], []
+    print(f"{'phrase':32} {'grammar':>22} {'µs':>7}   {'dateparser':>22} {'µs':>9}")
+    def grammar(phrase):
+        return parse_range(phrase, prefer_future=True) or parse_datetime(phrase, prefer_future=True)
+
+    for phrase in BENCHMARK_CORPUS:
+        fast = grammar(phrase)
+        slow = dateparser_parse(phrase, prefer_future=True)
+        fast_t = timeit.timeit(lambda: grammar(phrase), number=rounds) / rounds * 1e6
+        slow_t = timeit.timeit(lambda: dateparser_parse(phrase, prefer_future=True),
+                               number=rounds // 10) / (rounds // 10) * 1e6
+        grammar_us.append(fast_t)
+        parser_us.append(slow_t)
+        fast_s = " → ".join(str(d) for d in fast) if isinstance(fast, tuple) else str(fast)
+        print(f"{phrase:32} {fast_s[:22]:>22} {fast_t:7.1f}   {str(slow)[:22]:>22} {slow_t:9.1f}")
+    print(f"\nmedian per call: grammar {statistics.median(grammar_us):.1f} µs, "
+          f"dateparser {statistics.median(parser_us):.1f} µs "
+          f"({statistics.median(parser_us) / statistics.median(grammar_us):.0f}x)")
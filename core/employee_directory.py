@@ -0,0 +1,216 @@
+# core/employee_directory.py
+"""
+Per-viewer employee directory for resolving names / IDs in attendance questions.
+
+Built from the employees in the viewer's local attendance store (the people
+that viewer can see) and rebuilt every ``EMPLOYEE_DIRECTORY_TTL`` seconds or
+after a sync. Two indexes over normalized names (full name and each name
+token) and employee IDs:
+
+* a sorted key list — exact and prefix lookups by ``bisect`` in O(log n);
+* a BK-tree — edit-distance lookups for typos ("priay" → "priya"), built lazily.
+
+``resolve("priya")`` returns the matching ``(employee_id, name)`` pairs so a
+report can be narrowed to exact IDs (an indexed SQL filter) instead of a
+substring scan over every row.
+"""
+import bisect
+import calendar
+import re
+import threading
+import time
+
+from django.conf import settings
+
+from core.models import AttendanceRecord
+
+DIRECTORY_TTL = getattr(settings, "EMPLOYEE_DIRECTORY_TTL", 15 * 60)   # seconds
+DIRECTORY_CACHE_MAX = 256
+MIN_TOKEN_LENGTH = 3
+
+# words that can sit next to a name in an attendance question but are never names themselves
+STOPWORDS = {
+    "all", "and", "the", "for", "emp", "employee", "employees", "attendance", "register", "report", "late",
+    "absent", "present", "leave", "half", "day", "week", "month", "months", "quarter", "last", "this", "next",
+    "today", "yesterday", "aaj", "kal", "parso", "after", "before", "baje", "ke", "baad", "pehle", "show", "give",
+    "list", "who", "came", "left", "early", "mera", "meri", "mujhe", "apni", "sabhi", "team", "details",
+} | {m.lower() for m in calendar.month_name[1:]} | {m.lower() for m in calendar.month_abbr[1:]}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text):
+    return " ".join(_WORD_RE.findall((text or "").lower()))
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, giving up (returns ``limit + 1``) once it must exceed ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class BKTree:
+    """Burkhard–Keller tree over strings; ``search`` visits only subtrees within ``max_distance``."""
+
+    def __init__(self):
+        self.root = None   # [word, {distance: child}]
+
+    def add(self, word):
+        if self.root is None:
+            self.root = [word, {}]
+            return
+        node = self.root
+        while True:
+            d = edit_distance(word, node[0], max(len(word), len(node[0])))
+            if d == 0:
+                return
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = [word, {}]
+                return
+            node = child
+
+    def search(self, word, max_distance):
+        found, stack = [], [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            d = edit_distance(word, node[0], max(len(word), len(node[0])))
+            if d <= max_distance:
+                found.append((d, node[0]))
+            for edge, child in node[1].items():
+                if d - max_distance <= edge <= d + max_distance:
+                    stack.append(child)
+        return sorted(found)
+
+
+class EmployeeDirectory:
+    def __init__(self, employees):
+        self.employees = []           # [(employee_id, name)]
+        self.by_id = {}
+        postings = {}                 # key → set of employee indexes
+        for employee_id, name in employees:
+            employee_id, name = str(employee_id or ""), (name or "").strip()
+            if not employee_id and not name:
+                continue
+            idx = len(self.employees)
+            self.employees.append((employee_id, name))
+            if employee_id:
+                self.by_id.setdefault(employee_id, idx)
+            full = normalize(name)
+            for key in {full, *full.split()} - {""}:
+                postings.setdefault(key, set()).add(idx)
+        self._keys = sorted(postings)
+        self._postings = [postings[k] for k in self._keys]
+        self._bk = None
+        self._bk_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.employees)
+
+    def _exact(self, key):
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return set(self._postings[i])
+        return set()
+
+    def prefix(self, key):
+        """Employee indexes whose full name or a name token starts with ``key``."""
+        hits = set()
+        i = bisect.bisect_left(self._keys, key)
+        while i < len(self._keys) and self._keys[i].startswith(key):
+            hits |= self._postings[i]
+            i += 1
+        return hits
+
+    def _fuzzy_index(self):
+        """BK-tree over the name keys, built on the first typo lookup (most questions never need it)."""
+        with self._bk_lock:
+            if self._bk is None:
+                tree = BKTree()
+                for key in self._keys:
+                    tree.add(key)
+                self._bk = tree
+        return self._bk
+
+    def _matches(self, idxs):
+        return sorted(self.employees[i] for i in idxs)
+
+    def lookup_id(self, employee_id):
+        idx = self.by_id.get(str(employee_id))
+        return None if idx is None else self.employees[idx]
+
+    def resolve(self, text):
+        """
+        ``[(employee_id, name), ...]`` for a name or ID: exact match first, then prefix
+        (3+ characters), then the closest names within edit distance 1 (2 for longer names).
+        """
+        key = normalize(text)
+        if not key:
+            return []
+        if key in self.by_id:
+            return [self.employees[self.by_id[key]]]
+        hits = self._exact(key)
+        if not hits and len(key) >= MIN_TOKEN_LENGTH:
+            hits = self.prefix(key)
+        if not hits and len(key) >= MIN_TOKEN_LENGTH:
+            fuzzy = self._fuzzy_index().search(key, 1 if len(key) <= 5 else 2)
+            if fuzzy:
+                best = fuzzy[0][0]
+                for distance, word in fuzzy:
+                    if distance == best:
+                        hits |= self._exact(word)
+        return self._matches(hits)
+
+    def find_in_text(self, text):
+        """
+        Employees named in free text ("priya's attendance", "attendance of priya sharma"):
+        the employees matched exactly by the most name tokens in the text.
+        """
+        counts = {}
+        for token in normalize(text).split():
+            if len(token) < MIN_TOKEN_LENGTH or token in STOPWORDS or token.isdigit():
+                continue
+            for idx in self._exact(token):
+                counts[idx] = counts.get(idx, 0) + 1
+        if not counts:
+            return []
+        best = max(counts.values())
+        return self._matches(i for i, c in counts.items() if c == best)
+
+
+_DIRECTORIES = {}   # viewer → (built_at, EmployeeDirectory)
+_DIRECTORIES_LOCK = threading.Lock()
+
+
+def directory_for(viewer):
+    """The viewer's directory, rebuilt from the attendance store when older than the TTL."""
+    with _DIRECTORIES_LOCK:
+        entry = _DIRECTORIES.get(viewer)
+    if entry and time.monotonic() - entry[0] < DIRECTORY_TTL:
+        return entry[1]
+    employees = (
+        AttendanceRecord.objects.filter(viewer=viewer)
+        .values_list("employee_id", "emp_name")
+        .distinct()
+    )
+    directory = EmployeeDirectory(employees)
+    with _DIRECTORIES_LOCK:
+        _DIRECTORIES[viewer] = (time.monotonic(), directory)
+        if len(_DIRECTORIES) > DIRECTORY_CACHE_MAX:
+            oldest = min(_DIRECTORIES, key=lambda k: _DIRECTORIES[k][0])
+            _DIRECTORIES.pop(oldest, None)
+    return directory
+
+
+def invalidate_directory(viewer):
+    with _DIRECTORIES_LOCK:
+        _DIRECTORIES.pop(viewer, None)
@@ -1,8 +1,9 @@
 import re
-import dateparser
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional, Dict, Any
 
+from core.date_grammar import FALLBACK_HINT_RE, dateparser_parse, parse_date, parse_range, parse_time as grammar_time
+
 
 def extract_datetime_info(
     text: str,
@@ -46,8 +47,7 @@ def extract_datetime_info(
         result["has_time"] = True
 
         def parse_time(t):
-            parsed = dateparser.parse(t)
-            return parsed.strftime("%H:%M") if parsed else t
+            return grammar_time(t) or t
 
         result["start_time"] = parse_time(times[0])
         result["end_time"] = parse_time(times[1]) if len(times) > 1 else None
@@ -69,122 +69,23 @@ def extract_datetime_info(
     result["has_date_range"] = has_date_range
 
     # =========================================================
-    # 3. WEEKDAY HELPERS
-    # =========================================================
-    def get_next_weekday(ref: datetime, day: str, include_today=False):
-        days = {
-            "monday": 0, "mon": 0,
-            "tuesday": 1, "tue": 1,
-            "wednesday": 2, "wed": 2,
-            "thursday": 3, "thu": 3,
-            "friday": 4, "fri": 4,
-            "saturday": 5, "sat": 5,
-            "sunday": 6, "sun": 6
-        }
-        if day not in days:
-            return None
-
-        target = days[day]
-        today = ref.weekday()
-
-        if include_today and today == target:
-            return ref.date()
-
-        delta = (target - today) % 7
-        if delta == 0:
-            delta = 7
-
-        return (ref + timedelta(days=delta)).date()
-
-    # =========================================================
-    # 4. SMART DATE PARSER
+    # 3. SMART DATE PARSER (compiled grammar, dateparser last)
     # =========================================================
     def parse_date_smart(s: str, ref: datetime, context_year=None):
         if not s:
             return None
 
         s = s.strip()
-
-        # --- Relative keywords ---
-        if "today" in s or "aaj" in s:
-            return ref.date()
-        if "tomorrow" in s or "kal" in s:
-            return (ref + timedelta(days=1)).date()
-        if "parso" in s:
-            return (ref + timedelta(days=2)).date()
-        if "yesterday" in s:
-            return (ref - timedelta(days=1)).date()
-
-        # --- Explicit year detection ---
-        year_match = re.search(r'\b(20\d{2})\b', s)
-        explicit_year = int(year_match.group(1)) if year_match else None
-
-        # --- Weekdays ---
-        m = re.search(r'\b(next|this)\s+(mon|tue|wed|thu|fri|sat|sun|monday|tuesday|wednesday|thursday|friday|saturday|sunday)', s)
-        if m:
-            return get_next_weekday(ref, m.group(2), include_today=(m.group(1) == "this"))
-
-        m = re.search(r'\b(mon|tue|wed|thu|fri|sat|sun|monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b', s)
-        if m:
-            return get_next_weekday(ref, m.group(1))
-
-        # --- Manual date parsing ---
-        m = re.search(
-            r'(\d{1,2})\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec|'
-            r'january|february|march|april|may|june|july|'
-            r'august|september|october|november|december)',
-            s
-        )
-
-        if m:
-            day = int(m.group(1))
-            month_map = {
-                "jan": 1, "january": 1,
-                "feb": 2, "february": 2,
-                "mar": 3, "march": 3,
-                "apr": 4, "april": 4,
-                "may": 5,
-                "jun": 6, "june": 6,
-                "jul": 7, "july": 7,
-                "aug": 8, "august": 8,
-                "sep": 9, "september": 9,
-                "oct": 10, "october": 10,
-                "nov": 11, "november": 11,
-                "dec": 12, "december": 12
-            }
-
-            month = month_map[m.group(2)]
-            year = explicit_year or context_year or ref.year
-
-            try:
-                date = datetime(year, month, day).date()
-
-                # --- smart future logic ONLY if year not explicit ---
-                if not explicit_year:
-                    if (ref.date() - date).days > 30:
-                        date = datetime(year + 1, month, day).date()
-
-                return date
-            except:
-                return None
+        date = parse_date(s, ref, context_year, prefer_future=True)
+        if date or not FALLBACK_HINT_RE.search(s):
+            return date
 
         # --- Fallback ---
-        parsed = dateparser.parse(
-            s,
-            settings={
-                "RELATIVE_BASE": ref,
-                "PREFER_DATES_FROM": "future",
-                "DATE_ORDER": "DMY"
-            }
-        )
-
+        parsed = dateparser_parse(s, ref, prefer_future=True)
         return parsed.date() if parsed else None
 
-
-
-
     # =========================================================
-    # 5. DATE SPLITTING & PARSING
+    # 4. DATE SPLITTING & PARSING
     # =========================================================
     text_cleaned = text_without_times
 
@@ -203,10 +104,16 @@ def extract_datetime_info(
             start_date = parse_date_smart(dates[0], reference_date)
             end_date = parse_date_smart(dates[1], reference_date, start_date.year if start_date else None)
     else:
-        start_date = parse_date_smart(text_cleaned, reference_date)
+        # "10/12/2025 to 15/12/2025", "kal se parso tak", "last week"
+        date_range = parse_range(text_cleaned, reference_date, prefer_future=True)
+        if date_range:
+            start_date, end_date = date_range
+            result["has_date_range"] = True
+        else:
+            start_date = parse_date_smart(text_cleaned, reference_date)
 
     # =========================================================
-    # 6. FINAL ASSIGNMENT
+    # 5. FINAL ASSIGNMENT
     # =========================================================
     if start_date:
         result["start_date"] = start_date.isoformat()
@@ -250,6 +157,9 @@ if __name__ == "__main__":
 
         "apply leave 25 nov",
         "1 dec 5 dec",
+        "10/12/2025 to 15/12/2025",
+        "leave kal se parso tak",
+        "attendance for last week",
      
         
     ]
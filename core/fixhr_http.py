@@ -0,0 +1,338 @@
+# core/fixhr_http.py
+"""
+Guarded HTTP calls to FixHR.
+
+Drop-in for ``requests.get/post/request`` that adds:
+
+* a request-level deadline — a view sets a time budget once (``with_deadline``)
+  and every upstream call it makes gets ``timeout = min(timeout, time left)``;
+* a circuit breaker per endpoint — after repeated timeouts/5xx the endpoint is
+  short-circuited for a while and callers fail fast with ``CircuitOpenError``;
+* stale fallback — the last good GET response (per URL/params/user) is served
+  when the endpoint times out or its circuit is open;
+* speculative GETs — inside a ``Speculation`` scope, ``prefetch`` starts a GET
+  in the background and the first matching ``get`` (same URL, params and
+  user) takes its response instead of calling again; prefetches nobody
+  claimed are cancelled (or discarded, if already running) when the scope
+  closes.
+"""
+import contextvars
+import functools
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 15
+REQUEST_DEADLINE = getattr(settings, "FIXHR_REQUEST_DEADLINE", 25)          # seconds per view
+BREAKER_FAILURE_THRESHOLD = getattr(settings, "FIXHR_BREAKER_FAILURES", 5)  # consecutive failures
+BREAKER_RESET_TIMEOUT = getattr(settings, "FIXHR_BREAKER_RESET", 30)        # seconds open
+STALE_CACHE_MAX = 512
+STALE_CACHE_TTL = getattr(settings, "FIXHR_STALE_TTL", 15 * 60)             # seconds
+MIN_CALL_TIMEOUT = 0.5
+
+_DEADLINE = contextvars.ContextVar("fixhr_deadline", default=None)
+_SPECULATION = contextvars.ContextVar("fixhr_speculation", default=None)
+_UNCLAIMED = object()
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Endpoint is short-circuited after repeated failures."""
+
+
+class DeadlineExceeded(requests.Timeout):
+    """The view's time budget ran out before the upstream call could be made."""
+
+
+# ---------------- Deadline ----------------
+def set_deadline(seconds):
+    """Start a time budget for the current context. Returns a token for ``reset_deadline``."""
+    return _DEADLINE.set(time.monotonic() + seconds)
+
+
+def reset_deadline(token):
+    _DEADLINE.reset(token)
+
+
+def remaining_budget():
+    """Seconds left in the current budget, or None when no deadline is set."""
+    deadline = _DEADLINE.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def with_deadline(seconds=None):
+    """View decorator: every FixHR call made while handling the request shares one budget."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            token = set_deadline(seconds or REQUEST_DEADLINE)
+            try:
+                return view(*args, **kwargs)
+            finally:
+                reset_deadline(token)
+        return wrapper
+    return decorator
+
+
+def submit(executor, fn, *args, **kwargs):
+    """``executor.submit`` that carries the caller's deadline into the worker thread."""
+    ctx = contextvars.copy_context()
+    return executor.submit(ctx.run, fn, *args, **kwargs)
+
+
+# ---------------- Circuit breaker ----------------
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True   # let exactly one probe through
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("⚡ circuit open for %s after %s failures", self.name, self.failures)
+                    metrics.incr("fixhr.breaker.opened")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        with self._lock:
+            self.probe_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
+
+
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def endpoint_key(url):
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+
+def get_breaker(url):
+    key = endpoint_key(url)
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(key)
+        if breaker is None:
+            breaker = _BREAKERS[key] = CircuitBreaker(key)
+        return breaker
+
+
+def breaker_states():
+    with _BREAKERS_LOCK:
+        breakers = list(_BREAKERS.items())
+    return {key: b.snapshot() for key, b in breakers}
+
+
+metrics.register_gauge("fixhr.breakers", breaker_states)
+
+
+# ---------------- Stale GET fallback ----------------
+_STALE = OrderedDict()   # key → (stored_at, response)
+_STALE_LOCK = threading.Lock()
+
+
+def _stale_key(url, kwargs):
+    headers = kwargs.get("headers") or {}
+    auth = headers.get("authorization") or headers.get("Authorization") or ""
+    params = kwargs.get("params") or {}
+    if isinstance(params, dict):
+        params = sorted((str(k), str(v)) for k, v in params.items())
+    return (url, repr(params), hashlib.md5(auth.encode()).hexdigest())
+
+
+def _remember(key, response):
+    with _STALE_LOCK:
+        _STALE[key] = (time.monotonic(), response)
+        _STALE.move_to_end(key)
+        while len(_STALE) > STALE_CACHE_MAX:
+            _STALE.popitem(last=False)
+
+
+def _stale(key):
+    with _STALE_LOCK:
+        entry = _STALE.get(key)
+    if not entry or time.monotonic() - entry[0] > STALE_CACHE_TTL:
+        return None
+    metrics.incr("fixhr.stale_served")
+    return entry[1]
+
+
+# ---------------- Speculative GETs ----------------
+class Speculation:
+    """
+    Context manager scoping speculative GETs to one view call. ``saved_ms`` adds up,
+    per claimed prefetch, how long it had already been running when it was asked for.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.wasted = 0
+        self.saved_ms = 0.0
+        self._pending = {}   # request key → (future, started)
+        self._lock = threading.Lock()
+        self._token = None
+
+    def __enter__(self):
+        self._token = _SPECULATION.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _SPECULATION.reset(self._token)
+        with self._lock:
+            unclaimed, self._pending = list(self._pending.values()), {}
+        for future, _ in unclaimed:
+            metrics.incr("fixhr.prefetch.cancelled" if future.cancel() else "fixhr.prefetch.wasted")
+        self.wasted += len(unclaimed)
+        return False
+
+    def start(self, executor, url, params, kwargs):
+        key = _stale_key(url, {**kwargs, "params": params})
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending[key] = (submit(executor, _speculative_get, url, params, kwargs), time.monotonic())
+        metrics.incr("fixhr.prefetch.started")
+
+    def claim(self, key):
+        """The prefetched response for ``key`` (waiting for it if needed), or ``_UNCLAIMED``."""
+        with self._lock:
+            entry = self._pending.pop(key, None)
+        if entry is None:
+            return _UNCLAIMED
+        future, started = entry
+        if future.cancel():
+            metrics.incr("fixhr.prefetch.cancelled")   # still queued behind other work: just call directly
+            return _UNCLAIMED
+        asked = time.monotonic()
+        response, finished = future.result()
+        self.hits += 1
+        self.saved_ms += (min(asked, finished) - started) * 1000
+        metrics.incr("fixhr.prefetch.hits")
+        return response
+
+
+def _speculative_get(url, params, kwargs):
+    _SPECULATION.set(None)   # the worker's own GET must not wait on itself
+    response = request("GET", url, params=params, **kwargs)
+    return response, time.monotonic()
+
+
+def prefetch(executor, url, params=None, **kwargs):
+    """Start a GET on ``executor`` for a later identical ``get``; a no-op outside a ``Speculation``."""
+    speculation = _SPECULATION.get()
+    if speculation is not None:
+        speculation.start(executor, url, params, kwargs)
+
+
+# ---------------- Requests ----------------
+def request(method, url, **kwargs):
+    """``requests.request`` with deadline, circuit breaker and stale-GET fallback."""
+    method = method.upper()
+    stale_key = _stale_key(url, kwargs) if method == "GET" and not kwargs.get("stream") else None
+    speculation = _SPECULATION.get()
+    if stale_key and speculation is not None:
+        response = speculation.claim(stale_key)
+        if response is not _UNCLAIMED:
+            return response
+    breaker = get_breaker(url)
+
+    def _fail_fast(exc):
+        if stale_key:
+            stale = _stale(stale_key)
+            if stale is not None:
+                logger.warning("↩️ serving stale %s (%s)", breaker.name, exc.__class__.__name__)
+                return stale
+        raise exc
+
+    if not breaker.allow():
+        metrics.incr("fixhr.breaker.short_circuited")
+        return _fail_fast(CircuitOpenError(f"FixHR endpoint temporarily unavailable: {breaker.name}"))
+
+    timeout = kwargs.pop("timeout", None) or DEFAULT_TIMEOUT
+    budget = remaining_budget()
+    if budget is not None:
+        if budget < MIN_CALL_TIMEOUT:
+            metrics.incr("fixhr.deadline_exceeded")
+            breaker.release_probe()   # not the endpoint's fault
+            return _fail_fast(DeadlineExceeded(f"Request time budget exhausted before calling {breaker.name}"))
+        if isinstance(timeout, tuple):
+            timeout = tuple(min(t, budget) for t in timeout)
+        else:
+            timeout = min(timeout, budget)
+
+    start = time.perf_counter()
+    try:
+        response = requests.request(method, url, timeout=timeout, **kwargs)
+    except (requests.Timeout, requests.ConnectionError) as exc:
+        breaker.record_failure()
+        metrics.incr("fixhr.upstream_errors")
+        return _fail_fast(exc)
+    finally:
+        metrics.observe("fixhr.latency_ms", (time.perf_counter() - start) * 1000)
+
+    if response.status_code >= 500:
+        breaker.record_failure()
+        metrics.incr("fixhr.upstream_errors")
+        if stale_key:
+            stale = _stale(stale_key)
+            if stale is not None:
+                return stale
+        return response
+
+    breaker.record_success()
+    if stale_key and response.status_code < 400:
+        _remember(stale_key, response)
+    return response
+
+
+def get(url, params=None, **kwargs):
+    return request("GET", url, params=params, **kwargs)
+
+
+def post(url, data=None, json=None, **kwargs):
+    return request("POST", url, data=data, json=json, **kwargs)
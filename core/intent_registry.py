@@ -0,0 +1,162 @@
+# core/intent_registry.py
+"""
+Table-driven chat intent dispatch.
+
+Each chat handler is registered once with the intent names (and command
+prefixes) it serves and what it needs:
+
+* ``needs`` — inputs computed by the dispatcher before the handler runs:
+  ``"login"`` (a FixHR token; without one the login prompt is returned) and
+  any input registered with ``provide`` (``datetime_info``, ``decision``,
+  ``role_name``, ``memory`` …). Nothing a handler does not declare is
+  computed, so e.g. the date grammar never runs for a leave-balance lookup;
+* ``endpoints`` — the upstream FixHR URLs it reads or writes (informational,
+  listed by ``describe``);
+* ``category`` / ``prefetch`` / ``hints`` — for read-only handlers: the
+  classifier category the intent belongs to ("leave", "miss_punch" …) and
+  ``prefetch(call)``, the ``(url, params, request_kwargs)`` GETs the handler
+  is about to make. ``core.chat_pipeline`` starts those while the classifier
+  is still picking the action, when the message contains one of ``hints``
+  (or always, without hints).
+
+``resolve`` maps an intent name to its handler with one dict lookup;
+``command`` matches the fixed button commands ("approve leave|…") by prefix.
+``dispatch`` records ``chat.intent.<name>`` counts and ``_ms`` timings in
+``/api/metrics/``.
+"""
+import logging
+import time
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+LOGIN = "login"
+
+
+class ChatCall:
+    """One chat request as handlers see it: the request, the parsed message and the declared inputs."""
+
+    def __init__(self, request, ctx, token, user_id):
+        self.request = request
+        self.ctx = ctx
+        self.token = token
+        self.user_id = user_id
+        self.intent = "general"
+        self.classification = {}
+        self.datetime_info = None
+        self.decision = None
+        self.role_name = None
+        self.memory = None
+        self.pipeline = None     # core.chat_pipeline.ChatPipeline while the classifier runs
+
+    @property
+    def msg(self):
+        return self.ctx.text
+
+    def meta(self):
+        """The classification fields every reply carries."""
+        return {
+            "intent": self.intent,
+            "confidence": self.classification.get("confidence", 0.0),
+            "datetime_info": self.datetime_info,
+        }
+
+
+class Intent:
+    __slots__ = ("name", "handler", "needs", "endpoints", "category", "prefetch", "hints")
+
+    def __init__(self, name, handler, needs, endpoints, category=None, prefetch=None, hints=()):
+        self.name = name
+        self.handler = handler
+        self.needs = needs
+        self.endpoints = endpoints
+        self.category = category
+        self.prefetch = prefetch
+        self.hints = hints
+
+    def likely(self, ctx):
+        """Worth prefetching for: no hints declared, or the message contains one."""
+        return not self.hints or ctx.has_any(self.hints)
+
+
+class IntentRegistry:
+    def __init__(self, login_required, fallback="general"):
+        self.login_required = login_required   # call → response when a LOGIN handler has no token
+        self.fallback = fallback
+        self._intents = {}      # intent name or alias → Intent
+        self._commands = []     # (prefix, Intent), in registration order
+        self._providers = {}    # input name → call → value, in registration order
+        self._categories = {}   # classifier category → [Intent with a prefetch]
+
+    def provide(self, name):
+        """Register how to compute the input ``name`` (stored on the call as ``call.<name>``)."""
+        def decorator(fn):
+            self._providers[name] = fn
+            return fn
+        return decorator
+
+    def register(self, name, *, aliases=(), prefixes=(), needs=(), endpoints=(), category=None, prefetch=None,
+                 hints=()):
+        def decorator(fn):
+            unknown = set(needs) - set(self._providers) - {LOGIN}
+            if unknown:
+                raise ValueError(f"intent {name!r} needs unknown inputs {sorted(unknown)}")
+            if prefetch is not None and category is None:
+                raise ValueError(f"intent {name!r} declares a prefetch without a category")
+            intent = Intent(name, fn, tuple(n for n in (LOGIN, *self._providers) if n in needs), tuple(endpoints),
+                            category, prefetch, tuple(hints))
+            if prefetch is not None:
+                self._categories.setdefault(category, []).append(intent)
+            for key in (name, *aliases):
+                if key in self._intents:
+                    raise ValueError(f"intent {key!r} is registered twice")
+                self._intents[key] = intent
+            self._commands.extend((prefix, intent) for prefix in prefixes)
+            return fn
+        return decorator
+
+    def resolve(self, name):
+        """The handler for intent ``name``; unknown names get the fallback handler."""
+        return self._intents.get(name) or self._intents[self.fallback]
+
+    def prefetchable(self, category):
+        """Intents of classifier ``category`` that declare a prefetch, in registration order."""
+        return self._categories.get(category, ())
+
+    def command(self, text):
+        """The handler whose command prefix starts ``text`` (lower-cased), or None."""
+        for prefix, intent in self._commands:
+            if text.startswith(prefix):
+                return intent
+        return None
+
+    def dispatch(self, intent, call):
+        if LOGIN in intent.needs and not call.token:
+            metrics.incr("chat.intent.login_required")
+            return self.login_required(call)
+        started = time.perf_counter()
+        for need in intent.needs:
+            if need != LOGIN:
+                setattr(call, need, self._providers[need](call))
+        prepared = time.perf_counter()
+        try:
+            return intent.handler(call)
+        finally:
+            done = time.perf_counter()
+            metrics.incr(f"chat.intent.{intent.name}")
+            metrics.observe(f"chat.intent.{intent.name}_ms", (done - started) * 1000)
+            metrics.observe("chat.inputs_ms", (prepared - started) * 1000)
+            logger.info("intent %s (%s) handled in %.1f ms (inputs %.1f ms)",
+                        intent.name, call.intent, (done - started) * 1000, (prepared - started) * 1000)
+
+    def describe(self):
+        """``{intent: {"aliases", "needs", "endpoints", "category"}}`` for every registered handler."""
+        out = {}
+        for key, intent in self._intents.items():
+            entry = out.setdefault(intent.name, {"aliases": [], "needs": list(intent.needs),
+                                                 "endpoints": list(intent.endpoints),
+                                                 "category": intent.category})
+            if key != intent.name:
+                entry["aliases"].append(key)
+        return out
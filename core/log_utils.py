@@ -0,0 +1,125 @@
+# core/log_utils.py
+"""
+Hot-path logging helpers.
+
+Wired up through ``LOGGING`` in settings.py:
+
+* ``QueueStreamHandler`` — request threads only put records on a queue; a
+  background listener thread does the actual stdout write.
+* ``SamplingFilter`` — keeps 1 in N records (per endpoint / call site) at or
+  below a level, so per-request body dumps don't flood the log.
+* ``TruncateFilter`` — caps long string arguments / messages before formatting.
+
+``body(resp)`` and ``lazy_json(obj)`` defer the expensive part (decoding an
+upstream body, ``json.dumps``) until a handler actually emits the record, so
+disabled DEBUG lines cost almost nothing.
+"""
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+DEFAULT_MAX_CHARS = 2000
+
+
+# ---------------- Lazy args ----------------
+class body:
+    """Lazy, truncated ``response.text`` (or any string) for log arguments."""
+    __slots__ = ("source", "limit")
+
+    def __init__(self, source, limit=DEFAULT_MAX_CHARS):
+        self.source = source
+        self.limit = limit
+
+    def __str__(self):
+        text = self.source.text if hasattr(self.source, "text") else str(self.source)
+        if len(text) > self.limit:
+            return f"{text[:self.limit]}… [{len(text) - self.limit} more chars]"
+        return text
+
+
+class lazy_json:
+    """Lazy ``json.dumps`` for log arguments."""
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        try:
+            text = json.dumps(self.obj, ensure_ascii=False, default=str)
+        except (TypeError, ValueError):
+            text = repr(self.obj)
+        if len(text) > DEFAULT_MAX_CHARS:
+            return f"{text[:DEFAULT_MAX_CHARS]}… [{len(text) - DEFAULT_MAX_CHARS} more chars]"
+        return text
+
+
+# ---------------- Filters ----------------
+class SamplingFilter(logging.Filter):
+    """
+    Pass 1 in ``every`` records at or below ``level``; higher levels always pass.
+    Records are grouped by ``extra={"endpoint": ...}`` when given, otherwise by call site.
+    """
+
+    def __init__(self, every=10, level="DEBUG"):
+        super().__init__()
+        self.every = max(1, int(every))
+        self.level = logging.getLevelName(level) if isinstance(level, str) else level
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > self.level or self.every == 1:
+            return True
+        key = getattr(record, "endpoint", None) or (record.name, record.pathname, record.lineno)
+        with self._lock:
+            n = self._counts.get(key, 0)
+            self._counts[key] = n + 1
+            if len(self._counts) > 10000:
+                self._counts.clear()
+        return n % self.every == 0
+
+
+class TruncateFilter(logging.Filter):
+    """Cap long string args / messages so formatting stays cheap."""
+
+    def __init__(self, max_chars=DEFAULT_MAX_CHARS):
+        super().__init__()
+        self.max_chars = int(max_chars)
+
+    def _cut(self, value):
+        if isinstance(value, str) and len(value) > self.max_chars:
+            return f"{value[:self.max_chars]}… [{len(value) - self.max_chars} more chars]"
+        return value
+
+    def filter(self, record):
+        record.msg = self._cut(record.msg)
+        if isinstance(record.args, tuple):
+            record.args = tuple(self._cut(a) for a in record.args)
+        return True
+
+
+# ---------------- Non-blocking handler ----------------
+class QueueStreamHandler(QueueHandler):
+    """
+    ``QueueHandler`` that owns its queue and a listener writing to ``stream``.
+    The listener is started on creation and flushed/stopped at exit.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        target = logging.StreamHandler(stream or sys.stdout)
+        target.setFormatter(logging.Formatter("%(message)s"))   # message is pre-formatted by prepare()
+        self.listener = QueueListener(self.queue, target, respect_handler_level=False)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass  # drop rather than block a request thread
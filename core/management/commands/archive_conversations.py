@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.conversation_archive import (
+    ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, archive_stale, stale_conversations, zstandard,
+)
+
+
+class Command(BaseCommand):
+    help = "Move conversations untouched for N days into compressed cold storage (ChatArchive)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS,
+                            help=f"archive conversations not updated for this many days (default {ARCHIVE_AFTER_DAYS})")
+        parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument("--limit", type=int, default=None, help="stop after this many conversations")
+        parser.add_argument("--dry-run", action="store_true", help="only count what would be archived")
+        parser.add_argument("--vacuum", action="store_true",
+                            help="VACUUM the SQLite database afterwards so the file actually shrinks")
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        if options["dry_run"]:
+            count = stale_conversations(days).count()
+            self.stdout.write(f"{count} conversations untouched for {days}+ days would be archived")
+            return
+
+        codec = "zstd" if zstandard is not None else "zlib (install zstandard for zstd)"
+        self.stdout.write(f"Archiving conversations untouched for {days}+ days with {codec}")
+        archived = raw = stored = 0
+        for archived, raw, stored in archive_stale(days, options["batch_size"], options["limit"]):
+            self.stdout.write(f"  {archived} archived so far")
+
+        ratio = f"{raw / stored:.1f}x" if stored else "-"
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} conversations: {raw / 1024:.0f} KiB of messages stored in "
+            f"{stored / 1024:.0f} KiB ({ratio})"
+        ))
+        if options["vacuum"] and connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("VACUUM")
+            self.stdout.write("Database vacuumed")
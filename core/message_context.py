@@ -0,0 +1,145 @@
+# core/message_context.py
+"""
+One chat message, parsed once per request.
+
+``chat_api`` used to lower-case, normalize and regex-scan the same message in
+every stage: language detection, the general-query check, date extraction
+(twice for comp-off lists), month / year, the attendance period, the employee
+filter and the reason / category loops of the apply handlers.
+``MessageContext`` holds the message and computes each of those on first use,
+memoized for the rest of the request.
+
+The helpers in ``views`` take either a context or a plain string
+(``MessageContext.of``), so callers outside the chat flow are unchanged.
+"""
+import re
+from datetime import datetime
+from functools import cached_property
+
+from core.date_grammar import CLOCK_RE, DATE_RE
+from core.extract_date_time import extract_datetime_info
+
+DEVANAGARI_CHARS = "अआइईउऊएऐओऔकखगघचछजझटठडढतथदधनपफबभमयरलवशषसह"
+_DEVANAGARI_RE = re.compile(f"[{DEVANAGARI_CHARS}]")
+_WHITESPACE_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"\w+")
+_YEAR_RE = re.compile(r"\b(20\d{2})\b")
+_EMPLOYEE_ID_RE = re.compile(r"(?:employee|emp)\s*(?:id|code|number|no\.?|#)?\s*(\d+)", re.I)
+_EMPLOYEE_NAME_RE = re.compile(r"(?:for|of|employee|emp)\s+([a-zA-Z][a-zA-Z .'-]{1,60})", re.I)
+
+# First name in this order that occurs anywhere in the text wins (as ``extract_month_year`` always did).
+MONTH_NAMES = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3, "april": 4, "apr": 4,
+    "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7, "august": 8, "aug": 8,
+    "september": 9, "sep": 9, "sept": 9, "october": 10, "oct": 10, "november": 11, "nov": 11,
+    "december": 12, "dec": 12,
+}
+CONTINUATION_WORDS = ("bhi", "also", "same", "phir", "again", "next day", "uske baad")
+
+
+class MessageContext:
+    """A message plus everything derived from it; every derived value is computed once."""
+
+    def __init__(self, text, reference=None):
+        self.text = (text or "").strip()
+        self.reference = reference or datetime.now()
+        self._searches = {}
+        self._memo = {}
+
+    @classmethod
+    def of(cls, message):
+        """``message`` itself when it is already a context, else a new one."""
+        return message if isinstance(message, cls) else cls(message)
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"MessageContext({self.text!r})"
+
+    # ---------------- text forms ----------------
+
+    @cached_property
+    def lower(self):
+        return self.text.lower()
+
+    @cached_property
+    def normalized(self):
+        """Lower-cased with whitespace runs collapsed."""
+        return _WHITESPACE_RE.sub(" ", self.lower)
+
+    @cached_property
+    def tokens(self):
+        return tuple(_WORD_RE.findall(self.normalized))
+
+    @cached_property
+    def words(self):
+        return frozenset(self.tokens)
+
+    @cached_property
+    def language(self):
+        return "hi" if _DEVANAGARI_RE.search(self.text) else "en"
+
+    # ---------------- keyword hits ----------------
+
+    def has_word(self, word):
+        """Same as ``re.search(rf"\\b{word}\\b", text, re.I)`` for a single word."""
+        return word in self.words
+
+    def has_any(self, phrases):
+        """Any of ``phrases`` occurs in the lower-cased text."""
+        return any(p in self.lower for p in phrases)
+
+    def search(self, pattern, flags=0, lowered=False):
+        """``re.search`` over the text (or the lower-cased text), memoized per pattern."""
+        key = (pattern, flags, lowered)
+        if key not in self._searches:
+            self._searches[key] = re.search(pattern, self.lower if lowered else self.text, flags)
+        return self._searches[key]
+
+    def memo(self, key, compute):
+        """``compute(self)``, evaluated once per context under ``key``."""
+        if key not in self._memo:
+            self._memo[key] = compute(self)
+        return self._memo[key]
+
+    @cached_property
+    def is_continuation(self):
+        """The user asks for the previous request's slots again ("also", "again", "bhi" …)."""
+        return self.has_any(CONTINUATION_WORDS)
+
+    # ---------------- dates and times ----------------
+
+    @cached_property
+    def datetime_info(self):
+        return extract_datetime_info(self.text, self.reference)
+
+    @cached_property
+    def date_spans(self):
+        """``(start, end)`` offsets of the date phrases in ``lower``."""
+        return tuple(m.span() for m in DATE_RE.finditer(self.lower))
+
+    @cached_property
+    def time_spans(self):
+        return tuple(m.span() for m in CLOCK_RE.finditer(self.lower))
+
+    @cached_property
+    def year(self):
+        m = _YEAR_RE.search(self.lower)
+        return int(m.group(1)) if m else None
+
+    @cached_property
+    def month(self):
+        return next((num for name, num in MONTH_NAMES.items() if name in self.lower), None)
+
+    # ---------------- people ----------------
+
+    @cached_property
+    def employee_id_mention(self):
+        m = _EMPLOYEE_ID_RE.search(self.text)
+        return m.group(1) if m else None
+
+    @cached_property
+    def employee_name(self):
+        m = _EMPLOYEE_NAME_RE.search(self.text)
+        return m.group(1).strip().strip("-.,") if m else None
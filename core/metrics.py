@@ -0,0 +1,53 @@
+# core/metrics.py
+"""
+Tiny in-process metrics registry (counters, timings and gauges).
+
+Numbers are per worker process; ``snapshot()`` is served by ``/api/metrics/``.
+"""
+import threading
+
+_LOCK = threading.Lock()
+_COUNTERS = {}
+_TIMINGS = {}   # name → {"count", "total", "max"}
+_GAUGES = {}    # name → zero-arg callable
+
+
+def incr(name, value=1):
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + value
+
+
+def observe(name, value):
+    with _LOCK:
+        t = _TIMINGS.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+        t["count"] += 1
+        t["total"] += value
+        t["max"] = max(t["max"], value)
+
+
+def register_gauge(name, fn):
+    """``fn()`` is called on every snapshot and must return something JSON-serializable."""
+    with _LOCK:
+        _GAUGES[name] = fn
+
+
+def snapshot():
+    with _LOCK:
+        counters = dict(_COUNTERS)
+        timings = {
+            name: {
+                "count": t["count"],
+                "avg": round(t["total"] / t["count"], 2) if t["count"] else 0.0,
+                "max": round(t["max"], 2),
+            }
+            for name, t in _TIMINGS.items()
+        }
+        gauges = dict(_GAUGES)
+
+    values = {}
+    for name, fn in gauges.items():
+        try:
+            values[name] = fn()
+        except Exception as e:
+            values[name] = f"error: {e}"
+    return {"counters": counters, "timings": timings, "gauges": values}
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('viewer', models.CharField(max_length=64)),
+                ('emp_pos', models.IntegerField()),
+                ('day_pos', models.IntegerField()),
+                ('emp_name', models.CharField(blank=True, max_length=200)),
+                ('employee_id', models.CharField(blank=True, max_length=50)),
+                ('date', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('in_time', models.CharField(max_length=50)),
+                ('out_time', models.CharField(max_length=50)),
+                ('work_hrs', models.CharField(max_length=50)),
+                ('is_late', models.BooleanField(default=False)),
+                ('overtime_hours', models.CharField(max_length=50)),
+                ('remark', models.TextField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['viewer', 'employee_id', 'date'], name='att_viewer_emp_date'), models.Index(fields=['viewer', 'date'], name='att_viewer_date')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AttendanceSync',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('viewer', models.CharField(max_length=64)),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('synced_at', models.DateTimeField()),
+                ('is_closed', models.BooleanField(default=False)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('viewer', 'year', 'month'), name='att_sync_viewer_month')],
+            },
+        ),
+    ]
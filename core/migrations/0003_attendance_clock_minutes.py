@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:02
+
+import re
+
+from django.db import migrations, models
+
+CLOCK_RE = re.compile(r"(\d{1,2}):(\d{2})(?::\d{2})?\s*([ap])?", re.I)
+
+
+def clock_minutes(value):
+    match = CLOCK_RE.search(value or "")
+    if not match:
+        return None
+    hours, minutes, half = int(match.group(1)), int(match.group(2)), (match.group(3) or "").lower()
+    if half == "p" and hours < 12:
+        hours += 12
+    elif half == "a" and hours == 12:
+        hours = 0
+    return hours * 60 + minutes
+
+
+def backfill_minutes(apps, schema_editor):
+    AttendanceRecord = apps.get_model("core", "AttendanceRecord")
+    batch = []
+    for record in AttendanceRecord.objects.only("id", "in_time", "out_time").iterator(chunk_size=2000):
+        record.in_minutes = clock_minutes(record.in_time)
+        record.out_minutes = clock_minutes(record.out_time)
+        batch.append(record)
+        if len(batch) >= 2000:
+            AttendanceRecord.objects.bulk_update(batch, ["in_minutes", "out_minutes"])
+            batch = []
+    if batch:
+        AttendanceRecord.objects.bulk_update(batch, ["in_minutes", "out_minutes"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_attendance_warehouse'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='in_minutes',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='out_minutes',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_minutes, migrations.RunPython.noop),
+    ]
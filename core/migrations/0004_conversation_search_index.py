@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:40
+
+from django.db import OperationalError, migrations
+
+FTS_TABLE = "core_conversation_fts"
+
+
+def create_search_index(apps, schema_editor):
+    """FTS5 index for conversation search; skipped on other databases or SQLite builds without FTS5."""
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "conv_id UNINDEXED, employee_id, title, body, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:   # "no such module: fts5"
+            return
+        ChatConversation = apps.get_model("core", "ChatConversation")
+        rows = (
+            ChatConversation.objects.only("conv_id", "employee_id", "title", "messages").iterator(chunk_size=200)
+        )
+        for conv in rows:
+            body = "\n".join(str(m.get("text") or "") for m in conv.messages or () if isinstance(m, dict))
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (conv_id, employee_id, title, body) VALUES (%s, %s, %s, %s)",
+                [conv.conv_id, conv.employee_id, conv.title, body],
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_attendance_clock_minutes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
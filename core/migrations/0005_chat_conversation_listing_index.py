@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_conversation_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatconversation',
+            index=models.Index(fields=['employee_id', '-timestamp', '-id'], name='chat_conv_emp_ts'),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS_TABLE = "core_conversation_fts"
+
+
+def split_messages(apps, schema_editor):
+    """Move each conversation's messages array into ChatMessage rows."""
+    ChatConversation = apps.get_model("core", "ChatConversation")
+    ChatMessage = apps.get_model("core", "ChatMessage")
+    for conv in ChatConversation.objects.only("id", "messages").iterator(chunk_size=200):
+        messages = [m for m in conv.messages or () if isinstance(m, dict)]
+        ChatMessage.objects.bulk_create([
+            ChatMessage(
+                conversation_id=conv.id,
+                seq=seq,
+                role=str(m.get("role") or ""),
+                text=str(m.get("text") or ""),
+                meta={k: v for k, v in m.items() if k not in ("role", "text")},
+            )
+            for seq, m in enumerate(messages)
+        ], batch_size=500)
+        ChatConversation.objects.filter(id=conv.id).update(messages=[], message_count=len(messages))
+
+
+def rebuild_search_index(apps, schema_editor):
+    """
+    Re-create the FTS5 table from 0004 with one row per message (rowid = ChatMessage.id) and a
+    title row per conversation (rowid = -conversation id), so appends only insert rows.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        if cursor.fetchone() is None:
+            return   # no FTS5 in this SQLite build; search uses the scan fallback
+        cursor.execute(f"DROP TABLE {FTS_TABLE}")
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "conv_id, employee_id, title, body, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        insert = f"INSERT INTO {FTS_TABLE} (rowid, conv_id, employee_id, title, body) VALUES (%s, %s, %s, %s, %s)"
+        ChatConversation = apps.get_model("core", "ChatConversation")
+        ChatMessage = apps.get_model("core", "ChatMessage")
+        owners = {}
+        for pk, conv_id, employee_id, title in ChatConversation.objects.values_list(
+            "id", "conv_id", "employee_id", "title"
+        ).iterator(chunk_size=500):
+            owners[pk] = (conv_id, employee_id)
+            cursor.execute(insert, [-pk, conv_id, employee_id, title, ""])
+        rows = ChatMessage.objects.values_list("id", "conversation_id", "text").iterator(chunk_size=2000)
+        cursor.executemany(insert, ((pk, *owners[conv], "", text) for pk, conv, text in rows))
+
+
+def join_messages(apps, schema_editor):
+    ChatConversation = apps.get_model("core", "ChatConversation")
+    ChatMessage = apps.get_model("core", "ChatMessage")
+    for conv in ChatConversation.objects.only("id").iterator(chunk_size=200):
+        rows = ChatMessage.objects.filter(conversation_id=conv.id).order_by("seq")
+        messages = [{"role": r.role, "text": r.text, **r.meta} for r in rows]
+        ChatConversation.objects.filter(id=conv.id).update(messages=messages)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_chat_conversation_listing_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatconversation',
+            name='message_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='chatconversation',
+            name='messages',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.CreateModel(
+            name='ChatMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.IntegerField()),
+                ('role', models.CharField(max_length=20)),
+                ('text', models.TextField(blank=True)),
+                ('meta', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='core.chatconversation')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('conversation', 'seq'), name='chat_msg_conv_seq')],
+            },
+        ),
+        migrations.RunPython(split_messages, join_messages),
+        migrations.RunPython(rebuild_search_index, migrations.RunPython.noop),
+    ]
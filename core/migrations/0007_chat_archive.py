@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_chat_messages'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatArchive',
+            fields=[
+                ('conversation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archive', serialize=False, to='core.chatconversation')),
+                ('codec', models.CharField(max_length=10)),
+                ('data', models.BinaryField()),
+                ('message_count', models.IntegerField()),
+                ('raw_size', models.IntegerField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='chatconversation',
+            name='is_archived',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_chat_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StateEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('namespace', models.CharField(max_length=32)),
+                ('key', models.CharField(max_length=100)),
+                ('value', models.TextField()),
+                ('size', models.IntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='state_expires')],
+                'constraints': [models.UniqueConstraint(fields=('namespace', 'key'), name='state_ns_key')],
+            },
+        ),
+    ]
@@ -3,6 +3,7 @@
 import torch
 from transformers import AutoModelForCausalLM, AutoTokenizer
 import json
+import logging
 import os
 import time
 
@@ -13,6 +14,8 @@ from pathlib import Path
 _BASE_DIR = Path(__file__).resolve().parent
 MODEL_DIR = str((_BASE_DIR / "merged_phi3").resolve())
 
+logger = logging.getLogger(__name__)
+
 
 
 
@@ -57,9 +60,9 @@ def get_device():
     Keeps behaviour aligned with phi3_inference_v3.
     """
     if torch.cuda.is_available():
-        print(">> Using GPU (cuda)")
+        logger.info(">> Using GPU (cuda)")
         return "cuda"
-    print(">> Using CPU")
+    logger.info(">> Using CPU")
     return "cpu"
 
 
@@ -81,7 +84,7 @@ def _device_map_for(device: str):
 def _load_model_on_device(device: str):
     """Load model on requested device."""
     device_map = _device_map_for(device)
-    print(f">> Loading model on {device} (device_map={device_map})...")
+    logger.info(">> Loading model on %s (device_map=%s)...", device, device_map)
 
     load_kwargs = {
         "device_map": device_map,
@@ -100,7 +103,7 @@ def _load_model_on_device(device: str):
 
     if use_8bit:
         load_kwargs["load_in_8bit"] = True
-        print(">> Loading main model in 8-bit to fit GPU memory")
+        logger.info(">> Loading main model in 8-bit to fit GPU memory")
     else:
         load_kwargs["torch_dtype"] = torch.bfloat16 if device != "cpu" else torch.float32
 
@@ -121,7 +124,7 @@ def load_model_and_tokenizer():
     preferred = get_device()
     candidates = [preferred] if preferred == "cpu" else [preferred, "cpu"]
 
-    print(">> Loading tokenizer...")
+    logger.info(">> Loading tokenizer...")
     tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
 
     last_error = None
@@ -131,7 +134,7 @@ def load_model_and_tokenizer():
             return tokenizer, model, device
         except torch.cuda.OutOfMemoryError as exc:
             last_error = exc
-            print("!! CUDA OOM while loading main model, falling back to CPU...")
+            logger.warning("!! CUDA OOM while loading main model, falling back to CPU...")
             torch.cuda.empty_cache()
         except Exception as exc:
             last_error = exc
@@ -151,9 +154,9 @@ Jab Django ye file import karega:
 tab ye lines sirf EK BAAR chalengi:
     TOKENIZER, MODEL, DEVICE = load_model_and_tokenizer()
 """
-print(">> [model_inference] Initializing global model (this should run only once)...")
+logger.info(">> [model_inference] Initializing global model (this should run only once)...")
 TOKENIZER, MODEL, DEVICE = load_model_and_tokenizer()
-print(">> [model_inference] Model ready ✅")
+logger.info(">> [model_inference] Model ready ✅")
 
 
 # --------------------------- SAFE CHAT TEMPLATE ---------------------------
@@ -177,7 +180,7 @@ def safe_apply_chat_template(tokenizer, messages):
             return output
 
     except Exception as e:
-        print(">> apply_chat_template failed. Using fallback prompt. Error:", e)
+        logger.warning(">> apply_chat_template failed. Using fallback prompt. Error: %s", e)
 
     # -------- FALLBACK PROMPT --------
     # Yahan pehle se bug tha: messages[0]['content'] = system hota tha, user nahi.
@@ -267,9 +270,9 @@ def model_response(message: str) -> str:
 
     try:
         reply = generate_response(TOKENIZER, MODEL, DEVICE, user_text)
-        print(f"model call =============== : {reply}")
+        logger.debug("model call =============== : %s", reply)
     except Exception as e:
-        print(f"[ERROR] {e}")
+        logger.error("[ERROR] %s", e)
 
     # ---- history load/save ----
     try:
@@ -289,7 +292,7 @@ def model_response(message: str) -> str:
         with open(HISTORY_FILE, "w", encoding="utf-8") as f:
             json.dump(history, f, ensure_ascii=False, indent=2)
     except Exception as e:
-        print(f"[WARN] Could not save history: {e}")
+        logger.warning("[WARN] Could not save history: %s", e)
 
     return reply
 
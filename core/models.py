@@ -10,8 +10,114 @@ class ChatConversation(models.Model):
     employee_id = models.CharField(max_length=50)  # ya session se
     conv_id = models.CharField(max_length=100, unique=True)
     title = models.CharField(max_length=200)
-    messages = models.JSONField()
+    messages = models.JSONField(default=list, blank=True)   # legacy full array; messages now live in ChatMessage
+    message_count = models.IntegerField(default=0)          # next ChatMessage.seq
+    is_archived = models.BooleanField(default=False)        # messages moved to ChatArchive
     timestamp = models.DateTimeField(auto_now=True)
-    
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["employee_id", "-timestamp", "-id"], name="chat_conv_emp_ts"),
+        ]
+
     def __str__(self):
         return f"{self.employee_id} - {self.title}"
+
+
+class ChatMessage(models.Model):
+    """One message of a conversation, appended in ``seq`` order."""
+    conversation = models.ForeignKey(ChatConversation, on_delete=models.CASCADE, related_name="entries")
+    seq = models.IntegerField()
+    role = models.CharField(max_length=20)
+    text = models.TextField(blank=True)
+    meta = models.JSONField(default=dict, blank=True)      # any other keys the UI stored (e.g. "data")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["conversation", "seq"], name="chat_msg_conv_seq"),
+        ]
+
+    def __str__(self):
+        return f"{self.conversation_id} #{self.seq} {self.role}"
+
+
+class ChatArchive(models.Model):
+    """Compressed messages of a conversation nobody has touched for a while (cold storage)."""
+    conversation = models.OneToOneField(
+        ChatConversation, on_delete=models.CASCADE, primary_key=True, related_name="archive",
+    )
+    codec = models.CharField(max_length=10)                 # "zstd" or "zlib"
+    data = models.BinaryField()
+    message_count = models.IntegerField()
+    raw_size = models.IntegerField()                        # bytes of JSON before compression
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.conversation_id} ({self.codec}, {self.message_count} messages)"
+
+
+class AttendanceRecord(models.Model):
+    """One attendance day synced from FixHR, partitioned by the viewer whose token fetched it."""
+    viewer = models.CharField(max_length=64)
+    emp_pos = models.IntegerField()          # employee position in the upstream payload
+    day_pos = models.IntegerField()          # day position within that employee's entries
+    emp_name = models.CharField(max_length=200, blank=True)
+    employee_id = models.CharField(max_length=50, blank=True)
+    date = models.DateField()
+    status = models.CharField(max_length=20)
+    in_time = models.CharField(max_length=50)
+    out_time = models.CharField(max_length=50)
+    work_hrs = models.CharField(max_length=50)
+    is_late = models.BooleanField(default=False)
+    overtime_hours = models.CharField(max_length=50)
+    remark = models.TextField()
+    in_minutes = models.IntegerField(null=True, blank=True)    # in_time as minutes after midnight
+    out_minutes = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["viewer", "employee_id", "date"], name="att_viewer_emp_date"),
+            models.Index(fields=["viewer", "date"], name="att_viewer_date"),
+        ]
+
+    def __str__(self):
+        return f"{self.viewer} - {self.employee_id} - {self.date}"
+
+
+class AttendanceSync(models.Model):
+    """Sync state of one viewer's month; closed months are never fetched again."""
+    viewer = models.CharField(max_length=64)
+    year = models.IntegerField()
+    month = models.IntegerField()
+    synced_at = models.DateTimeField()
+    is_closed = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["viewer", "year", "month"], name="att_sync_viewer_month"),
+        ]
+
+    def __str__(self):
+        return f"{self.viewer} - {self.year}-{self.month:02d}"
+
+
+class StateEntry(models.Model):
+    """Per-user chat state (short history, slot memory) shared by all workers; see core.state_store."""
+    namespace = models.CharField(max_length=32)
+    key = models.CharField(max_length=100)
+    value = models.TextField()                  # JSON
+    size = models.IntegerField()                # bytes of ``value``
+    expires_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["namespace", "key"], name="state_ns_key"),
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"], name="state_expires"),
+        ]
+
+    def __str__(self):
+        return f"{self.namespace}:{self.key}"
@@ -0,0 +1,146 @@
+# core/pagination.py
+"""
+Lazy page-by-page reader for FixHR list endpoints.
+
+FixHR list APIs are paginated (``page`` / ``limit`` query params) and wrap the
+rows either as ``result.data`` (Laravel paginator) or as a bare ``result`` list.
+Instead of pulling one huge page and filtering in Python, handlers iterate the
+rows lazily, filter per page and stop as soon as they have enough matches.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from core import fixhr_http
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 25
+
+
+# ---------------- Payload helpers ----------------
+def extract_page_rows(payload):
+    """Return the list of rows from a FixHR list response (any known shape)."""
+    if isinstance(payload, list):
+        return payload
+    if not isinstance(payload, dict):
+        return []
+    result = payload.get("result")
+    if isinstance(result, list):
+        return result
+    if isinstance(result, dict):
+        rows = result.get("data")
+        if isinstance(rows, list):
+            return rows
+    rows = payload.get("data")
+    return rows if isinstance(rows, list) else []
+
+
+def extract_last_page(payload):
+    """Best-effort read of the last page number (None when the API does not say)."""
+    if not isinstance(payload, dict):
+        return None
+    result = payload.get("result")
+    if not isinstance(result, dict):
+        return None
+    pagination = result.get("pagination") if isinstance(result.get("pagination"), dict) else result
+    for key in ("last_page", "last_pages"):
+        value = pagination.get(key)
+        if value not in (None, ""):
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+# ---------------- Page fetch ----------------
+def fetch_page(url, headers, params, page, page_size, method="GET", timeout=15, **request_kwargs):
+    """Fetch one page and return ``(rows, last_page)``. Raises on HTTP/JSON errors."""
+    query = dict(params or {})
+    query["page"] = page
+    query["limit"] = page_size
+
+    r = fixhr_http.request(method, url, headers=headers, params=query, timeout=timeout, **request_kwargs)
+    logger.info("📡 %s page=%s status=%s", url, page, r.status_code)
+    payload = r.json()
+    return extract_page_rows(payload), extract_last_page(payload)
+
+
+def iter_upstream_pages(
+    url,
+    headers,
+    params=None,
+    page_size=DEFAULT_PAGE_SIZE,
+    start_page=1,
+    max_pages=None,
+    prefetch=False,
+    method="GET",
+    timeout=15,
+    **request_kwargs,
+):
+    """
+    Yield the rows of each page, one list per page, fetching pages on demand.
+
+    Stops on an empty/short page, on the API's ``last_page`` or after ``max_pages``.
+    With ``prefetch=True`` the next page is requested in the background while the
+    caller is still working on the current one; closing the generator early
+    (e.g. via ``collect_rows``) drops the pending prefetch.
+    """
+    def _fetch(page):
+        return fetch_page(url, headers, params, page, page_size, method=method, timeout=timeout, **request_kwargs)
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    pending = None
+    page = start_page
+    pages_read = 0
+
+    try:
+        rows, last_page = _fetch(page)
+        while True:
+            pages_read += 1
+            has_more = (
+                len(rows) >= page_size
+                and (last_page is None or page < last_page)
+                and (max_pages is None or pages_read < max_pages)
+            )
+
+            if has_more and executor:
+                pending = fixhr_http.submit(executor, _fetch, page + 1)
+
+            if rows:
+                yield rows
+
+            if not has_more:
+                return
+
+            page += 1
+            if pending is not None:
+                rows, last_page = pending.result()
+                pending = None
+            else:
+                rows, last_page = _fetch(page)
+    finally:
+        if pending is not None:
+            pending.cancel()
+        if executor:
+            executor.shutdown(wait=False)
+
+
+def iter_upstream_rows(url, headers, row_filter=None, **kwargs):
+    """Yield individual rows across pages, keeping only those ``row_filter`` accepts."""
+    for rows in iter_upstream_pages(url, headers, **kwargs):
+        for row in rows:
+            if not isinstance(row, dict):
+                continue
+            if row_filter is None or row_filter(row):
+                yield row
+
+
+def collect_rows(url, headers, limit, row_filter=None, **kwargs):
+    """Collect up to ``limit`` matching rows and stop fetching as soon as we have them."""
+    rows = iter_upstream_rows(url, headers, row_filter=row_filter, **kwargs)
+    try:
+        return list(islice(rows, limit))
+    finally:
+        rows.close()
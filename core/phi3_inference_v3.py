@@ -1,11 +1,14 @@
 import torch
 from transformers import AutoTokenizer, AutoModelForCausalLM
 import json
+import logging
 import re
 import time
 
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 MODEL_DIR = str((Path(__file__).resolve().parent / "merged_phi3_intent").resolve())
 
 
@@ -14,9 +17,9 @@ def get_device():
     Keep GPU/CPU selection consistent with model_inference2.
     """
     if torch.cuda.is_available():
-        print(">> [phi3_intent] Using GPU (cuda)")
+        logger.info(">> [phi3_intent] Using GPU (cuda)")
         return "cuda"
-    print(">> [phi3_intent] Using CPU")
+    logger.info(">> [phi3_intent] Using CPU")
     return "cpu"
 
 
@@ -83,7 +86,7 @@ Output:
 
 # ---------------------- MODEL LOADING ----------------------
 def _load_tokenizer():
-    print(">> [phi3_intent] Loading tokenizer...")
+    logger.info(">> [phi3_intent] Loading tokenizer...")
     return AutoTokenizer.from_pretrained(
         MODEL_DIR,
         trust_remote_code=True
@@ -91,7 +94,7 @@ def _load_tokenizer():
 
 
 def _load_model_on_device(device, torch_dtype):
-    print(f">> [phi3_intent] Loading model on {device}...")
+    logger.info(">> [phi3_intent] Loading model on %s...", device)
     model = AutoModelForCausalLM.from_pretrained(
         MODEL_DIR,
         torch_dtype=torch_dtype,
@@ -118,7 +121,7 @@ def load_model():
             return tokenizer, model, device
         except torch.cuda.OutOfMemoryError as exc:
             last_error = exc
-            print("!! [phi3_intent] CUDA OOM, falling back to CPU...")
+            logger.warning("!! [phi3_intent] CUDA OOM, falling back to CPU...")
             torch.cuda.empty_cache()
         except Exception as exc:
             last_error = exc
@@ -203,8 +206,8 @@ def fix_json_string(bad_json):
     try:
         return json.loads(bad_json)
     except json.JSONDecodeError as e:
-        print(f"JSON parse error: {e}")
-        print(f"Attempted to parse: {bad_json[:200]}...")
+        logger.error("JSON parse error: %s", e)
+        logger.debug("Attempted to parse: %s...", bad_json[:200])
         
         # Last resort: try to extract what we can with regex
         return extract_json_fallback(original)
@@ -333,15 +336,20 @@ def extract_fields(raw_output):
         return intent, confidence, reason, destination, action, leave_category, trip_name, purpose, remark
 
     except Exception as e:
-        print("Extractor error:", e)
+        logger.error("Extractor error: %s", e)
         return "", 0.0, "", "", "", "", "", "", ""
 
 
-print(">> [phi3_intent] Initializing global classifier...")
+logger.info(">> [phi3_intent] Initializing global classifier...")
 TOKENIZER, MODEL, DEVICE = load_model()
-print(">> [phi3_intent] Global classifier ready ✅")
+logger.info(">> [phi3_intent] Global classifier ready ✅")
 
-def intent_model_call(user_msg, custom_prompt=None):
+def intent_model_call(user_msg, custom_prompt=None, on_category=None):
+    """
+    Cascade: general/task, then the category, then the category's action.
+    ``on_category(category)`` is called as soon as the category stage answers,
+    before the action stage runs, so callers can start work for that category.
+    """
     # print(f"user_msg on intent_model_call========= : {custom_prompt}")
 
     prompt = make_prompt(user_msg, custom_prompt)
@@ -388,8 +396,10 @@ Output:
         # ⏱️ END TIMER
         end_time = time.perf_counter()
         latency_ms = (end_time - start_time) * 1000
-        print(f"NLU Time Taken:-------------------------------------------------------> middel--> {latency_ms:.2f} ms")
-        
+        logger.info("NLU Time Taken:-------------------------------------------------------> middel--> %.2f ms", latency_ms)
+        if on_category is not None:
+            on_category(intent)
+
         if intent == "leave":
             leave_prompt = """You are an NLU engine for FixHR.
 
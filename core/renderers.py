@@ -0,0 +1,121 @@
+# core/renderers.py
+"""
+Faster JSON responses and response compression.
+
+* ``JsonResponse`` — drop-in for ``django.http.JsonResponse`` that serializes
+  with ``orjson`` when it is installed (datetime/date/UUID natively, Decimal
+  via ``default``) and falls back to the stdlib encoder otherwise.
+* ``compress_response`` — view decorator that gzip/brotli-encodes the body when
+  it is larger than ``RESPONSE_COMPRESS_MIN_BYTES`` and the client accepts it.
+"""
+import functools
+import gzip
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse as DjangoJsonResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESS_MIN_BYTES = getattr(settings, "RESPONSE_COMPRESS_MIN_BYTES", 1024)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _orjson_default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    # anything else — let Django's encoder decide (lazy translations, durations, ...)
+    return DjangoJSONEncoder().default(obj)
+
+
+def dumps(data):
+    """Serialize to UTF-8 JSON bytes with the fastest available encoder."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=_orjson_default, option=ORJSON_OPTIONS)
+        except TypeError:
+            pass  # e.g. ints > 64 bit — stdlib handles those
+    return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+class JsonResponse(DjangoJsonResponse):
+    """``django.http.JsonResponse`` with a faster encoder; same signature and ``safe`` check."""
+
+    def __init__(self, data, encoder=DjangoJSONEncoder, safe=True, json_dumps_params=None, **kwargs):
+        if encoder is not DjangoJSONEncoder or json_dumps_params:
+            # custom encoder / dumps options requested — keep Django's exact behaviour
+            super().__init__(data, encoder=encoder, safe=safe, json_dumps_params=json_dumps_params, **kwargs)
+            return
+
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                "In order to allow non-dict objects to be serialized set the safe parameter to False."
+            )
+        kwargs.setdefault("content_type", "application/json")
+        super(DjangoJsonResponse, self).__init__(content=dumps(data), **kwargs)
+
+
+# ---------------- Compression ----------------
+def _accepted_encodings(request):
+    header = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    accepted = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(token.strip().lower())
+    return accepted
+
+
+def compress(request, response):
+    """Encode ``response`` in place if worthwhile. Returns the response."""
+    if (
+        response.streaming
+        or response.has_header("Content-Encoding")
+        or len(response.content) < COMPRESS_MIN_BYTES
+    ):
+        return response
+
+    patch_vary_headers(response, ("Accept-Encoding",))
+    accepted = _accepted_encodings(request)
+    if brotli is not None and "br" in accepted:
+        body, encoding = brotli.compress(response.content, quality=BROTLI_QUALITY), "br"
+    elif "gzip" in accepted:
+        body, encoding = gzip.compress(response.content, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
+    else:
+        return response
+
+    if len(body) >= len(response.content):
+        return response
+
+    response.content = body
+    response["Content-Length"] = str(len(body))
+    response["Content-Encoding"] = encoding
+    if response.has_header("ETag"):
+        response["ETag"] = response["ETag"].rstrip('"') + f'-{encoding}"'
+    return response
+
+
+def compress_response(view):
+    """View decorator: negotiate br/gzip for large responses."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return compress(request, view(request, *args, **kwargs))
+    return wrapper
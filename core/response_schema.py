@@ -0,0 +1,142 @@
+# core/response_schema.py
+"""
+Per-``reply_type`` response schemas for the chat UI.
+
+Handlers build card payloads from full FixHR rows (often keeping ``"raw": row``
+for debugging). Before a payload is serialized it is projected down to the
+fields the matching ``render*`` function in ``chat_page.html`` actually reads.
+Add a field here when a renderer starts using it.
+
+``?debug_raw=1`` on the request skips the projection and keeps raw rows.
+"""
+import contextvars
+import functools
+
+_DEBUG_RAW = contextvars.ContextVar("debug_raw", default=False)
+
+_APPROVAL_IDS = ("emp_d_id", "module_id", "master_module_id")
+
+# reply_type → {list path (dotted for nested): fields kept on each row}
+RESPONSE_SCHEMAS = {
+    "leave_cards": {
+        "leaves": ("leave_id", "emp_name", "leave_type", "start_date", "end_date", "reason", "status_name")
+        + _APPROVAL_IDS,
+    },
+    "my_leaves": {
+        "leaves": ("leave_id", "leave_type", "start_date", "end_date", "reason", "status_name"),
+    },
+    "gatepass_cards": {
+        "gatepasses": ("id", "emp_name", "out_time", "in_time", "reason", "destination", "status_name")
+        + _APPROVAL_IDS,
+    },
+    "missed_cards": {
+        "missed": ("id", "emp_name", "date", "in_time", "out_time", "reason", "status_name") + _APPROVAL_IDS,
+    },
+    "my_missed_cards": {
+        "missed": ("date", "in_time", "out_time", "reason", "status", "status_name"),
+    },
+    "compoff_cards": {
+        "compoff": (
+            "atd_id", "emp_name", "emp_code", "date", "applied_date", "check_in_time", "check_out_time",
+            "total_worked_hours", "co_quantity", "reason", "status_name",
+        ) + _APPROVAL_IDS,
+    },
+    "travel_plans": {
+        "travel.plans": (
+            "plan_id", "trp_id", "plan_name", "call_id", "employee_name", "employee_code", "destination",
+            "travel_type", "purpose", "status", "from_date", "to_date", "start_time", "end_time",
+            "is_plan_editable", "is_expense_editable", "is_claimable", "total_expense",
+        ) + _APPROVAL_IDS,
+    },
+    "tada_claims": {
+        "tada.claims": (
+            "tc_id", "trp_id", "trp_unique_id", "employee_name", "employee_id", "status", "amount",
+            "gross_amount", "deduction_amount", "destination", "from_date", "to_date", "claim_pdf_url",
+        ) + _APPROVAL_IDS,
+    },
+    "tada_claim_list": {
+        "claims": (
+            "claim_id", "tc_id", "trp_id", "employee_name", "employee_id", "amount", "status", "travel_type",
+            "from_date", "to_date", "created_at", "purpose", "destination", "claim_pdf_url",
+        ),
+    },
+    "tada_local_claim_list": {
+        "claims": (
+            "claim_id", "tc_id", "trip_id", "employee_name", "employee_id", "amount", "status", "travel_type",
+            "from_date", "to_date", "created_at", "purpose", "destination", "claim_pdf_url",
+        ),
+    },
+    "tada_acceptance_list": {
+        "acceptance": (
+            "claim_id", "tc_id", "employee_name", "employee_id", "trip_name", "travel_type", "from_date",
+            "to_date", "amount", "net_amount", "status", "destination", "purpose", "next_action", "claim_pdf_url",
+        ),
+    },
+    "tada_local_acceptance_list": {
+        "claims": (
+            "claim_id", "tc_id", "employee_name", "employee_id", "amount", "deduction", "net_payable", "status",
+            "travel_type", "from_date", "to_date", "claim_pdf_url",
+        ),
+    },
+    "tada_travel_plan_list": {
+        "plans": (
+            "trip_id", "trp_id", "trip_name", "employee_id", "destination", "travel_type", "from_date", "to_date",
+            "start_time", "end_time", "purpose", "status", "next_action",
+        ),
+    },
+    "tada_plan_list": {
+        "plans": (
+            "trp_id", "plan_code", "title", "employee_id", "destination", "start_date", "end_date", "start_time",
+            "end_time", "purpose", "da_amount", "claim_amount", "status", "is_plan_editable",
+            "is_detail_editable", "is_expense_editable", "is_claimable", "created_at",
+        ),
+    },
+}
+
+
+def debug_raw_enabled():
+    return _DEBUG_RAW.get()
+
+
+def with_debug_raw(view):
+    """View decorator: ``?debug_raw=1`` turns projection off for this request."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _DEBUG_RAW.set(request.GET.get("debug_raw") == "1")
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _DEBUG_RAW.reset(token)
+    return wrapper
+
+
+def _project_rows(rows, fields):
+    return [
+        {k: row[k] for k in fields if k in row} if isinstance(row, dict) else row
+        for row in rows
+    ]
+
+
+def project_reply(payload):
+    """Return ``payload`` trimmed to its ``reply_type`` schema (unchanged if unknown/debug)."""
+    if not isinstance(payload, dict) or debug_raw_enabled():
+        return payload
+    schema = RESPONSE_SCHEMAS.get(payload.get("reply_type"))
+    if not schema:
+        return payload
+
+    projected = dict(payload)
+    projected.pop("raw", None)
+    for path, fields in schema.items():
+        *parents, leaf = path.split(".")
+        node = projected
+        for key in parents:
+            child = node.get(key)
+            if not isinstance(child, dict):
+                node = None
+                break
+            node[key] = child = dict(child)   # copy on the way down, never mutate the handler's dicts
+            node = child
+        if node is not None and isinstance(node.get(leaf), list):
+            node[leaf] = _project_rows(node[leaf], fields)
+    return projected
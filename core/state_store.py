@@ -0,0 +1,195 @@
+# core/state_store.py
+"""
+Bounded per-user chat state.
+
+Replaces the module-level ``SESSION_MEMORY`` / ``CHAT_HISTORY`` dicts in
+``views`` and ``chat_memory``, which grew with every user and message and
+were private to one worker process. Values are JSON, addressed by
+``(namespace, key)`` — e.g. ``("history", "<employee id>")`` — and bounded
+three ways:
+
+* per entry: at most ``STATE_MAX_ENTRY_BYTES`` of JSON; ``append`` keeps a
+  list to ``max_items`` and drops its oldest items to stay under the byte cap;
+* per age: entries expire ``STATE_TTL`` seconds after their last write;
+* per process (memory backend): least recently used entries are evicted
+  beyond ``STATE_MAX_ENTRIES`` or ``STATE_MAX_BYTES`` in total.
+
+Backends (``STATE_STORE_BACKEND``):
+
+* ``"memory"`` (default) — an in-process LRU; fastest, but each worker has
+  its own state;
+* ``"database"`` — ``StateEntry`` rows in the default database, shared by
+  every worker using it. Use this when running more than one worker.
+
+Values are stored serialized, so ``get`` always returns a fresh copy;
+write changes back with ``set``.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from core import metrics
+from core.models import StateEntry
+
+STATE_TTL = getattr(settings, "STATE_TTL", 24 * 60 * 60)                      # seconds since last write
+MAX_ENTRY_BYTES = getattr(settings, "STATE_MAX_ENTRY_BYTES", 64 * 1024)
+MAX_ENTRIES = getattr(settings, "STATE_MAX_ENTRIES", 20000)                    # memory backend
+MAX_BYTES = getattr(settings, "STATE_MAX_BYTES", 64 * 1024 * 1024)             # memory backend
+PURGE_EVERY = 500                                                              # database writes between purges
+
+
+class StateTooLarge(ValueError):
+    pass
+
+
+def _encode(value):
+    data = json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+    size = len(data.encode("utf-8"))
+    return data, size
+
+
+def _bounded_list(items, item, max_items):
+    """``items + [item]`` trimmed to ``max_items`` and then, oldest first, to the entry byte cap."""
+    items = (list(items) + [item])[-max_items:] if max_items else list(items) + [item]
+    data, size = _encode(items)
+    while size > MAX_ENTRY_BYTES and len(items) > 1:
+        items = items[max(1, len(items) // 4):]   # drop the oldest quarter and re-measure
+        data, size = _encode(items)
+    if size > MAX_ENTRY_BYTES:
+        raise StateTooLarge(f"state item of {size} bytes exceeds STATE_MAX_ENTRY_BYTES")
+    return items, data, size
+
+
+class MemoryStateStore:
+    """In-process LRU with TTL and byte accounting."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, ttl=STATE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()   # (namespace, key) → (expires_at, size, json)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, k):
+        entry = self._entries.pop(k, None)
+        if entry:
+            self._bytes -= entry[1]
+
+    def _get_raw(self, k):
+        entry = self._entries.get(k)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._drop(k)
+            metrics.incr("state.expired")
+            return None
+        self._entries.move_to_end(k)
+        return entry[2]
+
+    def _put_raw(self, k, data, size, ttl):
+        self._drop(k)
+        self._entries[k] = (time.monotonic() + (ttl or self.ttl), size, data)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+            metrics.incr("state.evicted")
+
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            data = self._get_raw((namespace, str(key)))
+        return default if data is None else json.loads(data)
+
+    def set(self, namespace, key, value, ttl=None):
+        data, size = _encode(value)
+        if size > MAX_ENTRY_BYTES:
+            raise StateTooLarge(f"state value of {size} bytes exceeds STATE_MAX_ENTRY_BYTES")
+        with self._lock:
+            self._put_raw((namespace, str(key)), data, size, ttl)
+
+    def append(self, namespace, key, item, max_items=None, ttl=None):
+        """Append ``item`` to the list at ``key`` (created if missing), keeping it bounded."""
+        k = (namespace, str(key))
+        with self._lock:
+            data = self._get_raw(k)
+            items, data, size = _bounded_list(json.loads(data) if data else [], item, max_items)
+            self._put_raw(k, data, size, ttl)
+        return items
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._drop((namespace, str(key)))
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "entries": len(self._entries), "bytes": self._bytes}
+
+
+class DatabaseStateStore:
+    """``StateEntry`` rows, shared by every worker on the same database; expired rows are purged lazily."""
+
+    def __init__(self, ttl=STATE_TTL):
+        self.ttl = ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _expiry(self, ttl):
+        return timezone.now() + timedelta(seconds=ttl or self.ttl)
+
+    def _maybe_purge(self):
+        with self._lock:
+            self._writes += 1
+            due = self._writes % PURGE_EVERY == 0
+        if due:
+            purged, _ = StateEntry.objects.filter(expires_at__lt=timezone.now()).delete()
+            metrics.incr("state.expired", purged)
+
+    def _write(self, namespace, key, data, size, ttl):
+        StateEntry.objects.update_or_create(
+            namespace=namespace, key=key,
+            defaults={"value": data, "size": size, "expires_at": self._expiry(ttl)},
+        )
+
+    def get(self, namespace, key, default=None):
+        data = (
+            StateEntry.objects.filter(namespace=namespace, key=str(key), expires_at__gt=timezone.now())
+            .values_list("value", flat=True)
+            .first()
+        )
+        return default if data is None else json.loads(data)
+
+    def set(self, namespace, key, value, ttl=None):
+        data, size = _encode(value)
+        if size > MAX_ENTRY_BYTES:
+            raise StateTooLarge(f"state value of {size} bytes exceeds STATE_MAX_ENTRY_BYTES")
+        self._write(namespace, str(key), data, size, ttl)
+        self._maybe_purge()
+
+    def append(self, namespace, key, item, max_items=None, ttl=None):
+        with transaction.atomic():
+            current = self.get(namespace, key, [])
+            items, data, size = _bounded_list(current, item, max_items)
+            self._write(namespace, str(key), data, size, ttl)
+        self._maybe_purge()
+        return items
+
+    def delete(self, namespace, key):
+        StateEntry.objects.filter(namespace=namespace, key=str(key)).delete()
+
+    def stats(self):
+        totals = StateEntry.objects.filter(expires_at__gt=timezone.now()).aggregate(entries=Count("pk"), bytes=Sum("size"))
+        return {"backend": "database", "entries": totals["entries"], "bytes": totals["bytes"] or 0}
+
+
+_BACKENDS = {"memory": MemoryStateStore, "database": DatabaseStateStore}
+
+state = _BACKENDS[getattr(settings, "STATE_STORE_BACKEND", "memory")]()
+
+metrics.register_gauge("state.store", state.stats)
@@ -22,9 +22,15 @@ urlpatterns = [
         # ✅ Conversation history endpoints
     path('api/conversations/', views.get_conversations, name='get_conversations'),
     path('api/conversations/save/', views.save_conversation, name='save_conversation'),
+    path('api/conversations/append/', views.append_conversation, name='append_conversation'),
     path('api/conversations/load/', views.load_conversation, name='load_conversation'),
+    path('api/conversations/older/', views.load_older_messages, name='load_older_messages'),
     path('api/conversations/delete/', views.delete_conversation, name='delete_conversation'),
     path("api/chat/search/", views.search_conversations, name="chat_search"),
+    path("api/approvals/bulk/", views.bulk_approval_api, name="bulk_approval_api"),
+    path("api/metrics/", views.metrics_api, name="metrics_api"),
+    path("api/attendance/export/", views.attendance_export, name="attendance_export"),
+    path("api/attendance/register/", views.attendance_register_page, name="attendance_register_page"),
     path("api/tada/purposes/", views.tada_purposes, name="tada_purposes"),
     path("api/tada/types/", views.tada_travel_types, name="tada_travel_types"),
     path("api/tada/create/", views.tada_create_request, name="tada_create_request"),
@@ -1,17 +1,45 @@
 import requests, json, hashlib, traceback, re, os
-import dateparser
 import logging, calendar
 from django.shortcuts import render, redirect
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_protect, csrf_exempt
 from django.views.decorators.http import require_POST, require_http_methods, require_GET, require_POST
 from collections import defaultdict
+from functools import lru_cache
 # Core imports for intent classification and response generation
 from core.model_inference2 import model_response
 from core.phi3_inference_v3 import intent_model_call
 from django.conf import settings
 from core.extract_date_time import extract_datetime_info
+from core.date_grammar import parse_datetime
+from core.message_context import DEVANAGARI_CHARS, MONTH_NAMES, MessageContext
+from core.intent_registry import ChatCall, IntentRegistry
+from core.chat_pipeline import ChatPipeline
+from core.pagination import collect_rows
+from core.response_schema import project_reply, with_debug_raw
+from core.renderers import JsonResponse, compress_response
+from core.log_utils import body as log_body, lazy_json
+from core.attendance_engine import report_from_frame
+from core.attendance_query import compile_attendance_query
+from core.attendance_store import ensure_synced, viewer_key
+from core.attendance_store import load_frame as load_attendance_frame
+from core.employee_directory import directory_for as employee_directory_for
+from core.attendance_export import Workbook, register_rows, stream_csv, stream_xlsx
+from core.attendance_pages import PAGE_SIZE as ATTENDANCE_PAGE_SIZE
+from core.attendance_pages import first_page as first_attendance_page, next_page as next_attendance_page
+from core.conversations import LIST_PAGE_SIZE as CONVERSATION_PAGE_SIZE
+from core.conversations import MESSAGE_PAGE_SIZE as CONVERSATION_MESSAGE_PAGE_SIZE
+from core.conversations import SequenceConflict, list_conversations, message_page
+from core.conversation_search import search_conversations as search_conversation_index, unindex_conversations
+from core.conversation_writer import writer as conversation_writer
+from core.conversation_archive import restore_conversation
+from core.state_store import state as chat_state
+from core import fixhr_http, metrics
+from core.approvals import (
+    APPROVAL_ACTIONS, BULK_APPROVAL_MAX_ITEMS, get_approval_step, invalidate_approval_step, parse_bulk_command,
+    prefetch_approval_steps, run_approval, run_bulk_approvals,
+)
 from django.utils import timezone 
 from .models import ChatConversation
 import uuid
@@ -67,6 +95,14 @@ COMPOFF_APPROVAL_URL = "http://192.168.1.53/api/admin/approval/approval_handler"
 
 # ================================================================================
 
+# ---------------- Upstream list paging ----------------
+BULK_APPROVAL_DEADLINE = getattr(settings, "FIXHR_BULK_DEADLINE", 90)  # seconds for a whole bulk run
+PENDING_LIST_PAGE_SIZE = 25    # rows per upstream page for pending approval lists
+PENDING_LIST_MAX_ROWS = 50     # stop paging once this many rows are collected
+COMPOFF_LIST_PAGE_SIZE = 50
+COMPOFF_LIST_MAX_ROWS = 500     # same cap as the old single 500-row page
+COMPOFF_LIST_MAX_PAGES = 10    # never scan more than 500 upstream rows (old fixed page size)
+
 # ---------------- Logging ----------------
 logger = logging.getLogger(__name__)
 
@@ -74,20 +110,28 @@ logger = logging.getLogger(__name__)
 
 
 # ---------------- Session Memory ----------------
-SESSION_MEMORY = {}
-CHAT_HISTORY = {}
+# per-user slot memory ("session") and chat log ("history") live in the bounded state store
+CHAT_HISTORY_MAX_ITEMS = getattr(settings, "CHAT_HISTORY_MAX_ITEMS", 100)
+EMPTY_SLOT_MEMORY = {"date": None, "leave_type": None, "reason": None}
 # ---------------- Helpers ----------------
 def md5_hash(value):
     return hashlib.md5(str(value).encode()).hexdigest()
 
-# ---------------- Language Detection ----------------
-DEVANAGARI_CHARS = "अआइईउऊएऐओऔकखगघचछजझटठडढतथदधनपफबभमयरलवशषसह"
 
+@lru_cache(maxsize=2048)
+def parse_fixhr_date(value):
+    """Parse FixHR "DD MMM, YYYY" strings; list rows repeat the same few dates, so cache them."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%d %b, %Y").date()
+    except (TypeError, ValueError):
+        return None
+
+# ---------------- Language Detection ----------------
 def detect_language(text: str) -> str:
-    """Detect if text is Hindi or English"""
-    if not text:
-        return "en"
-    return "hi" if any(ch in text for ch in DEVANAGARI_CHARS) else "en"
+    """Detect if text (a string or a MessageContext) is Hindi or English"""
+    return MessageContext.of(text).language
 
 # ---------------- Intent Classification Wrapper ----------------
 INTENT_ALIAS = {
@@ -104,26 +148,13 @@ def search_conversations(request):
     if not user_id:
         return JsonResponse({"ok": False, "results": [], "error": "Not logged in"})
 
-    query = request.GET.get("q", "").lower().strip()
+    query = request.GET.get("q", "").strip()
 
     if not query:
         return JsonResponse({"ok": True, "results": []})
 
-    conversations = ChatConversation.objects.filter(employee_id=user_id)
-
-    results = []
-
-    for conv in conversations:
-        for m in conv.messages:
-            if query in m.get("text", "").lower():
-                results.append({
-                    "conversation_id": conv.conv_id,
-                    "title": conv.title,
-                    "matched_text": m.get("text", "")[:150],
-                    "timestamp": conv.timestamp.isoformat(),
-                })
-                break  # only one match per conversation
-
+    conversation_writer.flush(employee_id=user_id)
+    results = search_conversation_index(user_id, query)
     return JsonResponse({"ok": True, "results": results})
 
 
@@ -136,19 +167,18 @@ def search_conversations(request):
 
 @csrf_exempt
 def get_conversations(request):
+    """GET /api/conversations/?limit=30&cursor=<next_cursor> — newest first, without message bodies."""
     user_id = request.session.get("employee_id")
     if not user_id:
         return JsonResponse({"ok": False, "conversations": []})
-    
-    convs = ChatConversation.objects.filter(employee_id=user_id).order_by('-timestamp')
-    data = []
-    for c in convs:
-        data.append({
-            "id": c.conv_id,
-            "title": c.title,
-            "timestamp": c.timestamp.isoformat(),
-        })
-    return JsonResponse({"ok": True, "conversations": data})
+
+    try:
+        limit = int(request.GET.get("limit") or CONVERSATION_PAGE_SIZE)
+        conversation_writer.flush(employee_id=user_id)
+        page = list_conversations(user_id, limit, request.GET.get("cursor"))
+    except ValueError:
+        return JsonResponse({"ok": False, "conversations": [], "error": "Invalid limit or cursor"}, status=400)
+    return JsonResponse({"ok": True, **page})
 
 
 @csrf_exempt
@@ -164,37 +194,50 @@ def save_conversation(request):
         data = json.loads(request.body)
         conv_id = data.get("conversation_id")
         messages = data.get("messages", [])
+
+        # full-array save (older clients); queued, and only rows after the first changed message are rewritten
+        conv_id, message_count = conversation_writer.replace(user_id, conv_id, messages)
         
-        # Generate title
-        title = "New Chat"
-        if messages:
-            first_user_msg = next((m["text"] for m in messages if m["role"] == "user"), "")
-            title = first_user_msg[:50] + ("..." if len(first_user_msg) > 50 else "")
-        
-        if conv_id:
-            # Update existing
-            conv = ChatConversation.objects.get(conv_id=conv_id, employee_id=user_id)
-            conv.messages = messages
-            conv.title = title
-            conv.timestamp = timezone.now()
-            conv.save()
-        else:
-            # Create new
-            conv_id = str(uuid.uuid4())
-            ChatConversation.objects.create(
-                employee_id=user_id,
-                conv_id=conv_id,
-                title=title,
-                messages=messages,
-            )
-        
-        return JsonResponse({"ok": True, "conversation_id": conv_id})
+        return JsonResponse({"ok": True, "conversation_id": conv_id, "message_count": message_count})
         
     except Exception as e:
         return JsonResponse({"ok": False, "error": str(e)})
 
 
 @csrf_exempt
+def append_conversation(request):
+    """
+    POST /api/conversations/append/ {"conversation_id": ..., "base": n, "messages": [new messages]}
+    Appends only the messages added since the client's last save. ``base`` is the message count
+    the client last got back; if the server has a different count it answers 409 with its own.
+    The write itself is queued (``core.conversation_writer``); the answer does not wait for it.
+    """
+    if request.method != "POST":
+        return JsonResponse({"ok": False, "error": "POST only"})
+
+    user_id = request.session.get("employee_id")
+    if not user_id:
+        return JsonResponse({"ok": False, "error": "Not logged in"})
+
+    try:
+        data = json.loads(request.body)
+        messages = data.get("messages") or []
+        if not isinstance(messages, list):
+            return JsonResponse({"ok": False, "error": "messages must be a list"}, status=400)
+        conv_id, message_count = conversation_writer.append(
+            user_id, data.get("conversation_id"), messages, data.get("base"),
+        )
+        return JsonResponse({"ok": True, "conversation_id": conv_id, "message_count": message_count})
+    except SequenceConflict as e:
+        return JsonResponse({"ok": False, "error": "conflict", "message_count": e.message_count}, status=409)
+    except ChatConversation.DoesNotExist:
+        return JsonResponse({"ok": False, "error": "Not found"}, status=404)
+    except Exception as e:
+        return JsonResponse({"ok": False, "error": str(e)})
+
+
+@csrf_exempt
+@compress_response
 def load_conversation(request):
     if request.method != "POST":
         return JsonResponse({"ok": False, "error": "POST only"})
@@ -206,14 +249,19 @@ def load_conversation(request):
     try:
         data = json.loads(request.body)
         conv_id = data.get("conversation_id")
+        conversation_writer.flush(conv_ids=[conv_id])
         conv = ChatConversation.objects.get(conv_id=conv_id, employee_id=user_id)
+        restore_conversation(conv)   # archived (cold) conversations come back transparently
+        # newest page only; the chat page pulls older ones from /api/conversations/older/
+        page = message_page(conv, limit=data.get("limit") or CONVERSATION_MESSAGE_PAGE_SIZE)
         
         return JsonResponse({
             "ok": True,
             "conversation": {
                 "id": conv.conv_id,
                 "title": conv.title,
-                "messages": conv.messages,
+                **page,
+                "message_count": conv.message_count,
                 "timestamp": conv.timestamp.isoformat()
             }
         })
@@ -223,6 +271,36 @@ def load_conversation(request):
         return JsonResponse({"ok": False, "error": str(e)})
 
 
+@csrf_exempt
+@compress_response
+def load_older_messages(request):
+    """
+    POST /api/conversations/older/ {"conversation_id": ..., "cursor": <older_cursor>, "limit": 50}
+    The page of messages before ``cursor``, oldest first, with the next ``older_cursor``.
+    """
+    if request.method != "POST":
+        return JsonResponse({"ok": False, "error": "POST only"})
+
+    user_id = request.session.get("employee_id")
+    if not user_id:
+        return JsonResponse({"ok": False, "error": "Not logged in"})
+
+    try:
+        data = json.loads(request.body)
+        cursor = str(data.get("cursor") or "")
+        if not cursor.isdigit():
+            return JsonResponse({"ok": False, "error": "Invalid cursor"}, status=400)
+        conversation_writer.flush(conv_ids=[data.get("conversation_id")])
+        conv = ChatConversation.objects.get(conv_id=data.get("conversation_id"), employee_id=user_id)
+        restore_conversation(conv)
+        page = message_page(conv, before=int(cursor), limit=data.get("limit") or CONVERSATION_MESSAGE_PAGE_SIZE)
+        return JsonResponse({"ok": True, **page})
+    except ChatConversation.DoesNotExist:
+        return JsonResponse({"ok": False, "error": "Not found"}, status=404)
+    except Exception as e:
+        return JsonResponse({"ok": False, "error": str(e)})
+
+
 @csrf_exempt
 def delete_conversation(request):
     if request.method != "POST":
@@ -235,25 +313,28 @@ def delete_conversation(request):
     try:
         data = json.loads(request.body)
         conv_id = data.get("conversation_id")
+        conversation_writer.flush(conv_ids=[conv_id])
         ChatConversation.objects.filter(conv_id=conv_id, employee_id=user_id).delete()
+        unindex_conversations(user_id, [conv_id])
         return JsonResponse({"ok": True})
     except Exception as e:
         return JsonResponse({"ok": False, "error": str(e)})
 
 
-def classify_message(message: str, custom_prompt=None):
+def classify_message(message: str, custom_prompt=None, on_category=None):
     """
     Wrapper around Phi-3 inference — returns only
     intent, confidence, reason, destination
+    (``on_category`` is passed through to the cascade's category stage)
     """
+    ctx = MessageContext.of(message)
     try:
-        intent, confidence, reason, destination, action, leave_category, trip_name, purpose, remark = intent_model_call(message, custom_prompt=None)
+        intent, confidence, reason, destination, action, leave_category, trip_name, purpose, remark = intent_model_call(ctx.text, custom_prompt=None, on_category=on_category)
 
-        print("----------------------------> intent: ", intent)
+        logger.debug("----------------------------> intent:  %s", intent)
 
     except Exception as exc:
         logger.error("Intent model failed: %s", exc, exc_info=True)
-        print(f"intent model failed =============== : {exc}")
         return "", 0.0, "", ""
 
     # Normalize empty intent
@@ -267,12 +348,13 @@ def classify_message(message: str, custom_prompt=None):
         "reason": reason or "",
         "destination": destination or "",
         "leave_category": leave_category or "",
-        "language": detect_language(message)
+        "language": ctx.language
     }
 
 # ---------------- Decision Context Builder ----------------
 def build_decision_context(message: str, classification: dict, datetime_info: dict) -> dict:
     """Build decision context from classification and datetime info"""
+    message = str(message)
     slots = classification.get("slots", {}) or {}
     dt = datetime_info or {}
 
@@ -342,7 +424,7 @@ TRANSACTION_KEYWORDS = [
 ]
 
 def is_general_query(text):
-    t = nlp_normalize(text)
+    t = MessageContext.of(text).normalized
     # If it clearly targets transactional action, let existing handlers process
     if any(k in t for k in TRANSACTION_KEYWORDS):
         return False
@@ -382,39 +464,9 @@ def is_holiday_intent(text):
 
 
 def extract_month_year(text):
-    t = (text or "").lower()
+    ctx = MessageContext.of(text)
     now = datetime.now()
-    month = None
-    year = None
-
-    month_map = {
-        "january": 1, "jan": 1,
-        "february": 2, "feb": 2,
-        "march": 3, "mar": 3,
-        "april": 4, "apr": 4,
-        "may": 5,
-        "june": 6, "jun": 6,
-        "july": 7, "jul": 7,
-        "august": 8, "aug": 8,
-        "september": 9, "sep": 9, "sept": 9,
-        "october": 10, "oct": 10,
-        "november": 11, "nov": 11,
-        "december": 12, "dec": 12,
-    }
-
-    for name, num in month_map.items():
-        if name in t:
-            month = num
-            break
-
-    year_match = re.search(r"\b(20\d{2})\b", t)
-    if year_match:
-        try:
-            year = int(year_match.group(1))
-        except Exception:
-            year = None
-
-    return (month or now.month, year or now.year)
+    return (ctx.month or now.month, ctx.year or now.year)
 
 
 def fetch_holidays(headers, month=None, year=None):
@@ -427,7 +479,7 @@ def fetch_holidays(headers, month=None, year=None):
         params["month"] = month
 
     try:
-        res = requests.get(
+        res = fixhr_http.get(
             FIXHR_HOLIDAY_URL,
             headers={**headers, "Accept": "application/json"},
             params=params,
@@ -468,14 +520,8 @@ def is_attendance_intent(text):
 
 
 def extract_employee_name(text):
-    t = (text or "").strip()
-    # Heuristics: capture name after keywords like 'for', 'of', '@'
-    m = re.search(r"(?:for|of|employee|emp)\s+([a-zA-Z][a-zA-Z .'-]{1,60})", t, re.I)
-    if m:
-        name = m.group(1).strip().strip("-.,")
-        return name
-    # Fallback: None (no filter)
-    return None
+    # Heuristics: capture name after keywords like 'for', 'of', '@'; None means no filter
+    return MessageContext.of(text).employee_name
 
 
 def extract_specific_date(text, month, year):
@@ -627,9 +673,9 @@ def extract_time(text):
 def handle_leave_balance(token):
     try:
         headers = {"Accept": "application/json", "authorization": f"Bearer {token}"}
-        r = requests.get(LEAVE_BALANCE_URL, headers=headers, timeout=15)
-        print("📡 Leave Balance Status:", r.status_code)
-        print("📡 Leave Balance Body:", r.text)
+        r = fixhr_http.get(LEAVE_BALANCE_URL, headers=headers, timeout=15)
+        logger.info("📡 Leave Balance Status: %s", r.status_code)
+        logger.debug("📡 Leave Balance Body: %s", log_body(r))
 
         data = r.json() if r.content else {}
         result_items = data.get("result") or []
@@ -664,16 +710,12 @@ def handle_leave_balance(token):
 def handle_apply_leave(reason,leave_category, msg, token, datetime_info=None):
     """
     Apply leave using extract_date_time.py for date extraction.
-    datetime_info can be passed from chat_api if already extracted.
+    msg may be a MessageContext; datetime_info can be passed from chat_api if already extracted.
     """
     try:
-        print("🗓️ Apply Leave Flow Triggered")
-        
-        # Use extract_date_time.py for date extraction
-        if datetime_info:
-            dt_info = datetime_info
-        else:
-            dt_info = extract_datetime_info(msg)
+        logger.debug("🗓️ Apply Leave Flow Triggered")
+        ctx = MessageContext.of(msg)
+        dt_info = datetime_info or ctx.datetime_info
         
         # Extract dates from datetime_info
         start_date_str = dt_info.get("start_date")
@@ -688,8 +730,8 @@ def handle_apply_leave(reason,leave_category, msg, token, datetime_info=None):
             end_dt = datetime.fromisoformat(end_date_str).date() if isinstance(end_date_str, str) else end_date_str
         except:
             # Fallback parsing
-            start_dt = dateparser.parse(start_date_str)
-            end_dt = dateparser.parse(end_date_str) if end_date_str != start_date_str else start_dt
+            start_dt = parse_datetime(start_date_str)
+            end_dt = parse_datetime(end_date_str) if end_date_str != start_date_str else start_dt
             if start_dt:
                 start_dt = start_dt.date()
             if end_dt:
@@ -713,7 +755,7 @@ def handle_apply_leave(reason,leave_category, msg, token, datetime_info=None):
         ]
         
         for pattern in reason_patterns:
-            match = re.search(pattern, msg, re.I)
+            match = ctx.search(pattern, re.I)
             if match:
                 reason_text = match.group(1).strip()
                 break
@@ -724,7 +766,7 @@ def handle_apply_leave(reason,leave_category, msg, token, datetime_info=None):
 
         # Determine day type
         day_type_id = 201  # Full day
-        if re.search(r"half\s*day", msg, re.I):
+        if ctx.search(r"half\s*day", re.I):
             day_type_id = 202  # Half day
 
         # Enhanced category detection
@@ -745,7 +787,7 @@ def handle_apply_leave(reason,leave_category, msg, token, datetime_info=None):
         
         for key, meta in category_map.items():
             # More flexible matching
-            if re.search(rf"\b{key}\b", msg, re.I):
+            if ctx.has_word(key):
                 category_id = meta["id"]
                 category_name = meta["name"]
                 break
@@ -762,10 +804,10 @@ def handle_apply_leave(reason,leave_category, msg, token, datetime_info=None):
             "reason": (None, str(reason_text)),
         }
 
-        print("📦 Leave Apply Payload (multipart):", {k: v[1] for k, v in multipart_fields.items()})
-        r = requests.post(LEAVE_APPLY_URL, headers=headers, files=multipart_fields, timeout=20)
-        print("📡 Leave Apply Status:", r.status_code)
-        print("📡 Leave Apply Body:", r.text)
+        logger.debug("📦 Leave Apply Payload (multipart): %s", {k: v[1] for k, v in multipart_fields.items()})
+        r = fixhr_http.post(LEAVE_APPLY_URL, headers=headers, files=multipart_fields, timeout=20)
+        logger.info("📡 Leave Apply Status: %s", r.status_code)
+        logger.debug("📡 Leave Apply Body: %s", log_body(r))
 
         data = r.json() if r.content else {}
         if data.get("status") or data.get("success"):
@@ -783,34 +825,21 @@ def handle_apply_leave(reason,leave_category, msg, token, datetime_info=None):
 
 def handle_pending_leaves(token, role_name):
     try:
-        print("==================================")
 
         headers = {
             "Accept": "application/json",
             "authorization": f"Bearer {token}"
         }
-        params = {"page": 1, "limit": 10}
-
-        r = requests.get(
+        rows = collect_rows(
             LEAVE_LIST_URL,
-            headers=headers,
-            params=params,
+            headers,
+            limit=PENDING_LIST_MAX_ROWS,
+            page_size=PENDING_LIST_PAGE_SIZE,
+            prefetch=True,
             timeout=15,
             verify=False  # only if self-signed SSL
         )
-
-        data = r.json()
-        print("leaves data", data)
-
-        # 🔥 SAFE parsing
-        result = data.get("result")
-
-        if isinstance(result, dict):
-            rows = result.get("data", [])
-        elif isinstance(result, list):
-            rows = result
-        else:
-            rows = []
+        logger.info("leaves rows: %s", len(rows))
 
         if rows:
             leave_cards = []
@@ -839,12 +868,13 @@ def handle_pending_leaves(token, role_name):
                     ),
                 })
 
-            return JsonResponse({
+            _prefetch_approval_steps("leave", leave_cards, "leave_id", token, role_name)
+            return JsonResponse(project_reply({
                 "reply_type": "leave_cards",
                 "reply": "📋 Leave Requests",
                 "leaves": leave_cards,
                 "can_approve": (role_name or "") != "Employee",
-            })
+            }))
 
         return JsonResponse({
             "reply_type": "text",
@@ -852,7 +882,7 @@ def handle_pending_leaves(token, role_name):
         })
 
     except Exception as e:
-        print("Leave error:", e)
+        logger.error("Leave error: %s", e)
         return JsonResponse({
             "reply_type": "error",
             "reply": f"❌ Error fetching pending leaves: {str(e)}"
@@ -862,12 +892,12 @@ def handle_my_leaves(token, employee_id):
     try:
         headers = {"Accept": "application/json", "authorization": f"Bearer {token}"}
         params = {"page": 1, "limit": 20, "emp_id": employee_id, "self": 1}
-        r = requests.get(LEAVE_APPLY_URL, headers=headers, params=params, timeout=15)
-        print("📡 My Leaves Status:", r.status_code)
-        print("📡 My Leaves Body:", r.text)
+        r = fixhr_http.get(LEAVE_APPLY_URL, headers=headers, params=params, timeout=15)
+        logger.info("📡 My Leaves Status: %s", r.status_code)
+        logger.debug("📡 My Leaves Body: %s", log_body(r))
 
         data = r.json()
-        print("my leaves------- data", data)
+        logger.debug("my leaves------- data %s", data)
         rows = []
         if isinstance(data, list):
             rows = data
@@ -895,72 +925,42 @@ def handle_my_leaves(token, employee_id):
                     "status_color": (status_info.get("other") or [{}])[0].get("color"),
                 })
 
-            print("my------------------leaves", my_leaves)
+            logger.debug("my------------------leaves %s", my_leaves)
 
-            return JsonResponse({
+            return JsonResponse(project_reply({
                 "reply_type": "my_leaves",
                 "reply": "📋 Your Leave Requests",
                 "leaves": my_leaves,
                 "can_approve": False,
-            })
+            }))
         return JsonResponse({"reply": "✅ You have no leave requests."})
     except Exception as e:
         return JsonResponse({"reply": f"Error fetching your leaves: {str(e)}"})
 
 
+def _approval_item(req_id, emp_d_id, module_id, master_module_id):
+    return {"id": req_id, "emp_d_id": emp_d_id, "module_id": module_id, "master_module_id": master_module_id}
+
+
 def handle_leave_approval(msg, token):
     try:
-        print("approve leave chal rha hai")
+        logger.debug("approve leave chal rha hai")
         action, leave_id, emp_d_id, module_id, master_module_id, note = msg.split("|")
-        approve = action.lower().startswith("approve")
-        headers = {"Accept": "application/json", "authorization": f"Bearer {token}"}
-
-        check_params = {
-            "approval_status": 140,
-            "trp_id": leave_id,
-            "module_id": module_id,
-            "master_module_id": master_module_id,
-        }
-        r1 = requests.post(APPROVAL_CHECK_URL, headers=headers, params=check_params, timeout=15)
-        print("📡 Leave Approval Check Status:", r1.status_code)
-        print("📡 Leave Approval Check Body:", r1.text)
-
-        check_data = r1.json()
-        if not check_data.get("status") or not check_data.get("result"):
-            return JsonResponse({"reply": "❌ No approver found for this leave."})
-
-        step = check_data["result"][0]
-        approval_status = step["pa_status_id"] if approve else "158"
-        approval_type = "1" if approve else "2"
-
-        handler_params = {
-            "data[request_id]": leave_id,
-            "data[approval_status]": approval_status,
-            "data[approval_action_type]": step["pa_type"],
-            "data[approval_type]": approval_type,
-            "data[approval_sequence]": step["pa_sequence"],
-            "data[lvr_id]": md5_hash(leave_id),
-            "data[module_id]": md5_hash(step["pa_am_id"]),
-            "data[master_module_id]": master_module_id,
-            "data[message]": note,
-            "data[is_last_approval]": step["pa_is_last"],
-            "data[emp_d_id]": emp_d_id,
-            "POST_TYPE": "LEAVE_REQUEST_APPROVAL",
-        }
-
-        print("📦 Leave Handler Params Sent:", json.dumps(handler_params, indent=2))
-        r2 = requests.post(APPROVAL_HANDLER_URL, headers=headers, data=handler_params, timeout=15)
-        print("📡 Leave Approval Handler Status:", r2.status_code)
-        print("📡 Leave Approval Handler Body:", r2.text)
-
-        handler_data = r2.json()
-        if handler_data.get("status"):
-            return f"✅ Leave ID {leave_id} {'approved' if approve else 'rejected'} successfully!"
-        return f"⚠️ Leave approval failed: {handler_data.get('message', 'Unknown error')}"
-    except Exception as e:
-        print("❌ Exception in leave approval:", traceback.format_exc())
+    except ValueError as e:
+        logger.exception("❌ Exception in leave approval")
         return f"Error in leave approval: {str(e)}"
 
+    approve = action.lower().startswith("approve")
+    row = run_approval(APPROVAL_SPECS["leave"], _approval_item(leave_id, emp_d_id, module_id, master_module_id),
+                       approve, note, token)
+    if row["status"] == "no_step":
+        return JsonResponse({"reply": row["message"]})
+    if row["ok"]:
+        return f"✅ Leave ID {leave_id} {'approved' if approve else 'rejected'} successfully!"
+    if row["status"] == "error":
+        return f"Error in leave approval: {row['message']}"
+    return f"⚠️ Leave approval failed: {row['message']}"
+
 
 
 def handle_comp_off_approval(msg, token):
@@ -971,98 +971,31 @@ def handle_comp_off_approval(msg, token):
     reject|ATD_ID|EMP_D_ID|MODULE_ID|MASTER_MODULE_ID|note
     """
 
-    try: 
-        print(f"🔍 CompOff Approval Handler - Received message: {msg}")
-        parts = msg.split("|")
-        print(f"🔍 CompOff Approval Handler - Split parts: {parts}")
-        
-        if len(parts) < 6:
-            error_msg = f"❌ Invalid message format. Expected 6 parts separated by |, got {len(parts)}"
-            print(error_msg)
-            return JsonResponse({"reply": error_msg})
-        
-        action, atd_id, emp_d_id, module_id, master_module_id, note = parts[:6]
-
-        module_id = int(module_id)
-        master_module_id = int(master_module_id)
-        emp_d_id = int(emp_d_id)
-        atd_id = int(atd_id)
-
-        approve = action.lower().startswith("approve")
-        
-        print(f"🔍 CompOff Approval Handler - Action: {action}, ATD_ID: {atd_id}, Approve: {approve}")
+    logger.debug("🔍 CompOff Approval Handler - Received message: %s", msg)
+    parts = msg.split("|")
+    logger.debug("🔍 CompOff Approval Handler - Split parts: %s", parts)
 
-        headers = {
-            "Accept": "application/json",
-            "authorization": f"Bearer {token}"
-        }
-
-        # -----------------------------
-        # 1️⃣ FIRST API → approval_check
-        # -----------------------------
-        check_params = {
-            "approval_status": 140,     # always 140 for checking
-            "trp_id": atd_id,           # comp-off request ID
-            "module_id": module_id,
-            "master_module_id": master_module_id,
-        }
-
-        print(f"📡 CompOff Approval Check - Params: {check_params}")
-        r1 = requests.post(COMPOFF_APPROVAL_STATUS_URL, headers=headers, params=check_params, timeout=15)
-        print(f"📡 CompOff Approval Check - Status: {r1.status_code}, Body: {r1.text}")
-        check_data = r1.json()
-
-        if not check_data.get("status") or not check_data.get("result"):
-            error_msg = "❌ No approver step found for this Comp-Off request."
-            print(error_msg)
-            return JsonResponse({"reply": error_msg})
-
-        step = check_data["result"][0]
-
-        # status → 157 = approved, 158 = rejected
-        approval_status = "157" if approve else "158"
-        approval_type = "1" if approve else "2"
-
-        # -----------------------------
-        # 2️⃣ SECOND API → approval_handler
-        # -----------------------------
-        handler_params = {
-            "data[request_id]": atd_id,
-            "data[approval_status]": approval_status,
-            "data[approval_action_type]": step["pa_type"],
-            "data[approval_type]": approval_type,
-            "data[approval_sequence]": step["pa_sequence"],
-            "data[atd_id]": atd_id,
-
-            # ✅ FIX HERE
-            "data[module_id]": module_id,
-
-            "data[message]": note,
-            "data[master_module_id]": master_module_id,
-            "data[is_last_approval]": step["pa_is_last"],
-            "data[emp_d_id]": emp_d_id,
-            "POST_TYPE": "Attendance_REQUEST_APPROVAL",
-        }
-
-
-        print("📦 CompOff Handler Params Sent:", json.dumps(handler_params, indent=2))
-        r2 = requests.post(COMPOFF_APPROVAL_URL, headers=headers, data=handler_params, timeout=15)
-        print("📡 CompOff Approval Handler Status:", r2.status_code)
-        print("📡 CompOff Approval Handler Body:", r2.text)
-        handler_data = r2.json()
-
-        if handler_data.get("status"):
-            status_text = "approved" if approve else "rejected"
-            message = f"✅ Comp-Off request {atd_id} {status_text} successfully!"
-            return JsonResponse({"reply": message, "status": status_text})
-
-        error_msg = f"⚠️ Comp-Off failed: {handler_data.get('message', 'Unknown error')}"
+    if len(parts) < 6:
+        error_msg = f"❌ Invalid message format. Expected 6 parts separated by |, got {len(parts)}"
+        logger.warning("%s", error_msg)
         return JsonResponse({"reply": error_msg})
 
-    except Exception as e:
-        print(f"❌ Exception in compoff approval: {traceback.format_exc()}")
-        error_msg = f"❌ Error in Comp-Off Approval: {str(e)}"
-        return JsonResponse({"reply": error_msg})
+    action, atd_id, emp_d_id, module_id, master_module_id, note = parts[:6]
+    approve = action.lower().startswith("approve")
+    logger.debug("🔍 CompOff Approval Handler - Action: %s, ATD_ID: %s, Approve: %s", action, atd_id, approve)
+
+    # approval_check → approval_handler (status 157 = approved, 158 = rejected)
+    row = run_approval(APPROVAL_SPECS["compoff"], _approval_item(atd_id, emp_d_id, module_id, master_module_id),
+                       approve, note, token)
+    if row["ok"]:
+        status_text = "approved" if approve else "rejected"
+        return JsonResponse({"reply": f"✅ Comp-Off request {atd_id} {status_text} successfully!", "status": status_text})
+    if row["status"] == "no_step":
+        logger.warning("%s", row["message"])
+        return JsonResponse({"reply": row["message"]})
+    if row["status"] == "error":
+        return JsonResponse({"reply": f"❌ Error in Comp-Off Approval: {row['message']}"})
+    return JsonResponse({"reply": f"⚠️ Comp-Off failed: {row['message']}"})
 
 
 
@@ -1079,48 +1012,6 @@ def handle_pending_compoff(token, role_name, filter_date=None, filter_month=None
             "authorization": f"Bearer {token}"
         }
 
-        params = {"page": 1, "limit": 500}
-        r = requests.get(
-            COMPOFF_APPROVAL_LIST_URL,
-            headers=headers,
-            params=params,
-            timeout=15
-        )
-
-        print("📡 CompOff Status:", r.status_code)
-        print("📡 CompOff Body:", r.text)
-
-        try:
-            data = r.json()
-        except Exception:
-            return JsonResponse({
-                "reply_type": "compoff_cards",
-                "reply": "❌ Invalid response from server.",
-                "compoff": [],
-                "can_approve": False,
-            })
-
-        # ✅ SAFE RESULT EXTRACTION
-        rows = (
-                data.get("result", {}).get("data", [])
-                if isinstance(data, dict)
-                else []
-        )
-
-        if not isinstance(rows, list):
-            rows = []
-
-
-        if not rows:
-            return JsonResponse({
-                "reply_type": "compoff_cards",
-                "reply": "✅ No comp-off requests found.",
-                "compoff": [],
-                "can_approve": (role_name or "") != "Employee",
-            })
-
-        comp_list = []
-
         # 🔎 Parse filter_date once
         filter_dt = None
         if filter_date:
@@ -1129,37 +1020,52 @@ def handle_pending_compoff(token, role_name, filter_date=None, filter_month=None
             except Exception:
                 filter_dt = None
 
-        for c in rows:
-            if not isinstance(c, dict):
-                continue
+        def matches_period(c):
+            if not filter_dt and not filter_month:
+                return True
 
             # 🗓 Collect all possible date fields
-            date_fields = [
-                c.get("date"),
-                c.get("applied_date"),
-                c.get("request_date"),
+            parsed_dates = [
+                d for d in (
+                    parse_fixhr_date(c.get("date")),
+                    parse_fixhr_date(c.get("applied_date")),
+                    parse_fixhr_date(c.get("request_date")),
+                ) if d
             ]
 
-            parsed_dates = []
-            for d in date_fields:
-                if not d:
-                    continue
-                try:
-                    parsed_dates.append(datetime.strptime(d, "%d %b, %Y").date())
-                except Exception:
-                    pass
-
             # 🎯 DATE FILTER
             if filter_dt:
-                if not any(d == filter_dt for d in parsed_dates):
-                    continue
+                return any(d == filter_dt for d in parsed_dates)
 
             # 🎯 MONTH FILTER
-            elif filter_month:
-                m, y = filter_month
-                if not any(d.month == m and d.year == y for d in parsed_dates):
-                    continue
+            m, y = filter_month
+            return any(d.month == m and d.year == y for d in parsed_dates)
 
+        # Stream pages and stop once enough matching rows are collected
+        try:
+            rows = collect_rows(
+                COMPOFF_APPROVAL_LIST_URL,
+                headers,
+                limit=COMPOFF_LIST_MAX_ROWS,
+                row_filter=matches_period,
+                page_size=COMPOFF_LIST_PAGE_SIZE,
+                max_pages=COMPOFF_LIST_MAX_PAGES,
+                prefetch=True,
+                timeout=15,
+            )
+        except ValueError:
+            return JsonResponse(project_reply({
+                "reply_type": "compoff_cards",
+                "reply": "❌ Invalid response from server.",
+                "compoff": [],
+                "can_approve": False,
+            }))
+
+        logger.info("📡 CompOff matching rows: %s", len(rows))
+
+        comp_list = []
+
+        for c in rows:
             # 📌 STATUS
             status_info = (c.get("atd_status") or [{}])[0]
             status_name = status_info.get("name") or "Requested"
@@ -1205,12 +1111,12 @@ def handle_pending_compoff(token, role_name, filter_date=None, filter_month=None
             elif filter_month:
                 msg = f"✅ No comp-off requests found for {calendar.month_name[filter_month[0]]} {filter_month[1]}."
 
-            return JsonResponse({
+            return JsonResponse(project_reply({
                 "reply_type": "compoff_cards",
                 "reply": msg,
                 "compoff": [],
                 "can_approve": (role_name or "") != "Employee",
-            })
+            }))
 
         # 🧾 HEADER TEXT
         if filter_date:
@@ -1220,39 +1126,37 @@ def handle_pending_compoff(token, role_name, filter_date=None, filter_month=None
         else:
             reply_msg = "📋 Comp-Off Approval List"
 
-        print(f"✅ CompOff fetched {len(comp_list)} records.")
-
+        logger.info("✅ CompOff fetched %s records.", len(comp_list))
+        _prefetch_approval_steps("compoff", [c for c in comp_list if c["status_name"] == "Requested"], "atd_id",
+                                 token, role_name)
 
-
-        return JsonResponse({
+        return JsonResponse(project_reply({
             "reply_type": "compoff_cards",
             "reply": reply_msg,
             "compoff": comp_list,
             "can_approve": (role_name or "") != "Employee",
-        })
+        }))
 
     except Exception:
-        print("❌ CompOff ERROR:\n", traceback.format_exc())
-        return JsonResponse({
+        logger.exception("❌ CompOff ERROR")
+        return JsonResponse(project_reply({
             "reply_type": "compoff_cards",
             "reply": "❌ Error fetching comp-off requests.",
             "compoff": [],
             "can_approve": False,
-        })
+        }))
 
 
 
 def handle_apply_gatepass(reason, destination,msg, token, datetime_info=None):
     """
     Apply gatepass using extract_date_time.py for date/time extraction.
-    datetime_info can be passed from chat_api if already extracted.
+    msg may be a MessageContext; datetime_info can be passed from chat_api if already extracted.
     """
     try:
-        # Use extract_date_time.py for date/time extraction
-        if datetime_info:
-            dt_info = datetime_info
-        else:
-            dt_info = extract_datetime_info(msg)
+        ctx = MessageContext.of(msg)
+        msg = ctx.text
+        dt_info = datetime_info or ctx.datetime_info
         
         # Extract date
         date_str = dt_info.get("start_date")
@@ -1265,7 +1169,7 @@ def handle_apply_gatepass(reason, destination,msg, token, datetime_info=None):
         try:
             date_obj = datetime.fromisoformat(date_str).date() if isinstance(date_str, str) else date_str
         except:
-            parsed = dateparser.parse(date_str)
+            parsed = parse_datetime(date_str)
             date_obj = parsed.date() if parsed else datetime.now().date()
         
         # Extract times
@@ -1280,9 +1184,9 @@ def handle_apply_gatepass(reason, destination,msg, token, datetime_info=None):
                 return "❌ Please provide out time. Example: 'apply gatepass for 10am to 11am'"
             
             # Look for second time
-            time_matches = re.findall(r"(\d{1,2}(?::\d{2})?\s*(?:am|pm)?)", msg.lower())
+            time_matches = re.findall(r"(\d{1,2}(?::\d{2})?\s*(?:am|pm)?)", ctx.lower)
             if len(time_matches) > 1:
-                second_time_match = re.search(r"(?:to|till|until|\-)\s*(\d{1,2}(?::\d{2})?\s*(?:am|pm)?)", msg.lower())
+                second_time_match = ctx.search(r"(?:to|till|until|\-)\s*(\d{1,2}(?::\d{2})?\s*(?:am|pm)?)", lowered=True)
                 if second_time_match:
                     in_time_str = extract_time(second_time_match.group(1)) or ""
                 else:
@@ -1302,9 +1206,9 @@ def handle_apply_gatepass(reason, destination,msg, token, datetime_info=None):
             out_dt = datetime.combine(date_obj, datetime.strptime(out_time_str, "%H:%M").time())
             in_dt = datetime.combine(date_obj, datetime.strptime(in_time_str, "%H:%M").time())
         except:
-            # Try parsing with dateparser
-            out_dt = dateparser.parse(f"{date_obj} {out_time_str}")
-            in_dt = dateparser.parse(f"{date_obj} {in_time_str}")
+            # Try the date grammar (dateparser as its last resort)
+            out_dt = parse_datetime(f"{date_obj} {out_time_str}")
+            in_dt = parse_datetime(f"{date_obj} {in_time_str}")
             if not out_dt or not in_dt:
                 return "❌ Could not understand the time format. Please use format like '10:00 am' or '10am'."
         
@@ -1322,7 +1226,7 @@ def handle_apply_gatepass(reason, destination,msg, token, datetime_info=None):
         ]
         
         for pattern in reason_patterns:
-            match = re.search(pattern, msg.lower())
+            match = ctx.search(pattern, lowered=True)
             if match:
                 reason_text = match.group(1).strip()
                 # Check if it contains destination
@@ -1341,7 +1245,7 @@ def handle_apply_gatepass(reason, destination,msg, token, datetime_info=None):
         ]
         
         for pattern in dest_patterns:
-            match = re.search(pattern, msg.lower())
+            match = ctx.search(pattern, lowered=True)
             if match:
                 destination = match.group(1).strip()
                 break
@@ -1367,10 +1271,10 @@ def handle_apply_gatepass(reason, destination,msg, token, datetime_info=None):
             "destination": destination
         }
 
-        print("📦 Gatepass Apply Payload:", payload)
-        r = requests.post(GATEPASS_URL, headers=headers, data=payload, timeout=15)
-        print("📡 Apply GatePass Status:", r.status_code)
-        print("📡 Apply GatePass Body:", r.text)
+        logger.debug("📦 Gatepass Apply Payload: %s", payload)
+        r = fixhr_http.post(GATEPASS_URL, headers=headers, data=payload, timeout=15)
+        logger.info("📡 Apply GatePass Status: %s", r.status_code)
+        logger.debug("📡 Apply GatePass Body: %s", log_body(r))
 
         try:
             data = r.json()
@@ -1387,13 +1291,11 @@ def handle_apply_gatepass(reason, destination,msg, token, datetime_info=None):
 def handle_pending_gatepass(token, role_name):
     try:
         headers = {"Accept": "application/json", "authorization": f"Bearer {token}"}
-        params = {"page": 1, "limit": 10}
-        r = requests.get(GATEPASS_APPROVAL_LIST, headers=headers, params=params, timeout=15)
-        print("📡 Pending GatePass Status:", r.status_code)
-        print("📡 Pending GatePass Body:", r.text)
-
-        data = r.json()
-        rows = data.get("result", {}).get("data", [])
+        rows = collect_rows(
+            GATEPASS_APPROVAL_LIST, headers,
+            limit=PENDING_LIST_MAX_ROWS, page_size=PENDING_LIST_PAGE_SIZE, prefetch=True, timeout=15,
+        )
+        logger.info("📡 Pending GatePass rows: %s", len(rows))
         if rows:
             gatepass_cards = []
             for g in rows:
@@ -1412,12 +1314,13 @@ def handle_pending_gatepass(token, role_name):
                     "status_color": (status_info.get("other") or [{}])[0].get("color"),
                 })
 
-            return JsonResponse({
+            _prefetch_approval_steps("gatepass", gatepass_cards, "id", token, role_name)
+            return JsonResponse(project_reply({
                 "reply_type": "gatepass_cards",
                 "reply": "📋 Pending GatePass Approvals",
                 "gatepasses": gatepass_cards,
                 "can_approve": (role_name or "") != "Employee",
-            })
+            }))
         return JsonResponse({"reply": "✅ No pending gatepass approvals."})
     except Exception as e:
         return JsonResponse({"reply": f"Error fetching pending gatepass: {str(e)}"})
@@ -1426,59 +1329,29 @@ def handle_pending_gatepass(token, role_name):
 def handle_gatepass_approval(msg, token):
     try:
         action, gtp_id, emp_d_id, module_id, master_module_id, note = msg.split("|")
-        approve = action.lower().startswith("approve")
-        headers = {"Accept": "application/json", "authorization": f"Bearer {token}"}
-
-        check_params = {"approval_status": 140, "trp_id": gtp_id, "module_id": module_id, "master_module_id": master_module_id}
-        r1 = requests.post(APPROVAL_CHECK_URL, headers=headers, params=check_params, timeout=15)
-        print("📡 Approval Check Status:", r1.status_code)
-        print("📡 Approval Check Body:", r1.text)
-
-        check_data = r1.json()
-        if not check_data.get("status") or not check_data.get("result"):
-            return "❌ Approval check failed (no approver found)."
-
-        step = check_data["result"][0]
-        approval_status = step["pa_status_id"] if approve else "158"
-        approval_type = "1" if approve else "2"
-        handler_params = {
-            "data[request_id]": "",
-            "data[approval_status]": approval_status,
-            "data[approval_action_type]": step["pa_type"],
-            "data[approval_type]": approval_type,
-            "data[approval_sequence]": step["pa_sequence"],
-            "data[gtp_id]": md5_hash(gtp_id),
-            "data[module_id]": md5_hash(step["pa_am_id"]),
-            "data[message]": note,
-            "data[master_module_id]": master_module_id,
-            "data[is_last_approval]": step["pa_is_last"],
-            "data[emp_d_id]": emp_d_id,
-            "POST_TYPE": "GATEPASS_REQUEST_APPROVAL",
-        }
+    except ValueError as e:
+        logger.exception("❌ Exception in approval")
+        return f"Error in approval: {str(e)}"
 
-        print("📦 Handler Params Sent:", json.dumps(handler_params, indent=2))
-        r2 = requests.post(APPROVAL_HANDLER_URL, headers=headers, data=handler_params, timeout=15)
-        print("📡 Approval Handler Status:", r2.status_code)
-        print("📡 Approval Handler Body:", r2.text)
+    row = run_approval(APPROVAL_SPECS["gatepass"], _approval_item(gtp_id, emp_d_id, module_id, master_module_id),
+                       action.lower().startswith("approve"), note, token)
+    if row["ok"]:
+        return f"✅ {row['message']}"
+    if row["status"] == "error":
+        return f"Error in approval: {row['message']}"
+    return row["message"]
 
-        handler_data = r2.json()
-        return handler_data.get("message", "Approval action done.")
-    except Exception as e:
-        print("❌ Exception in approval:", traceback.format_exc())
-        return f"Error in approval: {str(e)}"
 
 
 def handle_apply_missed_punch(msg, token, datetime_info=None):
     """
     Apply missed punch using extract_date_time.py for date/time extraction.
-    datetime_info can be passed from chat_api if already extracted.
+    msg may be a MessageContext; datetime_info can be passed from chat_api if already extracted.
     """
     try:
-        # Use extract_date_time.py for date/time extraction
-        if datetime_info:
-            dt_info = datetime_info
-        else:
-            dt_info = extract_datetime_info(msg)
+        ctx = MessageContext.of(msg)
+        msg = ctx.text
+        dt_info = datetime_info or ctx.datetime_info
         
         # Extract date
         date_str = dt_info.get("start_date")
@@ -1491,7 +1364,7 @@ def handle_apply_missed_punch(msg, token, datetime_info=None):
         try:
             punch_date = datetime.fromisoformat(date_str).date() if isinstance(date_str, str) else date_str
         except:
-            parsed = dateparser.parse(date_str)
+            parsed = parse_datetime(date_str)
             punch_date = parsed.date() if parsed else datetime.now().date()
         
         punch_date_str = punch_date.strftime("%d %b, %Y")
@@ -1505,17 +1378,17 @@ def handle_apply_missed_punch(msg, token, datetime_info=None):
             in_time = extract_time(msg) or ""
             
             # Look for out time specifically
-            out_time_match = re.search(r"out\s+(\d{1,2}(?::\d{2})?\s*(?:am|pm)?)", msg, re.I)
+            out_time_match = ctx.search(r"out\s+(\d{1,2}(?::\d{2})?\s*(?:am|pm)?)", re.I)
             if out_time_match:
                 out_time = extract_time(out_time_match.group(1)) or ""
             
             # If we only have one time, determine if it's in or out based on context
             if in_time and not out_time:
-                if re.search(r"\bout\b", msg, re.I):
+                if ctx.has_word("out"):
                     out_time = in_time
                     in_time = ""
             elif not in_time and not out_time:
-                time_matches = re.findall(r"(\d{1,2}(?::\d{2})?\s*(?:am|pm)?)", msg.lower())
+                time_matches = re.findall(r"(\d{1,2}(?::\d{2})?\s*(?:am|pm)?)", ctx.lower)
                 if len(time_matches) > 0:
                     in_time = extract_time(time_matches[0]) or ""
                     if len(time_matches) > 1:
@@ -1539,7 +1412,7 @@ def handle_apply_missed_punch(msg, token, datetime_info=None):
         ]
         
         for pattern in reason_patterns:
-            match = re.search(pattern, msg.lower())
+            match = ctx.search(pattern, lowered=True)
             if match:
                 reason_text = match.group(1).strip().capitalize()
                 break
@@ -1564,10 +1437,10 @@ def handle_apply_missed_punch(msg, token, datetime_info=None):
         headers = {"Accept": "application/json", "authorization": f"Bearer {token}"}
         params = {"date": punch_date_str, "type_id": type_id, "in_time": in_time, "out_time": out_time, "reason": reason_id, "custom_reason": reason_text if reason_id == 234 else ""}
 
-        print("📦 Missed Punch Payload (Query Params):", params)
-        r = requests.post(MISSED_PUNCH_APPLY_URL, headers=headers, params=params, timeout=15)
-        print("📡 Missed Punch Apply Status:", r.status_code)
-        print("📡 Missed Punch Apply Body:", r.text)
+        logger.debug("📦 Missed Punch Payload (Query Params): %s", params)
+        r = fixhr_http.post(MISSED_PUNCH_APPLY_URL, headers=headers, params=params, timeout=15)
+        logger.info("📡 Missed Punch Apply Status: %s", r.status_code)
+        logger.debug("📡 Missed Punch Apply Body: %s", log_body(r))
 
         data = r.json()
         if data.get("status"):
@@ -1580,20 +1453,18 @@ def handle_apply_missed_punch(msg, token, datetime_info=None):
             )
         return f"❌ Failed to apply Missed Punch: {data.get('message', 'Unknown error')}"
     except Exception as e:
-        print("❌ Exception in Apply Missed Punch:", traceback.format_exc())
+        logger.exception("❌ Exception in Apply Missed Punch")
         return f"Error while applying missed punch: {str(e)}"
 
 
 def handle_pending_missed_punch(token, role_name):
     try:
         headers = {"Accept": "application/json", "authorization": f"Bearer {token}"}
-        params = {"page": 1, "limit": 10}
-        r = requests.get(MISSED_PUNCH_APPROVAL_LIST_URL, headers=headers, params=params, timeout=15)
-        print("📡 Pending Missed Punch Status:", r.status_code)
-        print("📡 Pending Missed Punch Body:", r.text)
-
-        data = r.json()
-        rows = data.get("result", {}).get("data", [])
+        rows = collect_rows(
+            MISSED_PUNCH_APPROVAL_LIST_URL, headers,
+            limit=PENDING_LIST_MAX_ROWS, page_size=PENDING_LIST_PAGE_SIZE, prefetch=True, timeout=15,
+        )
+        logger.info("📡 Pending Missed Punch rows: %s", len(rows))
         if rows:
             missed_cards = []
             for mp in rows:
@@ -1612,12 +1483,13 @@ def handle_pending_missed_punch(token, role_name):
                     "status_color": (status_info.get("other") or [{}])[0].get("color"),
                 })
 
-            return JsonResponse({
+            _prefetch_approval_steps("missed", missed_cards, "id", token, role_name)
+            return JsonResponse(project_reply({
                 "reply_type": "missed_cards",
                 "reply": "📋 Pending Missed Punch Approvals",
                 "missed": missed_cards,
                 "can_approve": (role_name or "") != "Employee",
-            })
+            }))
 
         return JsonResponse({"reply": "✅ No pending missed punch approvals."})
     except Exception as e:
@@ -1628,9 +1500,9 @@ def handle_my_missed_punch(token):
     try:
         headers = {"Accept": "application/json", "authorization": f"Bearer {token}"}
         params = {"page": 1, "limit": 10}
-        r = requests.get(MISSED_PUNCH_LIST_URL, headers=headers, params=params, timeout=15)
-        print("📡 My Missed Punch List Status:", r.status_code)
-        print("📡 My Missed Punch List Body:", r.text)
+        r = fixhr_http.get(MISSED_PUNCH_LIST_URL, headers=headers, params=params, timeout=15)
+        logger.info("📡 My Missed Punch List Status: %s", r.status_code)
+        logger.debug("📡 My Missed Punch List Body: %s", log_body(r))
 
         data = r.json()
         result = data.get("result", {})
@@ -1655,11 +1527,11 @@ def handle_my_missed_punch(token):
                     "next_message": item.get("next_approver_details", {}).get("message") or "",
                 })
 
-            return JsonResponse({
+            return JsonResponse(project_reply({
                 "reply_type": "my_missed_cards",
                 "reply": "📋 Your Missed Punch Requests",
                 "missed": my_missed_cards
-            })
+            }))
         return JsonResponse({"reply": "✅ You have no missed punch entries."})
     except Exception as e:
         return JsonResponse({"reply": f"Error fetching your missed punch list: {str(e)}"})
@@ -1668,63 +1540,223 @@ def handle_my_missed_punch(token):
 def handle_missed_approval(msg, token):
     try:
         action, missed_id, emp_d_id, module_id, master_module_id, note = msg.split("|")
-        approve = action.lower().startswith("approve")
-        headers = {"Accept": "application/json", "authorization": f"Bearer {token}"}
+    except ValueError as e:
+        logger.exception("❌ Exception in missed punch approval")
+        return f"Error in missed punch approval: {str(e)}"
 
-        check_params = {"approval_status": 140, "trp_id": missed_id, "module_id": module_id, "master_module_id": master_module_id}
-        r1 = requests.post(APPROVAL_CHECK_URL, headers=headers, params=check_params, timeout=15)
-        print("📡 Missed Punch Approval Check Status:", r1.status_code)
-        print("📡 Missed Punch Approval Check Body:", r1.text)
+    approve = action.lower().startswith("approve")
+    row = run_approval(APPROVAL_SPECS["missed"], _approval_item(missed_id, emp_d_id, module_id, master_module_id),
+                       approve, note, token)
+    if row["status"] == "no_step":
+        return row["message"]
+    if row["ok"]:
+        return f"✅ Missed Punch ID {missed_id} {'approved' if approve else 'rejected'} successfully!"
+    if row["status"] == "error":
+        return f"Error in missed punch approval: {row['message']}"
+    return f"⚠️ Missed punch approval failed: {row['message']}"
 
-        check_data = r1.json()
-        if not check_data.get("status") or not check_data.get("result"):
-            return "❌ No approver found for this missed punch."
 
-        step = check_data["result"][0]
-        approval_status = step["pa_status_id"] if approve else "158"
-        approval_type = "1" if approve else "2"
-        handler_params = {
-            "data[request_id]": missed_id,
-            "data[approval_status]": approval_status,
-            "data[approval_action_type]": step["pa_type"],
-            "data[approval_type]": approval_type,
-            "data[approval_sequence]": step["pa_sequence"],
-            "data[ae_id]": md5_hash(missed_id),
-            "data[module_id]": md5_hash(module_id),
-            "data[message]": note or "",
-            "data[master_module_id]": master_module_id,
-            "data[is_last_approval]": step["pa_is_last"],
-            "data[emp_d_id]": emp_d_id,
-            "data[trp_id]": missed_id,
-            "data[tc_id]": "",
-            "data[lvr_id]": "",
-            "data[gtp_id]": "",
-            "data[lnr_id]": "",
-            "data[atd_id]": "",
-            "data[deduction_amount]": "",
-            "data[deduction_info]": "",
-            "data[reimburse_amount]": "",
-            "data[advance_id]": "",
-            "POST_TYPE": "MISPUNCH_REQUEST_APPROVAL",
+
+# ---------------- Approval payloads ----------------
+# approval_handler payload per module; used by the single-item handlers above and by bulk approvals.
+def _leave_approval_params(item, step, approve, note):
+    return {
+        "data[request_id]": item["id"],
+        "data[approval_status]": step["pa_status_id"] if approve else "158",
+        "data[approval_action_type]": step["pa_type"],
+        "data[approval_type]": "1" if approve else "2",
+        "data[approval_sequence]": step["pa_sequence"],
+        "data[lvr_id]": md5_hash(item["id"]),
+        "data[module_id]": md5_hash(step["pa_am_id"]),
+        "data[master_module_id]": item["master_module_id"],
+        "data[message]": note,
+        "data[is_last_approval]": step["pa_is_last"],
+        "data[emp_d_id]": item["emp_d_id"],
+        "POST_TYPE": "LEAVE_REQUEST_APPROVAL",
+    }
+
+
+def _gatepass_approval_params(item, step, approve, note):
+    return {
+        "data[request_id]": "",
+        "data[approval_status]": step["pa_status_id"] if approve else "158",
+        "data[approval_action_type]": step["pa_type"],
+        "data[approval_type]": "1" if approve else "2",
+        "data[approval_sequence]": step["pa_sequence"],
+        "data[gtp_id]": md5_hash(item["id"]),
+        "data[module_id]": md5_hash(step["pa_am_id"]),
+        "data[message]": note,
+        "data[master_module_id]": item["master_module_id"],
+        "data[is_last_approval]": step["pa_is_last"],
+        "data[emp_d_id]": item["emp_d_id"],
+        "POST_TYPE": "GATEPASS_REQUEST_APPROVAL",
+    }
+
+
+def _missed_approval_params(item, step, approve, note):
+    return {
+        "data[request_id]": item["id"],
+        "data[approval_status]": step["pa_status_id"] if approve else "158",
+        "data[approval_action_type]": step["pa_type"],
+        "data[approval_type]": "1" if approve else "2",
+        "data[approval_sequence]": step["pa_sequence"],
+        "data[ae_id]": md5_hash(item["id"]),
+        "data[module_id]": md5_hash(item["module_id"]),
+        "data[message]": note or "",
+        "data[master_module_id]": item["master_module_id"],
+        "data[is_last_approval]": step["pa_is_last"],
+        "data[emp_d_id]": item["emp_d_id"],
+        "data[trp_id]": item["id"],
+        "data[tc_id]": "",
+        "data[lvr_id]": "",
+        "data[gtp_id]": "",
+        "data[lnr_id]": "",
+        "data[atd_id]": "",
+        "data[deduction_amount]": "",
+        "data[deduction_info]": "",
+        "data[reimburse_amount]": "",
+        "data[advance_id]": "",
+        "POST_TYPE": "MISPUNCH_REQUEST_APPROVAL",
+    }
+
+
+def _compoff_approval_params(item, step, approve, note):
+    atd_id = int(item["id"])
+    return {
+        "data[request_id]": atd_id,
+        "data[approval_status]": "157" if approve else "158",
+        "data[approval_action_type]": step["pa_type"],
+        "data[approval_type]": "1" if approve else "2",
+        "data[approval_sequence]": step["pa_sequence"],
+        "data[atd_id]": atd_id,
+        "data[module_id]": int(item["module_id"]),
+        "data[message]": note,
+        "data[master_module_id]": int(item["master_module_id"]),
+        "data[is_last_approval]": step["pa_is_last"],
+        "data[emp_d_id]": int(item["emp_d_id"]),
+        "POST_TYPE": "Attendance_REQUEST_APPROVAL",
+    }
+
+
+APPROVAL_SPECS = {
+    "leave": {
+        "name": "leave", "label": "Leave",
+        "check_url": APPROVAL_CHECK_URL, "handler_url": APPROVAL_HANDLER_URL,
+        "build_params": _leave_approval_params, "send_as": "data",
+        "no_step_message": "❌ No approver found for this leave.",
+    },
+    "gatepass": {
+        "name": "gatepass", "label": "Gatepass",
+        "check_url": APPROVAL_CHECK_URL, "handler_url": APPROVAL_HANDLER_URL,
+        "build_params": _gatepass_approval_params, "send_as": "data",
+        "no_step_message": "❌ Approval check failed (no approver found).",
+    },
+    "missed": {
+        "name": "missed", "label": "Missed Punch",
+        "check_url": APPROVAL_CHECK_URL, "handler_url": APPROVAL_HANDLER_URL,
+        "build_params": _missed_approval_params, "send_as": "params",
+        "no_step_message": "❌ No approver found for this missed punch.",
+    },
+    "compoff": {
+        "name": "compoff", "label": "Comp-Off",
+        "check_url": COMPOFF_APPROVAL_STATUS_URL, "handler_url": COMPOFF_APPROVAL_URL,
+        "build_params": _compoff_approval_params, "send_as": "data",
+        "no_step_message": "❌ No approver step found for this Comp-Off request.",
+    },
+}
+
+
+def _prefetch_approval_steps(module, cards, id_key, token, role_name):
+    """Check the listed requests' approval steps in the background, ready for their approve / reject buttons."""
+    if (role_name or "") == "Employee":
+        return
+    prefetch_approval_steps(APPROVAL_SPECS[module], [
+        {"id": card.get(id_key), "module_id": card.get("module_id"), "master_module_id": card.get("master_module_id")}
+        for card in cards
+    ], token)
+
+
+# ---------------- Bulk approvals ----------------
+def handle_bulk_approval(items, token, user_key, action="approve", note=""):
+    """
+    Approve / reject many pending requests (leave, gatepass, missed, compoff) at once.
+    Returns the `bulk_approval` reply payload with one result row per item.
+    """
+    if not items:
+        return {"reply": "❌ No requests selected for bulk approval.", "reply_type": "text_only"}
+    if len(items) > BULK_APPROVAL_MAX_ITEMS:
+        return {
+            "reply": f"❌ Too many requests in one go (max {BULK_APPROVAL_MAX_ITEMS}).",
+            "reply_type": "text_only",
         }
 
-        print("📦 Missed Punch Handler Params Sent:", json.dumps(handler_params, indent=2))
-        r2 = requests.post(APPROVAL_HANDLER_URL, headers=headers, params=handler_params, timeout=15)
-        print("📡 Missed Punch Approval Handler Status:", r2.status_code)
-        print("📡 Missed Punch Approval Handler Body:", r2.text)
+    start_time = time.perf_counter()
+    results = run_bulk_approvals(APPROVAL_SPECS, items, token, user_key, default_action=action, note=note)
+    latency_ms = (time.perf_counter() - start_time) * 1000
 
-        handler_data = r2.json()
-        if handler_data.get("status"):
-            return f"✅ Missed Punch ID {missed_id} {'approved' if approve else 'rejected'} successfully!"
-        return f"⚠️ Missed punch approval failed: {handler_data.get('message', 'Unknown error')}"
-    except Exception as e:
-        print("❌ Exception in missed punch approval:", traceback.format_exc())
-        return f"Error in missed punch approval: {str(e)}"
+    done = sum(1 for r in results if r["ok"])
+    failed = len(results) - done
+    logger.info("📦 Bulk %s: %s ok / %s failed in %.2f ms", action, done, failed, latency_ms)
+
+    verb = "approved" if action.startswith("approve") else "rejected"
+    reply = f"✅ {done} request(s) {verb}." if not failed else f"⚠️ {done} {verb}, {failed} failed."
+    return {
+        "reply": reply,
+        "reply_type": "bulk_approval",
+        "results": results,
+        "summary": {"total": len(results), "ok": done, "failed": failed},
+    }
+
+
+@require_GET
+def metrics_api(request):
+    """
+    Per-process counters/timings plus FixHR circuit-breaker state.
+    Operational data: Django staff users, or FixHR sessions with an approver role ("Employee" gets 403).
+    """
+    if not request.user.is_staff:
+        if not check_authentication(request):
+            return JsonResponse({"error": "Unauthorized"}, status=401)
+        if (request.session.get("role_name") or "Employee") == "Employee":
+            return JsonResponse({"error": "Forbidden"}, status=403)
+    return JsonResponse(metrics.snapshot())
+
+
+@csrf_exempt
+@require_POST
+@fixhr_http.with_deadline(BULK_APPROVAL_DEADLINE)
+def bulk_approval_api(request):
+    """
+    POST JSON:
+    {"action": "approve"|"reject", "note": "...",
+     "items": [{"module": "leave", "id": ..., "emp_d_id": ..., "module_id": ..., "master_module_id": ...,
+                "action": optional per-item override}, ...]}
+    """
+    if not check_authentication(request):
+        return JsonResponse({"ok": False, "error": "Not logged in"}, status=401)
+
+    try:
+        body = json.loads(request.body.decode())
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+
+    items = body.get("items")
+    if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+        return JsonResponse({"error": "items must be a list of objects"}, status=400)
+
+    action = body.get("action") or "approve"
+    action = action.strip().lower() if isinstance(action, str) else action
+    if action not in APPROVAL_ACTIONS:
+        return JsonResponse({"error": "action must be approve or reject"}, status=400)
+
+    token = request.session.get("fixhr_token")
+    user_key = request.session.get("employee_id") or md5_hash(token)
+    return JsonResponse(handle_bulk_approval(items, token, user_key, action, body.get("note") or ""))
 
 # def handle_privacy_policy(token):
 #     try:
 #         headers = {"Accept": "application/json", "authorization": f"Bearer {token}"}
-#         r = requests.get(FIXHR_PRIVACY_POLICY, headers=headers, timeout=15)
+#         r = fixhr_http.get(FIXHR_PRIVACY_POLICY, headers=headers, timeout=15)
 #         print("📡 Privacy Policy Status:", r.status_code)
 #         print("📡 Privacy Policy Body:", r.text)
 #         return r.json()
@@ -1736,9 +1768,9 @@ def handle_privacy_policy(token):
             "Accept": "application/json",
             "authorization": f"Bearer {token}",
         }
-        r = requests.get(FIXHR_PRIVACY_POLICY, headers=headers, timeout=15)
-        print("📡 Privacy Policy Status:", r.status_code)
-        print("📡 Privacy Policy Body:", r.text)
+        r = fixhr_http.get(FIXHR_PRIVACY_POLICY, headers=headers, timeout=15)
+        logger.info("📡 Privacy Policy Status: %s", r.status_code)
+        logger.debug("📡 Privacy Policy Body: %s", log_body(r))
 
         data = r.json()
 
@@ -1773,9 +1805,9 @@ def handle_payslip_policy(token):
             "Accept": "application/json",
             "authorization": f"Bearer {token}",
         }
-        r = requests.get(FIXHR_PAYSLIP_POLICY, headers=headers, timeout=15)
-        print("📡 Payslip Policy Status:", r.status_code)
-        print("📡 Payslip Policy Body:", r.text)
+        r = fixhr_http.get(FIXHR_PAYSLIP_POLICY, headers=headers, timeout=15)
+        logger.info("📡 Payslip Policy Status: %s", r.status_code)
+        logger.debug("📡 Payslip Policy Body: %s", log_body(r))
 
         data = r.json()
 
@@ -1859,7 +1891,7 @@ def handle_payslip_policy(token):
             "reply": f"Error fetching payslip: {e}",
         }
 # ================================================      create tada
-from django.http import JsonResponse, HttpRequest
+from django.http import HttpRequest
 # Defaults (override in settings.py)
 FIXHR_BASE = getattr(settings, "FIXHR_BASE_URL", "https://dev.fixhr.app")
 
@@ -1880,6 +1912,7 @@ def fixhr_headers(request):
 # GET purposes (proxy)
 # -----------------------------
 @require_GET
+@compress_response
 def tada_purposes(request):
     """
     Proxy GET -> /api/admin/tada/travel_purpose_list
@@ -1887,12 +1920,15 @@ def tada_purposes(request):
     """
     try:
         url = f"{FIXHR_BASE.rstrip('/')}/api/admin/tada/travel_purpose_list"
-        resp = requests.get(url, headers=fixhr_headers(request), timeout=15)
+        resp = fixhr_http.get(url, headers=fixhr_headers(request), timeout=15)
         resp.raise_for_status()
         # if upstream returns HTML (error page) resp.json() will raise -> handled below
         payload = resp.json()
-        print(payload)
-        return JsonResponse({"ok": True, "result": payload.get("result", []), "raw": payload})
+        logger.debug("%s", payload)
+        data = {"ok": True, "result": payload.get("result", [])}
+        if request.GET.get("debug_raw") == "1":
+            data["raw"] = payload
+        return JsonResponse(data)
     except ValueError:
         # not JSON (upstream might have returned HTML). Include text for debugging.
         body_text = resp.text if 'resp' in locals() else "No response body"
@@ -1907,15 +1943,19 @@ def tada_purposes(request):
 # GET travel types (proxy)
 # -----------------------------
 @require_GET
+@compress_response
 def tada_travel_types(request):
     try:
         url = f"{FIXHR_BASE.rstrip('/')}/api/admin/tada/travel_type"
-        resp = requests.get(url, headers=fixhr_headers(request), timeout=15)
-        print(resp)
+        resp = fixhr_http.get(url, headers=fixhr_headers(request), timeout=15)
+        logger.debug("%s", resp)
         resp.raise_for_status()
         payload = resp.json()
-        print(payload)
-        return JsonResponse({"ok": True, "result": payload.get("result", []), "raw": payload})
+        logger.debug("%s", payload)
+        data = {"ok": True, "result": payload.get("result", [])}
+        if request.GET.get("debug_raw") == "1":
+            data["raw"] = payload
+        return JsonResponse(data)
     except ValueError:
         body_text = resp.text if 'resp' in locals() else "No response body"
         logger.error("tada_travel_types: upstream returned non-JSON: %s", body_text[:1000])
@@ -2009,7 +2049,7 @@ def tada_create_request(request):
 
     # forward to FixHR
     try:
-        resp = requests.post(url, headers=headers, data=data, files=files if files else None, timeout=30)
+        resp = fixhr_http.post(url, headers=headers, data=data, files=files if files else None, timeout=30)
 
         # try parse JSON, fallback to text
         try:
@@ -2078,7 +2118,7 @@ def tada_create_local(request):
 
     try:
         url = f"{FIXHR_BASE.rstrip('/')}/api/admin/tada/travel_details"
-        resp = requests.post(
+        resp = fixhr_http.post(
             url,
             headers=fixhr_headers(request),
             data=data,
@@ -2121,11 +2161,11 @@ def handle_announcement(token):
             "authorization": f"Bearer {token}",
         }
         
-        r = requests.get(ANNOUNCEMENT_URL, headers=headers, timeout=15)
-        print("📡 Announcement Status:", r.status_code)
+        r = fixhr_http.get(ANNOUNCEMENT_URL, headers=headers, timeout=15)
+        logger.info("📡 Announcement Status: %s", r.status_code)
 
         data = r.json()
-        print("🔍 Announcement Data:", data)
+        logger.debug("🔍 Announcement Data: %s", data)
         if not data.get("status"):
             return {
                 "reply_type": "bot",
@@ -2178,15 +2218,15 @@ def handle_announcement(token):
             "reply": "The announcement request timed out. Please try again later.",
         }
     except requests.exceptions.RequestException as e:
-        print(f"Error fetching announcements: {e}")
+        logger.error("Error fetching announcements: %s", e)
         return {
             "reply_type": "bot",
             "reply": "An error occurred while connecting to the announcement server.",
         }
 
 # ===================================================================================================================
-from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest, HttpResponseServerError, HttpResponseRedirect
-from urllib.parse import urljoin
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseServerError, HttpResponseRedirect
+from urllib.parse import urlencode, urljoin
 # --- Configuration / Defaults ---
 API_BASE = getattr(settings, "FIXHR_API_BASE", "https://dev.fixhr.app/api/admin/tada/")
 # store token in settings.FIXHR_API_TOKEN (recommended) or env variable
@@ -2216,7 +2256,7 @@ def call_fixhr_api(request, method: str, path: str, params: Optional[dict] = Non
 
     headers = fixhr_headers(request)
     try:
-        resp = requests.request(method=method, url=url, headers=headers, params=params, json=json_body, timeout=15, stream=stream)
+        resp = fixhr_http.request(method=method, url=url, headers=headers, params=params, json=json_body, timeout=15, stream=stream)
         resp.raise_for_status()
         return resp
     except requests.HTTPError as e:
@@ -2232,6 +2272,7 @@ def call_fixhr_api(request, method: str, path: str, params: Optional[dict] = Non
 # --- Views ---
 
 @require_http_methods(["GET"])
+@compress_response
 def filter_plan_list(request):
     """
     Proxy GET to filter-plan endpoint.
@@ -2256,6 +2297,7 @@ def filter_plan_list(request):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@compress_response
 def filter_plan_post(request):
     """
     Proxy POST to filter-plan endpoint.
@@ -2281,6 +2323,7 @@ def filter_plan_post(request):
 
 
 @require_http_methods(["GET"])
+@compress_response
 def claim_list(request, travel_type_id):
     """
     Fetch claim_list for a travel type id.
@@ -2301,6 +2344,7 @@ def claim_list(request, travel_type_id):
 
 
 @require_http_methods(["GET"])
+@compress_response
 def acceptance_list(request, travel_type_id):
     """
     Fetch acceptance-list for a travel type id.
@@ -2402,17 +2446,17 @@ def handle_tada_claim_approval(msg, token):
             "POST_TYPE": "CLAIM_REQUEST_APPROVAL",
         }
 
-        print("📦 Sending TADA Approval Params:", json.dumps(handler_params, indent=2))
+        logger.debug("📦 Sending TADA Approval Params: %s", lazy_json(handler_params))
 
-        r = requests.post(
+        r = fixhr_http.post(
             "https://dev.fixhr.app/api/admin/approval/approve",
             headers=headers,
             params=handler_params,
             timeout=15,
         )
 
-        print("📡 TADA Approval Status:", r.status_code)
-        print("📡 TADA Approval Response:", r.text)
+        logger.info("📡 TADA Approval Status: %s", r.status_code)
+        logger.debug("📡 TADA Approval Response: %s", log_body(r))
 
         data = r.json()
         if data.get("status"):
@@ -2421,7 +2465,7 @@ def handle_tada_claim_approval(msg, token):
         return f"⚠️ TADA claim action failed: {data.get('message', 'Unknown error')}"
 
     except Exception as e:
-        print("❌ Exception in TADA claim approval:", traceback.format_exc())
+        logger.exception("❌ Exception in TADA claim approval")
         return f"Error in TADA claim approval: {str(e)}"
     
 def handle_travel_request_approval(msg, token):
@@ -2438,6 +2482,7 @@ def handle_travel_request_approval(msg, token):
             return ""
         return val
 
+    check_item = {}
     try:
         # Parse incoming message
         try:
@@ -2465,32 +2510,12 @@ def handle_travel_request_approval(msg, token):
         # ---------------------------------------------------------
         # ✅ Step 1: Approval step check (MUST BE GET — FIXED)
         # ---------------------------------------------------------
-        check_params = {
-            "approval_status": 140,
-            "trp_id": trp_id,
-            "module_id": module_id,
-            "master_module_id": master_module_id,
-        }
-
-        print("📦 Travel Plan Approval Check Params:", json.dumps(check_params, indent=2))
-
-        r1 = requests.post(
-            APPROVAL_CHECK_URL,
-            headers=headers,
-            params=check_params,
-            timeout=15,
-        )
-
-        print("📡 Approval Check URL:", r1.url)
-        print("📡 Approval Check Status:", r1.status_code)
-        print("📡 Approval Check Body:", r1.text)
-
-        check_data = r1.json()
-        if not check_data.get("status") or not check_data.get("result"):
+        check_item = {"id": trp_id, "module_id": module_id, "master_module_id": master_module_id}
+        step, from_cache = get_approval_step(APPROVAL_CHECK_URL, check_item, headers, token)
+        logger.debug("📡 Approval Step: %s %s", step, "(cached)" if from_cache else "")
+        if not step:
             return "❌ No approver found for this travel plan."
 
-        step = check_data["result"][0]
-
         # ---------------------------------------------------------
         # Approval mapping
         # ---------------------------------------------------------
@@ -2525,28 +2550,30 @@ def handle_travel_request_approval(msg, token):
             "POST_TYPE": "TRAVEL_REQUEST_APPROVAL",
         }
 
-        print("📦 Handler Params:", json.dumps(handler_params, indent=2))
+        logger.debug("📦 Handler Params: %s", lazy_json(handler_params))
 
         # ⚠️ IMPORTANT: use params= for query-string POST (-G)
-        r2 = requests.post(
+        r2 = fixhr_http.post(
             APPROVAL_HANDLER_URL,
             headers=headers,
             params=handler_params,  # SAME AS YOUR cURL
             timeout=15,
         )
 
-        print("📡 Handler URL:", r2.url)
-        print("📡 Handler Status:", r2.status_code)
-        print("📡 Handler Body:", r2.text)
+        logger.debug("📡 Handler URL: %s", r2.url)
+        logger.info("📡 Handler Status: %s", r2.status_code)
+        logger.debug("📡 Handler Body: %s", log_body(r2))
 
         handler_data = r2.json()
         if handler_data.get("status"):
             return f"✅ Travel Plan {trp_id} {'approved' if approve else 'rejected'} successfully!"
 
+        invalidate_approval_step(token, check_item)
         return f"⚠️ Approval failed: {handler_data.get('message', 'Unknown error')}"
 
     except Exception as e:
-        print("❌ Exception:", traceback.format_exc())
+        invalidate_approval_step(token, check_item)
+        logger.exception("❌ Exception")
         return f"Error in travel plan approval: {str(e)}"
 
 
@@ -2618,12 +2645,10 @@ Output JSON format:
     in_time_str = datetime_info.get("end_time")
 
     # 🔹 Debug logs (optional)
-    print("=" * 50)
-    print("Destination :", destination)
-    print("Trip Name   :", trip_name)
-    print("Purpose ID :", purpose)
-    print("Remark     :", remark)
-    print("=" * 50)
+    logger.debug("Destination : %s", destination)
+    logger.debug("Trip Name   : %s", trip_name)
+    logger.debug("Purpose ID : %s", purpose)
+    logger.debug("Remark     : %s", remark)
 
     # 🔹 Final response
     return JsonResponse({
@@ -2709,15 +2734,13 @@ Output JSON format:
     in_time_str = datetime_info.get("end_time")
 
     # 🔹 Debug logs (optional)
-    print("=" * 50)
-    print("Local TADA")
-    print("Client / Trip Name :", trip_name)
-    print("Purpose ID        :", purpose)
-    print("Date              :", date_str)
-    print("Start Time        :", out_time_str)
-    print("End Time          :", in_time_str)
-    print("Remark            :", remark)
-    print("=" * 50)
+    logger.debug("Local TADA")
+    logger.debug("Client / Trip Name : %s", trip_name)
+    logger.debug("Purpose ID        : %s", purpose)
+    logger.debug("Date              : %s", date_str)
+    logger.debug("Start Time        : %s", out_time_str)
+    logger.debug("End Time          : %s", in_time_str)
+    logger.debug("Remark            : %s", remark)
 
     # 🔹 Final response
     return JsonResponse({
@@ -2752,15 +2775,15 @@ def handle_travel_requests(token, status_filter=None, page=1, limit=20):
         if status_filter:
             params["status"] = status_filter
 
-        r = requests.get(
+        r = fixhr_http.get(
             FIXHR_TADA_TRAVAL_REQUEST,
             headers=headers,
             params=params,
             timeout=15,
         )
 
-        print("📡 Travel Plan Search Status:", r.status_code)
-        print("📡 Travel Plan Search Body:", r.text)
+        logger.info("📡 Travel Plan Search Status: %s", r.status_code)
+        logger.debug("📡 Travel Plan Search Body: %s", log_body(r))
 
         data = r.json()
 
@@ -2904,15 +2927,15 @@ def handle_tada_claims(token, status_filter=None, page=1, limit=20):
         if status_filter:
             params["status"] = status_filter
 
-        r = requests.get(
+        r = fixhr_http.get(
             FIXHR_TADA_CLAIM_SEARCH,
             headers=headers,
             params=params,
             timeout=15,
         )
 
-        print("📡 TADA Search HTTP Status:", r.status_code)
-        print("📡 TADA Search Body:", r.text[:2000])  # limit length for logs
+        logger.info("📡 TADA Search HTTP Status: %s", r.status_code)
+        logger.debug("📡 TADA Search Body: %s", log_body(r))  # limit length for logs
 
         # Ensure we got a 200-ish response
         if r.status_code != 200:
@@ -2925,7 +2948,7 @@ def handle_tada_claims(token, status_filter=None, page=1, limit=20):
         try:
             data = r.json()
         except ValueError as ex:
-            print("⚠️ JSON decode error:", ex)
+            logger.warning("⚠️ JSON decode error: %s", ex)
             return {
                 "reply_type": "bot",
                 "reply": "Received invalid JSON from TADA service.",
@@ -2933,7 +2956,7 @@ def handle_tada_claims(token, status_filter=None, page=1, limit=20):
 
         # Ensure data is a dict
         if not isinstance(data, dict):
-            print("⚠️ Unexpected JSON shape (not an object):", type(data))
+            logger.warning("⚠️ Unexpected JSON shape (not an object): %s", type(data))
             return {
                 "reply_type": "bot",
                 "reply": "Unexpected response format from TADA service.",
@@ -2987,7 +3010,7 @@ def handle_tada_claims(token, status_filter=None, page=1, limit=20):
 
         for idx, row in enumerate(rows):
             if not isinstance(row, dict):
-                print(f"⚠️ skipping non-dict row at index {idx}: {type(row)}")
+                logger.warning("⚠️ skipping non-dict row at index %s: %s", idx, type(row))
                 continue
 
             gross_amount = to_float(row.get("tc_amount") or 0)
@@ -3111,9 +3134,9 @@ def login_api(request):
             return HttpResponseBadRequest("Email/Password required")
 
         payload = {"email": email, "password": password, "notification_key": "web"}
-        r = requests.post(FIXHR_LOGIN_URL, data=payload, timeout=15)
-        print("📡 Login API Status:", r.status_code)
-        print("📡 Login API Body:", r.text)
+        r = fixhr_http.post(FIXHR_LOGIN_URL, data=payload, timeout=15)
+        logger.info("📡 Login API Status: %s", r.status_code)
+        logger.debug("📡 Login API Body: %s", log_body(r))
 
         data = r.json() if r.content else {}
 
@@ -3393,9 +3416,9 @@ def handle_model_command(msg, token, request):
         extracted_commands = model_result.get("extracted_commands", [])
         date_info = model_result.get("date_info", {})
         
-        print(f"🤖 Model Command Type: {command_type}")
-        print(f"🤖 Extracted Commands: {extracted_commands}")
-        print(f"🗓️ Date Info: {date_info}")
+        logger.debug("🤖 Model Command Type: %s", command_type)
+        logger.debug("🤖 Extracted Commands: %s", extracted_commands)
+        logger.debug("🗓️ Date Info: %s", date_info)
         
         # Process each extracted command
         responses = []
@@ -3487,7 +3510,7 @@ def handle_model_command(msg, token, request):
                 }
                 
                 try:
-                    res = requests.get(FIXHR_ATTENDANCE_URL, headers=headers, params=params, timeout=15)
+                    res = fixhr_http.get(FIXHR_ATTENDANCE_URL, headers=headers, params=params, timeout=15)
                     res.raise_for_status()
                     data = res.json().get("data", {}).get("original", {}).get("data", [])
                     
@@ -3555,9 +3578,75 @@ def handle_model_command(msg, token, request):
         })
 
 # ---------------- Attendance Helpers ----------------
+ATTENDANCE_MAX_MONTHS = 12
+_MONTH_TOKEN = r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+_MONTH_RANGE_RE = re.compile(
+    rf"\b{_MONTH_TOKEN}(?:\s+(20\d{{2}}))?\s*(?:to|till|until|through|se|-|–)\s*{_MONTH_TOKEN}\b(?:\s+(20\d{{2}}))?"
+)
+_QUARTER_RE = re.compile(r"\bq([1-4])\b|\bquarter\s*([1-4])\b|\b([1-4])(?:st|nd|rd|th)\s+quarter\b")
+_LAST_N_MONTHS_RE = re.compile(r"\b(?:last|previous|past|pichle)\s+(\d{1,2})\s+(?:months|mahine)\b")
+_MONTH_ABBR = {name.lower(): num for num, name in enumerate(calendar.month_abbr) if name}
+
+
+def month_span(first_year, first_month, months):
+    """(start, end) dates covering ``months`` whole months from ``first_year-first_month``."""
+    last_index = first_year * 12 + first_month - 1 + months - 1
+    last_year, last_month = divmod(last_index, 12)
+    start = date(first_year, first_month, 1)
+    end = date(last_year, last_month + 1, calendar.monthrange(last_year, last_month + 1)[1])
+    return start, end
+
+
+def determine_multi_month_period(t: str, today):
+    """Quarter / last-N-months / "Jan to Mar" periods → (start, end, label, period_type), or None."""
+    if any(k in t for k in ["last quarter", "previous quarter", "pichle quarter"]):
+        q_start_month = (today.month - 1) // 3 * 3 + 1
+        year, month = divmod(today.year * 12 + q_start_month - 1 - 3, 12)
+        start, end = month_span(year, month + 1, 3)
+        return start, end, f"Q{(month // 3) + 1} {year}", "quarter"
+    if any(k in t for k in ["this quarter", "current quarter", "is quarter"]):
+        quarter = (today.month - 1) // 3 + 1
+        start, end = month_span(today.year, (quarter - 1) * 3 + 1, 3)
+        return start, end, f"Q{quarter} {today.year}", "quarter"
+    quarter_match = _QUARTER_RE.search(t)
+    if quarter_match:
+        quarter = int(next(g for g in quarter_match.groups() if g))
+        year_match = re.search(r"\b(20\d{2})\b", t)
+        year = int(year_match.group(1)) if year_match else today.year
+        start, end = month_span(year, (quarter - 1) * 3 + 1, 3)
+        return start, end, f"Q{quarter} {year}", "quarter"
+
+    last_n = _LAST_N_MONTHS_RE.search(t)
+    if last_n:
+        months = min(max(int(last_n.group(1)), 1), ATTENDANCE_MAX_MONTHS)
+        year, month = divmod(today.year * 12 + today.month - 1 - months, 12)
+        start, end = month_span(year, month + 1, months)
+        return start, end, f"Last {months} Months", "range"
+
+    range_match = _MONTH_RANGE_RE.search(t)
+    if range_match:
+        first_name, first_year, last_name, last_year = range_match.groups()
+        first_month, last_month = _MONTH_ABBR[first_name[:3]], _MONTH_ABBR[last_name[:3]]
+        last_year = int(last_year or first_year or today.year)
+        first_year = int(first_year) if first_year else (last_year if first_month <= last_month else last_year - 1)
+        months = (last_year * 12 + last_month) - (first_year * 12 + first_month) + 1
+        if months < 1:
+            return None
+        months = min(months, ATTENDANCE_MAX_MONTHS)
+        start, end = month_span(first_year, first_month, months)
+        label = f"{calendar.month_abbr[start.month]} {start.year} – {calendar.month_abbr[end.month]} {end.year}"
+        return start, end, label, "range"
+    return None
+
+
 def determine_attendance_period(text: str) -> dict:
-    """Infer date range for attendance queries."""
-    t = (text or "").lower()
+    """Infer date range for attendance queries (``text`` may be a MessageContext; memoized on it)."""
+    return MessageContext.of(text).memo("attendance_period", _attendance_period)
+
+
+def _attendance_period(ctx):
+    t = ctx.lower
+    text = ctx.text
     today = datetime.now().date()
     
     start = today.replace(day=1)
@@ -3566,8 +3655,31 @@ def determine_attendance_period(text: str) -> dict:
     year = start.year
     label = f"{calendar.month_name[month]} {year}"
     period_type = "month"
+    multi_month = determine_multi_month_period(t, today)
     
-    if any(k in t for k in ["last week", "previous week", "pichle hafte", "pichle week"]):
+    if multi_month:
+        start, end, label, period_type = multi_month
+        month = start.month
+        year = start.year
+    elif re.search(r"\b(day before yesterday|parso)\b", t):
+        start = end = today - timedelta(days=2)
+        month = start.month
+        year = start.year
+        label = start.strftime("%d %b %Y")
+        period_type = "day"
+    elif re.search(r"\b(yesterday|kal)\b", t):
+        start = end = today - timedelta(days=1)
+        month = start.month
+        year = start.year
+        label = "Yesterday"
+        period_type = "day"
+    elif re.search(r"\b(today|aaj)\b", t):
+        start = end = today
+        month = start.month
+        year = start.year
+        label = "Today"
+        period_type = "day"
+    elif any(k in t for k in ["last week", "previous week", "pichle hafte", "pichle week"]):
         this_monday = today - timedelta(days=today.weekday())
         start = this_monday - timedelta(days=7)
         end = this_monday - timedelta(days=1)
@@ -3592,8 +3704,8 @@ def determine_attendance_period(text: str) -> dict:
         period_type = "month"
     else:
         # Default monthly detection (supports named months)
-        month, year = extract_month_year(text)
-        print("🧭 Attendance Period Text:", text, "→", month, year)
+        month, year = extract_month_year(ctx)
+        logger.debug("🧭 Attendance Period Text: %s → %s %s", text, month, year)
         start = datetime(year, month, 1).date()
         end = datetime(year, month, calendar.monthrange(year, month)[1]).date()
         label = f"{calendar.month_name[month]} {year}"
@@ -3612,9 +3724,40 @@ def determine_attendance_period(text: str) -> dict:
     }
 
 
+def resolve_employee_filter(filter_info: dict, viewer: str) -> dict:
+    """
+    Narrow a name / emp_id scope extracted by ``detect_employee_filter`` to exact
+    employee IDs via the viewer's employee directory. Every other scope — including
+    the default "all" — is returned unchanged, as is one the directory cannot match.
+    """
+    f_type = filter_info["type"]
+    if f_type not in ("name", "emp_id"):
+        return filter_info
+    directory = employee_directory_for(viewer)
+    if not len(directory):
+        return filter_info
+
+    if f_type == "emp_id":
+        match = directory.lookup_id(filter_info["value"])
+        matches = [match] if match else []
+    else:
+        matches = directory.resolve(filter_info["value"]) or directory.find_in_text(filter_info["value"])
+
+    ids = [employee_id for employee_id, _ in matches if employee_id]
+    if not ids:
+        return filter_info
+    names = sorted({name for _, name in matches if name})
+    label = ", ".join(names[:3]) + (f" +{len(names) - 3} more" if len(names) > 3 else "")
+    if f_type == "emp_id":
+        label = f"{label} (#{ids[0]})" if label else filter_info["label"]
+    logger.debug("🔎 Employee filter %s → %s", filter_info, ids)
+    return {"type": "ids", "ids": ids, "label": label or filter_info["label"]}
+
+
 def detect_employee_filter(text: str, request) -> dict:
     """Identify whether user asked for self, specific employee, or everyone."""
-    t = (text or "").lower()
+    ctx = MessageContext.of(text)
+    t = ctx.lower
     emp_id = request.session.get("employee_id")
     emp_name = (request.session.get("name") or "").strip() or "You"
     role_name = (request.session.get("role_name") or "").lower()
@@ -3637,14 +3780,14 @@ def detect_employee_filter(text: str, request) -> dict:
             info["emp_id"] = str(emp_id)
         return info
     
-    id_match = re.search(r"(?:employee|emp)\s*(?:id|code|number|no\.?|#)?\s*(\d+)", text or "", re.I)
-    if id_match:
+    mentioned_id = ctx.employee_id_mention
+    if mentioned_id:
         if can_view_all:
-            return {"type": "emp_id", "value": id_match.group(1), "label": f"Employee #{id_match.group(1)}"}
+            return {"type": "emp_id", "value": mentioned_id, "label": f"Employee #{mentioned_id}"}
         if emp_id:
             return {"type": "self", "emp_id": str(emp_id), "label": emp_name, "name_value": emp_name.lower()}
     
-    name = extract_employee_name(text or "")
+    name = ctx.employee_name
     if name:
         if can_view_all:
             return {"type": "name", "value": name.lower(), "label": name}
@@ -3678,30 +3821,130 @@ def detect_employee_filter(text: str, request) -> dict:
     return {"type": "self", "label": emp_name, "name_value": emp_name.lower()}
 
 
+def extract_attendance_table(payload):
+    """Employee list from the attendance payload (it may be nested under original/data/result)."""
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict):
+        if "original" in payload:
+            return extract_attendance_table(payload["original"])
+        if "data" in payload:
+            return extract_attendance_table(payload["data"])
+        if "result" in payload:
+            return extract_attendance_table(payload["result"])
+    return []
+
+
+def fetch_attendance_employees(headers, start, end):
+    """FixHR attendance for ``start``..``end`` (within one month) as a list of employees."""
+    params = {
+        "month": start.month,
+        "year": start.year,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+    }
+    res = fixhr_http.get(FIXHR_ATTENDANCE_URL, headers=headers, params=params, timeout=20)
+    logger.info("📡 Attendance API Status: %s", res.status_code)
+    logger.debug("📡 Attendance API Params: %s", params)
+    res.raise_for_status()
+    data = res.json() if res.content else {}
+    logger.debug("📡 Attendance API Body: %s", lazy_json(data))
+    employees = extract_attendance_table(data)
+    return employees if isinstance(employees, list) else []
+
+
+@require_GET
+@fixhr_http.with_deadline()
+def attendance_export(request):
+    """
+    GET /api/attendance/export/?q=<attendance question>&format=csv|xlsx
+    Streams the attendance register for the period and scope the question describes
+    (same parsing and role checks as the chat report).
+    """
+    token = request.session.get("fixhr_token")
+    if not token:
+        return JsonResponse({"ok": False, "error": "Session expired. Please login again."}, status=401)
+    export_format = (request.GET.get("format") or "csv").lower()
+    if export_format not in ("csv", "xlsx"):
+        return JsonResponse({"ok": False, "error": "format must be csv or xlsx"}, status=400)
+    if export_format == "xlsx" and Workbook is None:
+        return JsonResponse({"ok": False, "error": "XLSX export needs openpyxl installed"}, status=501)
+
+    text = request.GET.get("q") or ""
+    period = determine_attendance_period(text)
+    filter_info = detect_employee_filter(text, request)
+    predicates, _ = compile_attendance_query(text)
+    period_start = datetime.fromisoformat(period["start_date"]).date()
+    period_end = datetime.fromisoformat(period["end_date"]).date()
+    headers = {"authorization": f"Bearer {token}", "Accept": "application/json"}
+    viewer = viewer_key(request, token)
+
+    try:
+        ensure_synced(
+            viewer, period_start, period_end,
+            lambda start, end: fetch_attendance_employees(headers, start, end),
+        )
+    except Exception as e:
+        logger.error("Attendance export fetch error: %s", e)
+        return JsonResponse({"ok": False, "error": f"Could not fetch attendance: {e}"}, status=502)
+
+    filter_info = resolve_employee_filter(filter_info, viewer)
+    rows = register_rows(viewer, period_start, period_end, filter_info, predicates)
+    filename = f"attendance_{period['start_date']}_{period['end_date']}.{export_format}"
+    if export_format == "xlsx":
+        response = StreamingHttpResponse(
+            stream_xlsx(rows, title=period["label"]),
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+    else:
+        response = StreamingHttpResponse(stream_csv(rows), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@require_GET
+@compress_response
+def attendance_register_page(request):
+    """
+    GET /api/attendance/register/?cursor=<next_cursor>&limit=50
+    Next page of register rows (with their details) from a report built by the chat.
+    """
+    token = request.session.get("fixhr_token")
+    if not token:
+        return JsonResponse({"ok": False, "error": "Session expired. Please login again."}, status=401)
+    try:
+        limit = int(request.GET.get("limit") or ATTENDANCE_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "limit must be a number"}, status=400)
+    page = next_attendance_page(viewer_key(request, token), request.GET.get("cursor"), limit)
+    if page is None:
+        return JsonResponse({"ok": False, "error": "This report has expired. Please ask for it again."}, status=410)
+    return JsonResponse({"ok": True, **page})
+
+
 def handle_attendance_report(decision: dict, token: str, request, user_message: str = ""):
     """Handle attendance report requests"""
     if not token:
         return JsonResponse({"reply_type": "attendance", "reply": "⚠️ Session expired. Please login again."}, status=401)
     
-    user_message = user_message or decision.get("text") or ""
+    ctx = MessageContext.of(user_message or decision.get("text") or "")
+    user_message = ctx.text
     lang = decision.get("language", "en")
-    period = determine_attendance_period(user_message)
-    filter_info = detect_employee_filter(user_message, request)
+    period = determine_attendance_period(ctx)
+    filter_info = detect_employee_filter(ctx, request)
+    predicates, filter_label = compile_attendance_query(ctx.lower)
     
     headers = {"authorization": f"Bearer {token}", "Accept": "application/json"}
-    params = {
-        "month": period["month"],
-        "year": period["year"],
-        "start_date": period["start_date"],
-        "end_date": period["end_date"],
-    }
-    
+    period_start = datetime.fromisoformat(period["start_date"]).date()
+    period_end = datetime.fromisoformat(period["end_date"]).date()
+
+    def fetch(start, end):
+        return fetch_attendance_employees(headers, start, end)
+
+    viewer = viewer_key(request, token)
+
     try:
-        res = requests.get(FIXHR_ATTENDANCE_URL, headers=headers, params=params, timeout=20)
-        print("📡 Attendance API Status:", res.status_code)
-        print("📡 Attendance API Params:", params)
-        data = res.json() if res.content else {}
-        print(data)
+        ensure_synced(viewer, period_start, period_end, fetch)
     except Exception as e:
         logger.error("Attendance API error: %s", e)
         return JsonResponse(
@@ -3712,138 +3955,26 @@ def handle_attendance_report(decision: dict, token: str, request, user_message:
             status=502,
         )
 
-    def extract_table(payload):
-        if isinstance(payload, list):
-            return payload
-        if isinstance(payload, dict):
-            if "original" in payload:
-                return extract_table(payload["original"])
-            if "data" in payload:
-                return extract_table(payload["data"])
-            if "result" in payload:
-                return extract_table(payload["result"])
-        return []
-    
-    employees = extract_table(data)
-    if not isinstance(employees, list):
-        employees = []
-    
-    def parse_date(value):
-        if not value:
-            return None
-        value = str(value).strip()
-        try:
-            return datetime.fromisoformat(value[:10]).date()
-        except ValueError:
-            parsed = dateparser.parse(value)
-            return parsed.date() if parsed else None
-    
-    period_start = datetime.fromisoformat(period["start_date"]).date()
-    period_end = datetime.fromisoformat(period["end_date"]).date()
-    row_limit = 250
-    rows = []
-    summary = defaultdict(int)
-    
-    def matches_filter(emp_name, emp_id):
-        f_type = filter_info["type"]
-        if f_type == "all":
-            return True
-        if f_type == "self":
-            name_value = (filter_info.get("name_value") or "").lower()
-            if filter_info.get("emp_id") and str(emp_id) == str(filter_info.get("emp_id")):
-                return True
-            if name_value and emp_name:
-                return name_value in emp_name.lower()
-            return False
-        if f_type == "emp_id":
-            return str(emp_id) == str(filter_info.get("value"))
-        if f_type == "name":
-            return filter_info.get("value") in (emp_name or "").lower()
-        return True
-    
-    for emp in employees:
-        emp_name = (emp.get("emp_name") or emp.get("name") or "").strip()
-        emp_id = emp.get("emp_id") or emp.get("employee_id") or ""
-        if not matches_filter(emp_name, emp_id):
-            continue
-        
-        day_entries = emp.get("days") or emp.get("attendance") or []
-        for day in day_entries:
-            day_date = parse_date(day.get("date") or day.get("attendance_date"))
-            if not day_date:
-                continue
-            if day_date < period_start or day_date > period_end:
-                continue
-            
-            status = (day.get("status") or "-").upper()
-            row = {
-                "employee_name": emp_name or f"Emp #{emp_id}",
-                "employee_id": emp_id,
-                "date": day_date.isoformat(),
-                "status": status,
-                "in_time": day.get("in_time") or "-",
-                "out_time": day.get("out_time") or "-",
-                "work_hours": day.get("work_hrs") or day.get("work_hours") or "-",
-                "late": bool(day.get("is_late") or str(day.get("late", "")).lower() == "yes"),
-                "overtime": day.get("overtime_hours") or day.get("ot") or "-",
-                "remark": day.get("remark") or day.get("remarks") or "-",
-            }
-            rows.append(row)
-            summary[status] += 1
-            
-            if len(rows) >= row_limit:
-                break
-        if len(rows) >= row_limit:
-            break
-    
-    if not rows:
-        scope = filter_info["label"]
+    filter_info = resolve_employee_filter(filter_info, viewer)
+    frame = load_attendance_frame(
+        viewer, period_start, period_end, employee_ids=filter_info.get("ids"), predicates=predicates,
+    )
+    register, details, summary_rows, row_count = report_from_frame(frame, filter_info, period_start, period_end)
+    logger.info("📒 Attendance report: %s rows for %s [%s]", row_count, filter_info["label"], filter_label or "no filter")
+
+    if not row_count:
+        scope = filter_info["label"] + (f" ({filter_label})" if filter_label else "")
         reply = f"⚠️ Attendance data nahi mila {scope} ke liye." if lang == "hi" else f"⚠️ No attendance found for {scope}."
         return JsonResponse({"reply_type": "attendance", "reply": reply})
     
-    # Build UI-friendly structure
-    by_emp_date = {}
-    dates_sorted = sorted({r["date"] for r in rows})
-    for r in rows:
-        key = r["employee_name"]
-        by_emp_date.setdefault(key, {})[r["date"]] = r["status"]
-    
-    register_rows = []
-    for emp_name, date_map in by_emp_date.items():
-        values = [date_map.get(d, "-") for d in dates_sorted]
-        register_rows.append({"name": emp_name, "values": values})
-    
-    register = {
-        "headers": ["Employee"] + dates_sorted,
-        "rows": register_rows,
-    }
-    
-    details_map = {}
-    for r in rows:
-        emp_name = r["employee_name"]
-        details_map.setdefault(emp_name, []).append(
-            {
-                "date": r["date"],
-                "status": r["status"],
-                "in_time": r["in_time"],
-                "out_time": r["out_time"],
-                "work_hrs": r["work_hours"],
-                "is_late": r["late"],
-                "overtime_hours": r["overtime"],
-                "remark": r["remark"],
-            }
-        )
-    
-    details = [{"emp_name": emp, "rows": emp_rows} for emp, emp_rows in details_map.items()]
-    summary_rows = [{"status": status, "days": count} for status, count in summary.items()]
-    
-    scope_label = filter_info["label"]
+    scope_label = filter_info["label"] + (f" — {filter_label}" if filter_label else "")
     period_label = period["label"] or f"{period['start_date']} → {period['end_date']}"
     reply = (
         f"📒 Attendance report {scope_label} ka ({period_label})."
         if lang == "hi"
         else f"📒 Attendance report for {scope_label} ({period_label})."
     )
+    page = first_attendance_page(viewer, register, details)
     
     return JsonResponse(
         {
@@ -3851,10 +3982,16 @@ def handle_attendance_report(decision: dict, token: str, request, user_message:
             "reply": reply,
             "range": {"label": period_label, "start": period["start_date"], "end": period["end_date"]},
             "scope": scope_label,
-            "register": register,
-            "details": details,
+            "register": {"headers": register["headers"], "rows": page["rows"]},
+            "details": page["details"],
             "summary": summary_rows,
-            "limited": len(rows) >= row_limit,
+            "limited": False,
+            "next_cursor": page["next_cursor"],
+            "total_employees": page["total"],
+            "export": {
+                fmt: f"/api/attendance/export/?{urlencode({'q': user_message, 'format': fmt})}"
+                for fmt in (("csv", "xlsx") if Workbook is not None else ("csv",))
+            },
         }
     )
 
@@ -3892,7 +4029,7 @@ def chat_history(request):
             "history": []
         })
 
-    history = CHAT_HISTORY.get(user_id, [])
+    history = chat_state.get("history", user_id, [])
     
     return JsonResponse({
         "ok": True,
@@ -3935,7 +4072,7 @@ def handle_tada_claim_list_by_type(token, travel_type_id, page=1, limit=50):
 
 
 
-        r = requests.get(
+        r = fixhr_http.get(
 
             url,
 
@@ -3949,9 +4086,9 @@ def handle_tada_claim_list_by_type(token, travel_type_id, page=1, limit=50):
 
 
 
-        print(f"📡 TADA Claim List (Type {travel_type_id}) Status:", r.status_code)
+        logger.info("📡 TADA Claim List (Type %s) Status: %s", travel_type_id, r.status_code)
 
-        print(f"📡 TADA Claim List Body:", r.text[:2000])
+        logger.debug("📡 TADA Claim List Body: %s", log_body(r))
 
 
 
@@ -4105,6 +4242,12 @@ def handle_tada_claim_list_by_type(token, travel_type_id, page=1, limit=50):
 
                 "created_at": row.get("tc_created_at"),
 
+                "purpose": (plan.get("trp_purpose") or [{}])[0].get("purpose_name"),
+
+                "destination": plan.get("trp_destination"),
+
+                "claim_pdf_url": row.get("claim_pdf_url"),
+
                 "raw": row,  # keep full raw for debugging / future use
 
             }
@@ -4177,15 +4320,15 @@ def handle_tada_claim_list_local(token, page=1, limit=50):
         travel_type_id = 58
         url = f"https://dev.fixhr.app/api/admin/tada/claim_list/{travel_type_id}"
 
-        r = requests.get(
+        r = fixhr_http.get(
             url,
             headers=headers,
             params=params,
             timeout=15,
         )
 
-        print("📡 Local TADA Claim Status:", r.status_code)
-        print("📡 Local TADA Claim Body:", r.text[:2000])
+        logger.info("📡 Local TADA Claim Status: %s", r.status_code)
+        logger.debug("📡 Local TADA Claim Body: %s", log_body(r))
 
         if r.status_code != 200:
             return {
@@ -4256,6 +4399,9 @@ def handle_tada_claim_list_local(token, page=1, limit=50):
                 "from_date": plan.get("trp_start_date"),
                 "to_date": plan.get("trp_end_date"),
                 "created_at": row.get("tc_created_at"),
+                "purpose": (plan.get("trp_purpose") or [{}])[0].get("purpose_name"),
+                "destination": plan.get("trp_destination"),
+                "claim_pdf_url": row.get("claim_pdf_url"),
                 "raw": row,  # full response for debugging
             }
 
@@ -4307,13 +4453,13 @@ def handle_tada_acceptance_list_by_type(token, travel_type_id):
 
 
 
-        r = requests.get(url, headers=headers, timeout=15)
+        r = fixhr_http.get(url, headers=headers, timeout=15)
 
 
 
-        print("📡 TADA Acceptance Status:", r.status_code)
+        logger.info("📡 TADA Acceptance Status: %s", r.status_code)
 
-        print("📡 TADA Acceptance Body:", r.text[:2000])
+        logger.debug("📡 TADA Acceptance Body: %s", log_body(r))
 
 
 
@@ -4502,10 +4648,10 @@ def handle_tada_acceptance_list_local(token, page=1, limit=50):
         travel_type_id = 58
         url = f"https://dev.fixhr.app/api/admin/tada/acceptance-list/{travel_type_id}"
 
-        r = requests.get(url, headers=headers, params=params, timeout=15)
+        r = fixhr_http.get(url, headers=headers, params=params, timeout=15)
 
-        print("📡 Local TADA Acceptance Status:", r.status_code)
-        print("📡 Local TADA Acceptance Body:", r.text[:2000])
+        logger.info("📡 Local TADA Acceptance Status: %s", r.status_code)
+        logger.debug("📡 Local TADA Acceptance Body: %s", log_body(r))
 
         if r.status_code != 200:
             return {
@@ -4607,13 +4753,13 @@ def handle_tada_travel_plan_list_by_type(token, travel_type_id, page=1, limit=10
 
 
 
-        r = requests.post(url, headers=headers, params=params, timeout=15)
+        r = fixhr_http.post(url, headers=headers, params=params, timeout=15)
 
 
 
-        print("📡 TADA Travel Plan Status:", r.status_code)
+        logger.info("📡 TADA Travel Plan Status: %s", r.status_code)
 
-        print("📡 TADA Travel Plan Body:", r.text[:2000])
+        logger.debug("📡 TADA Travel Plan Body: %s", log_body(r))
 
 
 
@@ -4790,15 +4936,15 @@ def handle_tada_plan_list_by_type(token, travel_type_id, page=1, limit=10):
 
         url = "https://dev.fixhr.app/api/admin/tada/filter-plan"
 
-        r = requests.post(
+        r = fixhr_http.post(
             url,
             headers=headers,
             params=params,
             timeout=15,
         )
 
-        print("📡 TADA PLAN Status:", r.status_code)
-        print("📡 TADA PLAN Body:", r.text[:2000])
+        logger.info("📡 TADA PLAN Status: %s", r.status_code)
+        logger.debug("📡 TADA PLAN Body: %s", log_body(r))
 
         if r.status_code != 200:
             return {
@@ -4881,514 +5027,416 @@ def handle_tada_plan_list_by_type(token, travel_type_id, page=1, limit=10):
        
 
 # ---------------- CHAT API ----------------
-@csrf_exempt
-def chat_api(request):
-    """Main chat API endpoint using phi3_inference_v3 for intent classification 
-       and model_inference2 for general responses"""
-    
-    is_logged_in = check_authentication(request)
-    token = request.session.get("fixhr_token") if is_logged_in else None
+# ---------------- Chat intent handlers ----------------
+def _login_prompt(call):
+    return JsonResponse({
+        "reply": "⚠️ Please login to access HR features like leave, attendance, payslip, gatepass & approvals.",
+        "reply_type": "text_only"
+    })
 
-    if request.method != "POST":
-        return JsonResponse({"error": "Invalid method"}, status=405)
 
-    try:
-        body = json.loads(request.body.decode())
-    except json.JSONDecodeError:
-        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+chat_intents = IntentRegistry(login_required=_login_prompt)
 
-    msg = (body.get("message") or "").strip()
-    if not msg:
-        return JsonResponse({"error": "Message text is required"}, status=400)
 
-    user_id = request.session.get("employee_id") or "default_user"
+@chat_intents.provide("datetime_info")
+def _datetime_input(call):
+    info = call.pipeline.datetime_info() if call.pipeline else call.ctx.datetime_info
+    logger.debug("📅 DateTime Extract → %s", info)
+    return info
 
-    # Initialize history
-    if user_id not in CHAT_HISTORY:
-        CHAT_HISTORY[user_id] = []
 
-    CHAT_HISTORY[user_id].append({"role": "user", "text": msg})
+@chat_intents.provide("memory")
+def _memory_input(call):
+    return chat_state.get("session", call.user_id) or dict(EMPTY_SLOT_MEMORY)
 
-    # Memory setup
-    SESSION_MEMORY.setdefault(user_id, {"date": None, "leave_type": None, "reason": None})
-    chat_memory = SESSION_MEMORY[user_id]
 
-    print("💬 User Message:", msg)
-# -------------------------------------------------
-    if not is_logged_in:
-        if intent != "general":  
-            return JsonResponse({
-                "reply": "⚠️ Please login to access HR features like leave, attendance, payslip, gatepass & approvals.",
-                "reply_type": "text_only"
-            })
+@chat_intents.provide("decision")
+def _decision_input(call):
+    decision = build_decision_context(call.ctx, call.classification, call.datetime_info)
+    # Continuation mode: reuse previous slots if user says "also", "again", etc.
+    if call.ctx.is_continuation:
+        memory = call.memory if call.memory is not None else _memory_input(call)
+        for slot, key in (("date", "date"), ("leave_type", "leave_type"), ("reason", "reason")):
+            if memory.get(slot):
+                decision[key] = memory[slot]
+    return decision
 
-    
-    # 1) Classify intent using phi3_inference_v3
-    start_time = time.perf_counter()
-    classification = classify_message(msg)
-    # ⏱️ END TIMER
-    end_time = time.perf_counter()
-    latency_ms = (end_time - start_time) * 1000
-    print(f"NLU Time Taken:-------------------------------------------------------> {latency_ms:.2f} ms")
-    # print(f"classification =============== : {classification}")
-    intent = classification.get("intent") or "general"
-
-    reason = classification.get("reason") or "other"
-    destination = classification.get("destination") or "local"
-    leave_category = classification.get("leave_category") or "unpaid leave"
-    # print(f"%%%%%%%%%%%%%%%%%%%%%%%%% {reason}, {destination}, {leave_category}")
-  
-    lang = classification.get("language", "en")
-    confidence = classification.get("confidence", 0.0)
-    
-    print("🤖 Phi-3 Intent →")
-    
-    # 2) If general intent, use model_inference2.py for response
-    if intent == "general":
-        start_time = time.perf_counter()
-        reply = model_response(msg) or handle_general_chat(msg, lang)
-        # ⏱️ END TIMER
-        end_time = time.perf_counter()
-        latency_ms = (end_time - start_time) * 1000
-        print(f"NLU Time Taken:-----------------------------------------------------🤖-> {latency_ms:.2f} ms")
-        return JsonResponse({
-            "reply": reply,
-            "intent": intent,
-            "confidence": confidence,
-            "datetime_info": None,
-        })
-    
-    # 3) Extract datetime info using extract_date_time.py
-    datetime_info = extract_datetime_info(msg)
-    decision = build_decision_context(msg, classification, datetime_info)
-    task = decision.get("task") or "general"
-    lang = decision.get("language", lang)
-    
-    print("📅 DateTime Extract →", datetime_info)
-    
-    # 4) Continuation mode: reuse previous slots if user says "also", "again", etc.
-    if any(w in msg.lower() for w in ["bhi", "also", "same", "phir", "again", "next day", "uske baad"]):
-        if chat_memory.get("date"):
-            decision["date"] = chat_memory["date"]
-        if chat_memory.get("leave_type"):
-            decision["leave_type"] = chat_memory["leave_type"]
-        if chat_memory.get("reason"):
-            decision["reason"] = chat_memory["reason"]
-    
-    meta = {
-        "intent": task,
-        "confidence": confidence,
-        "datetime_info": datetime_info,
-    }
 
+@chat_intents.provide("role_name")
+def _role_input(call):
+    return call.request.session.get("role_name")
 
 
-             # ------------------------------------------------------------
-    # 4) CHECK FOR APPROVAL/REJECTION ACTIONS FIRST (BEFORE TASK ROUTING)
-    # ------------------------------------------------------------
-    # Check for compoff approval/rejection - must be checked BEFORE task routing
-    raw_msg = msg.lower().strip()
-    # 🔥 HIGHEST PRIORITY: CompOff Approve / Reject
-    # if "|" in msg_raw and re.match(r"^(approve|reject)\s*compoff\s*\|", msg_raw, re.I):
-    if raw_msg.startswith("approve compoff") or raw_msg.startswith("reject compoff"):
-        print("🔥 DIRECT CompOff command detected")
+def _reply(result, call):
+    """Handler result as the chat payload: JsonResponses pass through, text gets the meta fields."""
+    if isinstance(result, JsonResponse):
+        return result
+    payload = {"reply": result}
+    payload.update(call.meta())
+    return JsonResponse(payload)
 
-        # ✅ CLEAN ORIGINAL MESSAGE (NOT LOWERCASED)
-        msg_clean = re.sub(
-            r"^(approve|reject)\s*compoff\s*\|",
-            r"\1|",
-            raw_msg,
-            flags=re.IGNORECASE
-        )
 
-        print(f"🔥 Normalized CompOff message: {msg_clean}")
+TRAVEL_TYPE_IDS = {"local": "58", "outstation": "59", "2": "2"}   # first key found in the message wins
 
-        return handle_comp_off_approval(msg_clean, token)
-    
-    # 5) Handle approval commands (high priority) - use handle_leave_approval=======================================================
-    raw_msg = msg.lower().strip()
-    if raw_msg.startswith("approve leave") or raw_msg.startswith("reject leave"):
-        result = handle_leave_approval(msg, token)
-        if isinstance(result, JsonResponse):
-            return result
-        return JsonResponse({"reply": result})
-    
-    if raw_msg.startswith("approve gatepass") or raw_msg.startswith("reject gatepass"):
-        result = handle_gatepass_approval(msg, token)
-        return JsonResponse({"reply": result})
-    
-    if raw_msg.startswith("approve missed") or raw_msg.startswith("reject missed"):
-        result = handle_missed_approval(msg, token)
-        return JsonResponse({"reply": result})
-    
-    if raw_msg.startswith("approve travel_request") or raw_msg.startswith("reject travel_request"):
-        result = handle_travel_request_approval(msg, token)
-        return JsonResponse({"reply": result})
-    
 
-    if raw_msg.startswith("approve tada_claim") or raw_msg.startswith("reject tada_claim"):
-        result = handle_tada_claim_approval(msg, token)
-        return JsonResponse({"reply": result})
+def _travel_type_id(ctx, default="59"):
+    return next((type_id for key, type_id in TRAVEL_TYPE_IDS.items() if key in ctx.lower), default)
 
-    # 6) Handle specific tasks using existing handlers
 
-   
-    # ==================================
+# Prefetch hints: words that make a read-only intent of the classified category likely enough to fetch early.
+LIST_HINTS = ("pending", "list", "approv", "all", "sabhi", "team")
+MY_HINTS = ("my", "meri", "mera", "mere", "history")
+BALANCE_HINTS = ("balance", "bachi", "baki", "baaki", "kitni", "remaining", "left")
 
-        
-    if task == "create_tada_outstation":
-        return handle_create_tada_outstation(
-            msg=msg,
-            intent_model_call=intent_model_call,
-            datetime_info=datetime_info
-        )
 
-    
+def _first_page(url, **kwargs):
+    """``prefetch`` for handlers reading ``url`` through ``collect_rows`` in pending-list pages."""
+    return lambda call: [(url, {"page": 1, "limit": PENDING_LIST_PAGE_SIZE}, kwargs)]
 
-    elif task == "create_tada_local":
-        return handle_create_tada_local(
-            msg=msg,
-            intent_model_call=intent_model_call,
-            datetime_info=datetime_info
-        )
 
-    elif task == "tada_outstation_claim_list":
-        data = handle_tada_claims(token, status_filter=None, page=1, limit=20)
-        return JsonResponse(data, safe=False)
+@chat_intents.register("general")
+def _general_intent(call):
+    """General chat, and every intent without a handler."""
+    started = time.perf_counter()
+    lang = call.classification.get("language", "en")
+    reply = model_response(call.msg) or handle_general_chat(call.msg, lang)
+    logger.info("NLU Time Taken:-----------------------------------------------------🤖-> %.2f ms",
+                (time.perf_counter() - started) * 1000)
+    return _reply(reply, call)
 
-    
-    elif task == "tada_outstation_request_list":
-        data = handle_travel_requests(token, status_filter=None, page=1, limit=20)
-        return JsonResponse(data, safe=False)
-
-    elif task == "apply_leave":
-        print("entering apply leave")
-        result = handle_apply_leave(reason, leave_category, msg, token, datetime_info)
-        if isinstance(result, JsonResponse):
-            return result
-        
-        # Save to memory
-        SESSION_MEMORY[user_id] = {
-            "date": datetime_info.get("start_date", ""),
-            "leave_type": decision.get("leave_type", "full"),
-            "reason": decision.get("reason", "")
-        }
-        
-        payload = {"reply": result}
-        payload.update(meta)
-        return JsonResponse(payload)
-    
 
-    elif task == "pending_compoff" or task == "compoff_list":
-        filter_date = None
-        filter_month = None
-        
-        msg_lower = msg.lower().strip()
-        
-        # Use extract_datetime_info instead of extract_dates
-        date_info = extract_datetime_info(msg)
-        
-        # Check for "yesterday" specifically (e.g., "compoff list of yesterday")
-        if "yesterday" in msg_lower:
-            yesterday_date = (datetime.now() - timedelta(days=1)).date()
-            filter_date = yesterday_date.strftime("%d %b, %Y")
-            print(f"📅 CompOff List - Yesterday filter: {filter_date}")
-        # Check if it's just "compoff list" (no date/month mentioned) - show today
-        elif msg_lower in ["compoff list", "pending compoff", "compoff approval", "compoff list.", "pending compoff.", "compoff approval."]:
-            today_date = datetime.now().date()
-            filter_date = today_date.strftime("%d %b, %Y")
-            print(f"📅 CompOff List - Today filter: {filter_date}")
-        else:
-            # Check if message contains just a month name (e.g., "compoff list of november")
-            month_pattern = r"\b(nov|november|dec|december|jan|january|feb|february|mar|march|apr|april|may|jun|june|jul|july|aug|august|sep|september|oct|october)\s*(?:(\d{4}))?\b"
-            month_match = re.search(month_pattern, msg_lower)
-            if month_match and not re.search(r"\d{1,2}\s+(nov|november|dec|december|jan|january|feb|february|mar|march|apr|april|may|jun|june|jul|july|aug|august|sep|september|oct|october)", msg_lower):
-                # Only month name found, not a specific date
-                month_name = month_match.group(1)
-                year = int(month_match.group(2)) if month_match.group(2) else datetime.now().year
-                
-                # Map month name to number
-                month_map = {
-                    "jan": 1, "january": 1, "feb": 2, "february": 2,
-                    "mar": 3, "march": 3, "apr": 4, "april": 4,
-                    "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7,
-                    "aug": 8, "august": 8, "sep": 9, "september": 9,
-                    "oct": 10, "october": 10, "nov": 11, "november": 11,
-                    "dec": 12, "december": 12
-                }
-                month_num = month_map.get(month_name.lower(), datetime.now().month)
-                filter_month = (month_num, year)
-                print(f"📅 CompOff List - Month filter (from pattern): {calendar.month_name[filter_month[0]]} {filter_month[1]}")
-            else:
-                # Check if there's date information extracted
-                start_date_str = date_info.get("start_date")
-                end_date_str = date_info.get("end_date")
-                
-                # Convert ISO date strings to date objects if needed
-                start_date_obj = None
-                end_date_obj = None
-                
-                if start_date_str:
-                    try:
-                        if isinstance(start_date_str, str):
-                            # extract_datetime_info returns ISO format dates (YYYY-MM-DD)
-                            start_date_obj = datetime.fromisoformat(start_date_str).date()
-                        else:
-                            start_date_obj = start_date_str
-                    except Exception as e:
-                        print(f"⚠️ Error parsing start_date_str '{start_date_str}': {e}")
-                        parsed = dateparser.parse(str(start_date_str))
-                        start_date_obj = parsed.date() if parsed else None
-                
-                if end_date_str:
-                    try:
-                        if isinstance(end_date_str, str):
-                            # extract_datetime_info returns ISO format dates (YYYY-MM-DD)
-                            end_date_obj = datetime.fromisoformat(end_date_str).date()
-                        else:
-                            end_date_obj = end_date_str
-                    except Exception as e:
-                        print(f"⚠️ Error parsing end_date_str '{end_date_str}': {e}")
-                        parsed = dateparser.parse(str(end_date_str))
-                        end_date_obj = parsed.date() if parsed else None
-                
-                # Check if it's a specific date (same start and end date, or only start date)
-                if start_date_obj and (not end_date_obj or start_date_obj == end_date_obj):
-                    filter_date = start_date_obj.strftime("%d %b, %Y")
-                    print(f"📅 CompOff List - Specific Date filter: {filter_date}")
-                # Check if it's a month range (different start/end dates in same month)
-                elif start_date_obj and end_date_obj and start_date_obj.month == end_date_obj.month and start_date_obj.year == end_date_obj.year:
-                    filter_month = (start_date_obj.month, start_date_obj.year)
-                    print(f"📅 CompOff List - Month filter (from date range): {calendar.month_name[filter_month[0]]} {filter_month[1]}")
-        
-        return handle_pending_compoff(token, request.session.get("role_name"), filter_date=filter_date, filter_month=filter_month)
-    
-    
-    
-    elif task == "leave_list" or task == "pending_leave":
-        return handle_pending_leaves(token, request.session.get("role_name"))
-    
-    elif task == "apply_gatepass":
-        print("entering apply gatepass")
-        result = handle_apply_gatepass(reason, destination, msg, token, datetime_info)
-        if isinstance(result, JsonResponse):
-            return result
-        
-        payload = {"reply": result}
-        payload.update(meta)
-        return JsonResponse(payload)
-    
-    elif task == "pending_gatepass" or task == "gatepass_list":
-        return handle_pending_gatepass(token, request.session.get("role_name"))
-    
-    elif task == "apply_missed_punch" or task == "apply_miss_punch":
-        print("entering apply missed punch")
-        result = handle_apply_missed_punch(msg, token, datetime_info)
-        if isinstance(result, JsonResponse):
-            return result
-        
-        payload = {"reply": result}
-        payload.update(meta)
-        return JsonResponse(payload)
-    
-    elif task == "pending_missed_punch" or task == "pending_miss_punch" or task == "misspunch_list":
-        return handle_pending_missed_punch(token, request.session.get("role_name"))
-    
-    elif task == "my_missed_punch" or task == "my_miss_punch":
-        return handle_my_missed_punch(token)
-    
-    elif task == "leave_balance":
-        response = handle_leave_balance(token)
-        if isinstance(response, JsonResponse):
-            return response
-        payload = {"reply": response}
-        payload.update(meta)
-        return JsonResponse(payload)
-    
-    elif task == "attendance_report":
-        return handle_attendance_report(decision, token, request, msg)
-    elif task == "leave_balance":
-        result = handle_leave_balance(token)
-        return result   
-    elif task == "my_leaves":
-        return handle_my_leaves(token, request.session.get("employee_id"))
-    elif task == "my_missed_punch":
-        return handle_my_missed_punch(token)
-    elif task == "privacy_policy":
-        # return handle_privacy_policy(token)
-        data = handle_privacy_policy(token)
-        return JsonResponse(data, safe=False)
-    elif task == "payslip":
-        # return handle_payslip_policy(token)
-        data = handle_payslip_policy(token)
-        return JsonResponse(data, safe=False)
-    elif task == "holiday_list":
-        holidays = fetch_holidays({"authorization": f"Bearer {token}"})
-        return JsonResponse({
-            "reply_type": "holiday_list",
-            "reply": "📅 Upcoming Holidays",
-            "holidays": holidays
-        })
-        
-        # --------------------------------------------pooja
-        
-    task = "tada_claim_list_by_type"
-    if task == "tada_claim_list_by_type":
-        travel_type_map = {
-            "local": "58",
-            "outstation": "59",
-            "2": "2",  # If user says "type 2"
-        }
-        travel_type_id = None
-        msg_lower = msg.lower()
-        for key, value in travel_type_map.items():
+# Button commands ("approve leave|…") are matched by prefix before classification.
+@chat_intents.register("approve_compoff", prefixes=("approve compoff", "reject compoff"), needs=("login",),
+                       endpoints=(COMPOFF_APPROVAL_STATUS_URL, COMPOFF_APPROVAL_URL))
+def _compoff_approval_command(call):
+    logger.debug("🔥 DIRECT CompOff command detected")
+    msg_clean = re.sub(r"^(approve|reject)\s*compoff\s*\|", r"\1|", call.ctx.lower, flags=re.IGNORECASE)
+    logger.debug("🔥 Normalized CompOff message: %s", msg_clean)
+    return handle_comp_off_approval(msg_clean, call.token)
 
-            if key in msg_lower:
-                travel_type_id = value
-                break
-        # Default to outstation if not specified
-        if not travel_type_id:
 
-            travel_type_id = "59"
+@chat_intents.register("bulk_approval", prefixes=("bulk approve", "bulk reject"), needs=("login",),
+                       endpoints=(APPROVAL_CHECK_URL, APPROVAL_HANDLER_URL))
+def _bulk_approval_command(call):
+    action, items, note = parse_bulk_command(call.msg)
+    return JsonResponse(handle_bulk_approval(items, call.token, call.user_id, action, note))
 
-        data = handle_tada_claim_list_by_type(token, travel_type_id, page=1, limit=50)
 
-        print("================================", data)
+@chat_intents.register("approve_leave", prefixes=("approve leave", "reject leave"), needs=("login",),
+                       endpoints=(APPROVAL_CHECK_URL, APPROVAL_HANDLER_URL))
+def _leave_approval_command(call):
+    result = handle_leave_approval(call.msg, call.token)
+    return result if isinstance(result, JsonResponse) else JsonResponse({"reply": result})
 
-        return JsonResponse(data, safe=False)
 
+@chat_intents.register("approve_gatepass", prefixes=("approve gatepass", "reject gatepass"), needs=("login",),
+                       endpoints=(APPROVAL_CHECK_URL, APPROVAL_HANDLER_URL))
+def _gatepass_approval_command(call):
+    return JsonResponse({"reply": handle_gatepass_approval(call.msg, call.token)})
 
 
+@chat_intents.register("approve_missed_punch", prefixes=("approve missed", "reject missed"), needs=("login",),
+                       endpoints=(APPROVAL_CHECK_URL, APPROVAL_HANDLER_URL))
+def _missed_approval_command(call):
+    return JsonResponse({"reply": handle_missed_approval(call.msg, call.token)})
 
-    task = "tada_acceptance_list_by_type"
-    if task == "tada_acceptance_list_by_type":
 
+@chat_intents.register("approve_travel_request", prefixes=("approve travel_request", "reject travel_request"),
+                       needs=("login",), endpoints=(APPROVAL_CHECK_URL, APPROVAL_HANDLER_URL))
+def _travel_request_approval_command(call):
+    return JsonResponse({"reply": handle_travel_request_approval(call.msg, call.token)})
 
 
-        travel_type_map = {
+@chat_intents.register("approve_tada_claim", prefixes=("approve tada_claim", "reject tada_claim"), needs=("login",),
+                       endpoints=(TA_DA_APPROVAL_HANDLER_URL,))
+def _tada_claim_approval_command(call):
+    return JsonResponse({"reply": handle_tada_claim_approval(call.msg, call.token)})
 
-            "local": "58",
 
-            "outstation": "59",
+@chat_intents.register("tada_plan_list_by_type", prefixes=("tada_plan_list_by_type",), needs=("login",),
+                       endpoints=(TA_DA_FILTER_PLAN_URL,))
+def _tada_plan_list_intent(call):
+    data = handle_tada_plan_list_by_type(call.token, _travel_type_id(call.ctx), page=1, limit=10)
+    return JsonResponse(project_reply(data), safe=False)
 
-            "2": "2",
 
-        }
+# Intents from the classifier.
+@chat_intents.register("create_tada_outstation", needs=("login", "datetime_info"))
+def _create_tada_outstation_intent(call):
+    return handle_create_tada_outstation(msg=call.msg, intent_model_call=intent_model_call,
+                                         datetime_info=call.datetime_info)
 
 
+@chat_intents.register("create_tada_local", needs=("login", "datetime_info"))
+def _create_tada_local_intent(call):
+    return handle_create_tada_local(msg=call.msg, intent_model_call=intent_model_call,
+                                    datetime_info=call.datetime_info)
 
-        travel_type_id = None
 
-        msg_lower = msg.lower()
+@chat_intents.register("tada_outstation_claim_list", needs=("login",), endpoints=(FIXHR_TADA_CLAIM_SEARCH,))
+def _tada_claims_intent(call):
+    data = handle_tada_claims(call.token, status_filter=None, page=1, limit=20)
+    return JsonResponse(project_reply(data), safe=False)
 
 
+@chat_intents.register("tada_outstation_request_list", needs=("login",), endpoints=(FIXHR_TADA_TRAVAL_REQUEST,))
+def _travel_requests_intent(call):
+    data = handle_travel_requests(call.token, status_filter=None, page=1, limit=20)
+    return JsonResponse(project_reply(data), safe=False)
 
-        for key, value in travel_type_map.items():
 
-            if key in msg_lower:
+@chat_intents.register("tada_claim_list_by_type", aliases=("all_tada",), needs=("login",),
+                       endpoints=(TA_DA_CLAIM_LIST_URL,))
+def _tada_claim_list_intent(call):
+    data = handle_tada_claim_list_by_type(call.token, _travel_type_id(call.ctx), page=1, limit=50)
+    logger.debug("================================ %s", data)
+    return JsonResponse(project_reply(data), safe=False)
 
-                travel_type_id = value
 
-                break
+@chat_intents.register("tada_local_claim_list", needs=("login",), endpoints=(TA_DA_CLAIM_LIST_URL,))
+def _tada_local_claim_list_intent(call):
+    data = handle_tada_claim_list_local(token=call.token, page=1, limit=20)
+    return JsonResponse(project_reply(data), safe=False)
 
 
+@chat_intents.register("tada_acceptance_list_by_type", aliases=("tada_outstation_acceptance_list",),
+                       needs=("login",), endpoints=(TA_DA_ACCEPTANCE_LIST_URL,))
+def _tada_acceptance_list_intent(call):
+    data = handle_tada_acceptance_list_by_type(call.token, _travel_type_id(call.ctx))
+    logger.debug("================= %s", data)
+    return JsonResponse(project_reply(data), safe=False)
 
-        if not travel_type_id:
 
-            travel_type_id = "59"  # default outstation
+@chat_intents.register("tada_local_acceptance_list", needs=("login",), endpoints=(TA_DA_ACCEPTANCE_LIST_URL,))
+def _tada_local_acceptance_list_intent(call):
+    data = handle_tada_acceptance_list_local(call.token)
+    return JsonResponse(project_reply(data), safe=False)
 
 
+@chat_intents.register("tada_travel_plan_list_by_type", needs=("login",), endpoints=(TA_DA_FILTER_PLAN_URL,))
+def _tada_travel_plan_list_intent(call):
+    data = handle_tada_travel_plan_list_by_type(call.token, _travel_type_id(call.ctx), page=1, limit=10)
+    return JsonResponse(project_reply(data), safe=False)
 
-        data = handle_tada_acceptance_list_by_type(token, travel_type_id)
 
-        print("=================", data)
+@chat_intents.register("tada_local_request_list", needs=("login",), endpoints=(TA_DA_FILTER_PLAN_URL,))
+def _tada_local_request_list_intent(call):
+    data = handle_tada_travel_plan_list_by_type(call.token, "58", page=1, limit=10)
+    return JsonResponse(project_reply(data), safe=False)
 
-        return JsonResponse(data, safe=False)
 
+@chat_intents.register("apply_leave", needs=("login", "datetime_info", "memory", "decision"),
+                       endpoints=(LEAVE_APPLY_URL,))
+def _apply_leave_intent(call):
+    logger.debug("entering apply leave")
+    c = call.classification
+    result = handle_apply_leave(c.get("reason") or "other", c.get("leave_category") or "unpaid leave",
+                                call.ctx, call.token, call.datetime_info)
+    if isinstance(result, JsonResponse):
+        return result
+    # Save to memory
+    chat_state.set("session", call.user_id, {
+        "date": call.datetime_info.get("start_date", ""),
+        "leave_type": call.decision.get("leave_type", "full"),
+        "reason": call.decision.get("reason", "")
+    })
+    return _reply(result, call)
 
-    task = "tada_travel_plan_list_by_type"
-    if task == "tada_travel_plan_list_by_type":
 
+def _iso_date(value):
+    if not value:
+        return None
+    if not isinstance(value, str):
+        return value
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError as e:
+        logger.warning("⚠️ Error parsing date '%s': %s", value, e)
+        parsed = parse_datetime(value)
+        return parsed.date() if parsed else None
+
+
+@chat_intents.register("pending_compoff", aliases=("compoff_list",), needs=("login", "datetime_info", "role_name"),
+                       endpoints=(COMPOFF_APPROVAL_LIST_URL,))
+def _pending_compoff_intent(call):
+    filter_date = None
+    filter_month = None
+    msg_lower = call.ctx.lower
+    date_info = call.datetime_info
+
+    # Check for "yesterday" specifically (e.g., "compoff list of yesterday")
+    if "yesterday" in msg_lower:
+        yesterday_date = (datetime.now() - timedelta(days=1)).date()
+        filter_date = yesterday_date.strftime("%d %b, %Y")
+        logger.debug("📅 CompOff List - Yesterday filter: %s", filter_date)
+    # Check if it's just "compoff list" (no date/month mentioned) - show today
+    elif msg_lower in ["compoff list", "pending compoff", "compoff approval", "compoff list.", "pending compoff.", "compoff approval."]:
+        today_date = datetime.now().date()
+        filter_date = today_date.strftime("%d %b, %Y")
+        logger.debug("📅 CompOff List - Today filter: %s", filter_date)
+    else:
+        # Check if message contains just a month name (e.g., "compoff list of november")
+        month_pattern = r"\b(nov|november|dec|december|jan|january|feb|february|mar|march|apr|april|may|jun|june|jul|july|aug|august|sep|september|oct|october)\s*(?:(\d{4}))?\b"
+        month_match = re.search(month_pattern, msg_lower)
+        if month_match and not re.search(r"\d{1,2}\s+(nov|november|dec|december|jan|january|feb|february|mar|march|apr|april|may|jun|june|jul|july|aug|august|sep|september|oct|october)", msg_lower):
+            # Only month name found, not a specific date
+            month_name = month_match.group(1)
+            year = int(month_match.group(2)) if month_match.group(2) else datetime.now().year
+            month_num = MONTH_NAMES.get(month_name.lower(), datetime.now().month)
+            filter_month = (month_num, year)
+            logger.debug("📅 CompOff List - Month filter (from pattern): %s %s", calendar.month_name[filter_month[0]], filter_month[1])
+        else:
+            # extract_datetime_info returns ISO format dates (YYYY-MM-DD)
+            start_date_obj = _iso_date(date_info.get("start_date"))
+            end_date_obj = _iso_date(date_info.get("end_date"))
 
+            # Check if it's a specific date (same start and end date, or only start date)
+            if start_date_obj and (not end_date_obj or start_date_obj == end_date_obj):
+                filter_date = start_date_obj.strftime("%d %b, %Y")
+                logger.debug("📅 CompOff List - Specific Date filter: %s", filter_date)
+            # Check if it's a month range (different start/end dates in same month)
+            elif start_date_obj and end_date_obj and start_date_obj.month == end_date_obj.month and start_date_obj.year == end_date_obj.year:
+                filter_month = (start_date_obj.month, start_date_obj.year)
+                logger.debug("📅 CompOff List - Month filter (from date range): %s %s", calendar.month_name[filter_month[0]], filter_month[1])
 
-        travel_type_map = {
+    return handle_pending_compoff(call.token, call.role_name, filter_date=filter_date, filter_month=filter_month)
 
-            "local": "58",
 
-            "outstation": "59",
+@chat_intents.register("pending_leave", aliases=("leave_list",), needs=("login", "role_name"),
+                       category="leave", prefetch=_first_page(LEAVE_LIST_URL, verify=False), hints=LIST_HINTS,
+                       endpoints=(LEAVE_LIST_URL,))
+def _pending_leaves_intent(call):
+    return handle_pending_leaves(call.token, call.role_name)
 
-            "2": "2",
 
-        }
+@chat_intents.register("apply_gatepass", needs=("login", "datetime_info"), endpoints=(GATEPASS_URL,))
+def _apply_gatepass_intent(call):
+    logger.debug("entering apply gatepass")
+    c = call.classification
+    return _reply(handle_apply_gatepass(c.get("reason") or "other", c.get("destination") or "local",
+                                        call.ctx, call.token, call.datetime_info), call)
 
 
+@chat_intents.register("pending_gatepass", aliases=("gatepass_list",), needs=("login", "role_name"),
+                       category="gate_pass", prefetch=_first_page(GATEPASS_APPROVAL_LIST), hints=LIST_HINTS,
+                       endpoints=(GATEPASS_APPROVAL_LIST,))
+def _pending_gatepass_intent(call):
+    return handle_pending_gatepass(call.token, call.role_name)
 
-        travel_type_id = None
 
-        msg_lower = msg.lower()
-        for key, value in travel_type_map.items():
+@chat_intents.register("apply_missed_punch", aliases=("apply_miss_punch",), needs=("login", "datetime_info"),
+                       endpoints=(MISSED_PUNCH_APPLY_URL,))
+def _apply_missed_punch_intent(call):
+    logger.debug("entering apply missed punch")
+    return _reply(handle_apply_missed_punch(call.ctx, call.token, call.datetime_info), call)
 
-            if key in msg_lower:
 
-                travel_type_id = value
+@chat_intents.register("pending_missed_punch", aliases=("pending_miss_punch", "misspunch_list"),
+                       needs=("login", "role_name"), endpoints=(MISSED_PUNCH_APPROVAL_LIST_URL,),
+                       category="miss_punch", prefetch=_first_page(MISSED_PUNCH_APPROVAL_LIST_URL), hints=LIST_HINTS)
+def _pending_missed_punch_intent(call):
+    return handle_pending_missed_punch(call.token, call.role_name)
 
-                break
-        if not travel_type_id:
-            travel_type_id = "59"
-        data = handle_tada_travel_plan_list_by_type(
-
-            token,
-            travel_type_id,
-            page=1,
-            limit=10
-        )
-        return JsonResponse(data, safe=False) 
-
-    task = msg.lower()
-    if task.startswith ("tada_plan_list_by_type"):
-        travel_type_map = {
-            "local": "58",
-            "outstation": "59",
-            "2": "2",
-        }
-        msg_lower = msg.lower()
-        travel_type_id = "59"  # default
 
-        for key, value in travel_type_map.items():
-            if key in msg_lower:
-                travel_type_id = value
-                break
+@chat_intents.register("my_missed_punch", aliases=("my_miss_punch",), needs=("login",),
+                       endpoints=(MISSED_PUNCH_LIST_URL,), category="miss_punch", hints=MY_HINTS,
+                       prefetch=lambda call: [(MISSED_PUNCH_LIST_URL, {"page": 1, "limit": 10}, {})])
+def _my_missed_punch_intent(call):
+    return handle_my_missed_punch(call.token)
 
-        data = handle_tada_plan_list_by_type(token, travel_type_id, page=1, limit=10)
-        return JsonResponse(data, safe=False)
-    
-    
-    
-    if (
-        "local tada claim" in msg
-        or "local tada claims" in msg
-        or "local claim list" in msg
-        or msg == "local tada"
-    ):
-        data = handle_tada_claim_list_local(
-            token=token,
-            page=1,
-            limit=20
-        )
-        return JsonResponse(data, safe=False)
+
+@chat_intents.register("leave_balance", needs=("login",), endpoints=(LEAVE_BALANCE_URL,), category="leave",
+                       prefetch=lambda call: [(LEAVE_BALANCE_URL, None, {})], hints=BALANCE_HINTS)
+def _leave_balance_intent(call):
+    return _reply(handle_leave_balance(call.token), call)
+
+
+@chat_intents.register("attendance_report", aliases=("my_attendance",), needs=("login", "decision"),
+                       endpoints=(FIXHR_ATTENDANCE_URL,))
+def _attendance_report_intent(call):
+    return handle_attendance_report(call.decision, call.token, call.request, call.ctx)
+
+
+@chat_intents.register("my_leaves", needs=("login",), endpoints=(LEAVE_APPLY_URL,), category="leave", hints=MY_HINTS,
+                       prefetch=lambda call: [(LEAVE_APPLY_URL, {"page": 1, "limit": 20, "self": 1,
+                                                                 "emp_id": call.request.session.get("employee_id")}, {})])
+def _my_leaves_intent(call):
+    return handle_my_leaves(call.token, call.request.session.get("employee_id"))
+
+
+@chat_intents.register("privacy_policy", needs=("login",), endpoints=(FIXHR_PRIVACY_POLICY,), category="privacy",
+                       prefetch=lambda call: [(FIXHR_PRIVACY_POLICY, None, {})])
+def _privacy_policy_intent(call):
+    return JsonResponse(project_reply(handle_privacy_policy(call.token)), safe=False)
+
+
+@chat_intents.register("payslip", needs=("login",), endpoints=(FIXHR_PAYSLIP_POLICY,))
+def _payslip_intent(call):
+    return JsonResponse(project_reply(handle_payslip_policy(call.token)), safe=False)
+
+
+@chat_intents.register("holiday_list", needs=("login",), endpoints=(FIXHR_HOLIDAY_URL,), category="holiday",
+                       prefetch=lambda call: [(FIXHR_HOLIDAY_URL, {"type": "holiday_list", "year": datetime.now().year},
+                                               {"timeout": 10})])
+def _holiday_list_intent(call):
+    holidays = fetch_holidays({"authorization": f"Bearer {call.token}"})
+    return JsonResponse({
+        "reply_type": "holiday_list",
+        "reply": "📅 Upcoming Holidays",
+        "holidays": holidays
+    })
+
+
+@csrf_exempt
+@compress_response
+@with_debug_raw
+@fixhr_http.with_deadline()
+def chat_api(request):
+    """Main chat API endpoint using phi3_inference_v3 for intent classification 
+       and model_inference2 for general responses; routed through ``chat_intents``"""
     
-    if "local acceptance" in msg or "local tada acceptance" in msg:
-        data = handle_tada_acceptance_list_local(token)
-        return JsonResponse(data, safe=False)
-        
-        
-        
-    # Fallback to general model response
-    fallback_reply = model_response(msg) or handle_general_chat(msg, lang)
-    payload = {"reply": fallback_reply}
-    payload.update(meta)
-   
-    return JsonResponse(payload)
+    is_logged_in = check_authentication(request)
+    token = request.session.get("fixhr_token") if is_logged_in else None
+
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid method"}, status=405)
+
+    try:
+        body = json.loads(request.body.decode())
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+
+    msg = (body.get("message") or "").strip()
+    if not msg:
+        return JsonResponse({"error": "Message text is required"}, status=400)
+
+    user_id = request.session.get("employee_id") or "default_user"
+
+    chat_state.append("history", user_id, {"role": "user", "text": msg}, max_items=CHAT_HISTORY_MAX_ITEMS)
+
+    logger.debug("💬 User Message: %s", msg)
+
+    # Parsed once; every stage below reads from it
+    call = ChatCall(request, MessageContext(msg), token, user_id)
+
+    # Approve / reject buttons send fixed commands: no classification needed
+    command = chat_intents.command(call.ctx.lower)
+    if command is not None:
+        call.intent = command.name
+        return chat_intents.dispatch(command, call)
+
+    # Dates are extracted, and the likely upstream reads fetched, while the classifier runs
+    with ChatPipeline(call, chat_intents) as pipeline:
+        # Classify intent using phi3_inference_v3
+        start_time = time.perf_counter()
+        call.classification = classify_message(call.ctx, on_category=pipeline.on_category)
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        logger.info("NLU Time Taken:-------------------------------------------------------> %.2f ms", latency_ms)
+        metrics.observe("chat.nlu_ms", latency_ms)
+        call.intent = call.classification.get("intent") or "general"
+        logger.debug("🤖 Phi-3 Intent → %s", call.intent)
+
+        return chat_intents.dispatch(chat_intents.resolve(call.intent), call)
 # ===================================================
 
 
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import os
 import requests
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -78,6 +79,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # wait for a competing writer instead of failing at once with "database is locked"
+        'OPTIONS': {'timeout': 20},
     }
 }
 
@@ -129,3 +132,41 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Logging
+# Hot-path logs from core.* go through a non-blocking queue; DEBUG records
+# (upstream bodies, payload dumps) are sampled per endpoint and truncated.
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "sample": {
+            "()": "core.log_utils.SamplingFilter",
+            "every": int(os.environ.get("FIXHR_LOG_SAMPLE_EVERY", "10")),
+            "level": "DEBUG",
+        },
+        "truncate": {
+            "()": "core.log_utils.TruncateFilter",
+            "max_chars": int(os.environ.get("FIXHR_LOG_MAX_CHARS", "2000")),
+        },
+    },
+    "formatters": {
+        "hotpath": {"format": "%(asctime)s %(levelname)s %(name)s: %(message)s"},
+    },
+    "handlers": {
+        "queue": {
+            "class": "core.log_utils.QueueStreamHandler",
+            "filters": ["sample", "truncate"],
+            "formatter": "hotpath",
+        },
+    },
+    "loggers": {
+        "core": {
+            "handlers": ["queue"],
+            "level": os.environ.get("FIXHR_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}